@@ -1,11 +1,37 @@
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from news_flow.main import NewsFlow
+from news_flow.main import flow_persistence
+from news_flow.adaptive_concurrency import adaptive_concurrency
+from news_flow.flow_events import flow_events
+from news_flow.flow_status import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FlowStatusCache, parse_fields
+from news_flow.telemetry import telemetry
+from news_flow.jobs import ACTIVE_STATUSES, COMPLETED, FAILED, JobExists, QueueFull, job_queue_from_env, worker_pool_from_env
+from news_flow.tools.scrape_cache import canonicalize_url
+from news_flow.tools.search_cache import normalize_query
+from news_flow.utils import input_hash
 
-# In-memory store for tasks; note that this will be lost if the server restarts.
-task_store = {}
+# Seconds without events after which the event stream sends a keep-alive comment
+STREAM_KEEPALIVE = 15.0
+
+# Flow runs are queued in SQLite and run by a pool of worker processes, so jobs survive restarts
+job_queue = job_queue_from_env()
+worker_pool = None
+
+# Status polls read a projection of the persisted state instead of rebuilding it every time
+status_cache = FlowStatusCache(flow_persistence)
+
+# Set to 0/false/off to run every submission as its own flow, even when an identical one is running
+COALESCE_REQUESTS = os.getenv("NEWS_FLOW_COALESCE", "1").lower() not in ("0", "false", "off", "no")
 
 class Task(BaseModel):
     id: Optional[str] = None
@@ -16,7 +42,20 @@ class Task(BaseModel):
     perspective: Optional[str] = ''
     tone: Optional[str] = ''
 
-app = FastAPI()
+class ResumeRequest(BaseModel):
+    ids: List[str]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global worker_pool
+    # jobs that were running when a replica stopped are claimed again once their lease runs out,
+    # and resume from their persisted state
+    worker_pool = worker_pool_from_env(job_queue)
+    worker_pool.start()
+    yield
+    await asyncio.to_thread(worker_pool.stop)
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS Middleware Configuration
 origins = [
@@ -33,26 +72,38 @@ app.add_middleware(
     allow_headers=["*"], # Allow all headers
 )
 
+# Compress larger responses (statuses with articles and evidence); event streams are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 @app.post("/happifynews")
-async def happify_news(task: Task, background_tasks: BackgroundTasks):
+async def happify_news(task: Task):
     # Validate that at least one of news_urls or topic is provided.
     if not task.news_urls and not task.topic:
         raise HTTPException(status_code=400, detail="Either news_urls or topic must be provided.")
     
-    # Use the provided task.id if available; otherwise generate one.
-    task_id = task.id if task.id is not None else str(len(task_store) + 1)
+    # Use the provided task.id if available; otherwise generate one that is unique across replicas.
+    client_id = task.id
+    task_id = client_id if client_id is not None else uuid.uuid4().hex
     task.id = task_id  # ensure the task carries this id
     
-    # Initialize the task status as "starting".
-    task_store[task_id] = {"status": "initializing", "result": None}
-    
-    # Schedule the background workflow.
-    background_tasks.add_task(kickoff_workflow, task, task_id)
+    # Queue the workflow; when too many jobs are waiting the client is told when to retry.
+    # A request identical to a running or recently completed one attaches to it instead.
+    # A client that passes the id of a finished task reruns it from its latest checkpoint.
+    inputs = workflow_inputs(task)
+    try:
+        job = job_queue.submit(
+            task_id, inputs, key=request_key(inputs) if COALESCE_REQUESTS else None, replace=client_id is not None
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except JobExists as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
     # Return the task_id along with all the input values provided.
     return {
         "task_id": task_id,
-        "status": "starting",
+        "status": job["status"],
+        "attached_to": job.get("leader"),
         "news_urls": task.news_urls,
         "num_starting_pool_news": task.num_starting_pool_news,
         "num_max_news": task.num_max_news,
@@ -61,12 +112,10 @@ async def happify_news(task: Task, background_tasks: BackgroundTasks):
         "tone": task.tone,
     }
 
-def kickoff_workflow(task: Task, task_id: str):
-    news_flow = NewsFlow()
-    task_store[task_id] = {"status": "starting_workflow", "result": news_flow}
+def workflow_inputs(task: Task) -> dict:
     # Build the inputs dictionary using the task_id as the id.
     inputs = {
-        'id': task_id,  
+        'id': task.id,  
         'num_starting_pool_news': task.num_starting_pool_news,
         'num_max_news': task.num_max_news,
         'current_date': '2025-03-07',
@@ -78,45 +127,177 @@ def kickoff_workflow(task: Task, task_id: str):
         inputs['news_urls'] = task.news_urls
     elif task.topic:
         inputs['topic'] = task.topic
+    # (In a real scenario, the workflow may take 30-40 minutes to complete.)
+    return inputs
 
-    # Execute the workflow and update the in-memory store.
-    # (In a real scenario, this may take 30-40 minutes to complete.)
-    result = news_flow.kickoff(inputs=inputs)
-    task_store[task_id] = {"status": "completed", "result": news_flow}
+def request_key(inputs: dict) -> str:
+    """
+    Key under which identical requests are coalesced: the inputs without the id, with the
+    URLs canonicalized and sorted and the topic, perspective and tone normalized.
+    """
+    normalized = {key: value for key, value in inputs.items() if key != 'id'}
+    if normalized.get('news_urls'):
+        normalized['news_urls'] = sorted({canonicalize_url(url) for url in normalized['news_urls']})
+    for key in ('topic', 'perspective', 'tone'):
+        if isinstance(normalized.get(key), str):
+            normalized[key] = normalize_query(normalized[key])
+    return input_hash(normalized)
+
+@app.get("/flows")
+def list_flows(limit: int = 100, offset: int = 0):
+    """Persisted flows, most recently updated first."""
+    return {"flows": flow_persistence.list_flows(limit=limit, offset=offset)}
+
+@app.post("/flows/resume")
+async def resume_flows(request: ResumeRequest):
+    """
+    Queues many persisted flows to resume at once; ids that are queued or running, or have
+    no saved state, are skipped, and so is everything once the queue is full.
+    """
+    states = flow_persistence.load_states(request.ids)
+    resumed, skipped = [], []
+    for task_id in request.ids:
+        job = job_queue.get(task_id)
+        if task_id not in states or (job is not None and job["status"] in ACTIVE_STATUSES):
+            skipped.append(task_id)
+            continue
+        try:
+            # With only an id, the flow restores its persisted state and continues from its last step
+            job_queue.submit(task_id, {'id': task_id}, replace=True)
+        except QueueFull:
+            skipped.append(task_id)
+            continue
+        resumed.append(task_id)
+    return {
+        "resumed": [{"task_id": task_id, "current_step": states[task_id].get("current_step")} for task_id in resumed],
+        "skipped": skipped,
+    }
 
 @app.get("/happifynews/{task_id}")
-def get_task_status(task_id: str):
-    if task_id not in task_store:
+def get_task_status(
+    task_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Status of a task, read from a projection of its persisted state that is only rebuilt
+    when the flow saves a new state. Pick fields with ?fields=current_step,articles; list
+    fields come a page at a time (?offset=&limit=). Responses carry an ETag, and a poll
+    with a matching If-None-Match gets a 304 without the state being read at all. A task
+    attached to an identical request reports the state of the flow that request runs.
+    """
+    job = job_queue.get(task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    task_info = task_store[task_id]
-    result = task_info["result"].get_state().model_dump() # this is a pydantic object, so we need to serialize this
-    
-    # Handle case where result is still None (task hasn't completed or crashed early)
-    if result is None:
-        return {
-            "task_id": task_id,
-            "status": "in progress",
-            "current_step": None,
-            "news_list": None,
-            "plan": None,
-            "news_evidence": None,
-            "counter_arguments": None,
-            "articles": None,
-            "flow_tokens": None,
-        }
-
-    current_step = result.get('current_step', '')
-    is_complete = current_step == 'write_articles'
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {
+    flow_id = job.get("leader") or task_id
+    version = status_cache.version(flow_id)
+    tag = json.dumps([flow_id, version, job["status"], job.get("position"), job["error"]])
+    etag = f'"{hashlib.sha1(tag.encode()).hexdigest()[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [value.strip() for value in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    body = {
         "task_id": task_id,
-        "status": "completed" if is_complete else "in progress",
-        "current_step": current_step,
-        "news_list": result.get('news_list'),
-        "plan": result.get('plan'),
-        "news_evidence": result.get('news_evidence'),
-        "counter_arguments": result.get('counter_arguments'),
-        "articles": result.get('articles'),
-        "flow_tokens": result.get('flow_tokens'),
+        "status": "in progress" if job["status"] == "running" else job["status"],
+        "position": job.get("position"),
+        "error": job["error"],
+        "attached_to": job.get("leader"),
     }
+    body.update(status_cache.get(flow_id, version).render(selected, offset, limit))
+    return JSONResponse(body, headers=headers)
+
+@app.get("/happifynews/{task_id}/stream")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    Server-Sent Events of a running task: 'step' when current_step changes, 'item' when one
+    crew of a step finishes and 'token' for the writer's tokens as they are generated. The
+    stream ends with an 'end' event once the flow finishes. Clients that reconnect with
+    Last-Event-ID get the events they missed. Events are only seen by the replica whose
+    workers run the task; other replicas send keep-alives until it finishes.
+    """
+    job = job_queue.get(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    log = flow_events.log_for(job.get("leader") or task_id)
+    last_event_id = request.headers.get("last-event-id", "0")
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+
+    async def event_stream():
+        nonlocal after
+        while not await request.is_disconnected():
+            events, closed = await asyncio.to_thread(log.wait, after, STREAM_KEEPALIVE)
+            for event in events:
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+                after = event["id"]
+            # a finished task whose log was already dropped has nothing more to send either
+            if closed or (not events and job_queue.get(task_id)["status"] in (COMPLETED, FAILED)):
+                yield f"event: end\ndata: {json.dumps({'current_step': log.current_step})}\n\n"
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _telemetry_summary(flow_id: Optional[str], group_by: Optional[str]) -> dict:
+    if telemetry is None:
+        raise HTTPException(status_code=404, detail="Telemetry is disabled (NEWS_FLOW_TELEMETRY)")
+    fields = [field.strip() for field in (group_by or "").split(",") if field.strip()]
+    try:
+        groups = telemetry.summary(flow_id, group_by=fields) if fields else []
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    totals = telemetry.summary(flow_id)
+    return {"totals": totals[0] if totals else None, "group_by": fields, "groups": groups}
+
+@app.get("/happifynews/{task_id}/telemetry")
+def get_task_telemetry(
+    task_id: str,
+    group_by: Optional[str] = None,
+    calls: bool = False,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Tokens, cost, latency, retries and fallbacks of the LLM and tool calls of a task's flow,
+    totalled and, with ?group_by=step,crew, per group (any of flow_id, step, crew, kind,
+    name, provider, status). With ?calls=true the calls themselves come a page at a time.
+    """
+    job = job_queue.get(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    flow_id = job.get("leader") or task_id
+    body = {"task_id": task_id, "attached_to": job.get("leader"), **_telemetry_summary(flow_id, group_by)}
+    if calls:
+        body["calls"] = telemetry.calls(flow_id, offset, limit)
+    return body
+
+@app.get("/telemetry")
+def get_telemetry(group_by: Optional[str] = None):
+    """Call telemetry of all flows, e.g. ?group_by=name for the cost and latency of every model and tool."""
+    return _telemetry_summary(None, group_by)
+
+@app.get("/queue")
+def get_queue():
+    """Jobs by status, the admission limit and the worker processes."""
+    return {
+        "jobs": job_queue.stats(),
+        "replica": worker_pool.replica_id if worker_pool is not None else None,
+        "workers": worker_pool.snapshot() if worker_pool is not None else {},
+    }
+
+@app.get("/limits")
+def get_concurrency_limits():
+    """Current adaptive concurrency limit of every provider and model used so far."""
+    return adaptive_concurrency.snapshot() if adaptive_concurrency is not None else {}
@@ -0,0 +1,5 @@
+from dotenv import load_dotenv
+
+# Load environment variables from .env first: the package's caches, limiters and tools read
+# their settings from the environment when their modules are imported
+load_dotenv()
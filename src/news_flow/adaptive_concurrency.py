@@ -0,0 +1,167 @@
+import contextlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+
+class SlotOutcome:
+    """Yielded by slot(); lets the caller report a 429 that came back as a response, not an exception."""
+
+    def __init__(self):
+        self.congested = False
+
+    def report_congestion(self) -> None:
+        self.congested = True
+
+
+class AIMDLimit:
+    """
+    Adaptive concurrency limit of one provider or model (additive increase, multiplicative decrease).
+
+    Every healthy call adds 1/limit, so the limit grows by about one per round of calls.
+    A 429 or timeout multiplies it by decrease_factor, at most once per cooldown so a burst
+    of failures from the same overload only counts once. Calls much slower than the usual
+    latency hold the limit where it is.
+    """
+
+    def __init__(self, name: str, initial: float = 4, minimum: float = 1, maximum: float = 64,
+                 decrease_factor: float = 0.5, cooldown: float = 5.0, slow_factor: float = 2.5):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.slow_factor = slow_factor
+        self.in_flight = 0
+        self.successes = 0
+        self.congestion_events = 0
+        self.ewma_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        with self._condition:
+            self.successes += 1
+            slow = self.ewma_latency is not None and latency > self.ewma_latency * self.slow_factor
+            self.ewma_latency = latency if self.ewma_latency is None else 0.8 * self.ewma_latency + 0.2 * latency
+            if not slow:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+                self._condition.notify_all()
+
+    def on_congestion(self) -> None:
+        with self._condition:
+            self.congestion_events += 1
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self.limit = max(self.minimum, self.limit * self.decrease_factor)
+            logging.warning("Congestion on %s, concurrency limit cut to %d", self.name, int(self.limit))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "successes": self.successes,
+                "congestion_events": self.congestion_events,
+                "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            }
+
+
+class AdaptiveConcurrency:
+    """Registry of AIMD limits, one per provider or model, created on first use."""
+
+    def __init__(self, **limit_options: Any):
+        self.limit_options = limit_options
+        self._limits: Dict[str, AIMDLimit] = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, key: str) -> AIMDLimit:
+        with self._lock:
+            if key not in self._limits:
+                self._limits[key] = AIMDLimit(key, **self.limit_options)
+            return self._limits[key]
+
+    @contextlib.contextmanager
+    def slot(self, key: str) -> Iterator[SlotOutcome]:
+        """
+        Holds one concurrency slot of key while the block runs and feeds the outcome back:
+        a normal exit counts as a success with its latency, a congestion exception (see
+        is_congestion) or a reported congestion cuts the limit, and any other exception
+        only frees the slot.
+        """
+        limit = self.limit_for(key)
+        limit.acquire()
+        outcome = SlotOutcome()
+        start = time.monotonic()
+        try:
+            yield outcome
+        except Exception as e:
+            if is_congestion(e):
+                limit.on_congestion()
+            raise
+        else:
+            if outcome.congested:
+                limit.on_congestion()
+            else:
+                limit.on_success(time.monotonic() - start)
+        finally:
+            limit.release()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current limit, in-flight calls and counters of every provider/model seen so far."""
+        with self._lock:
+            limits = list(self._limits.values())
+        return {limit.name: limit.snapshot() for limit in limits}
+
+
+def is_congestion(error: Exception) -> bool:
+    """429s and timeouts, from LiteLLM or requests, mean the provider is overloaded."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    name = type(error).__name__
+    return name in ("RateLimitError", "Timeout", "APITimeoutError", "ReadTimeout", "ConnectTimeout")
+
+
+def adaptive_concurrency_from_env() -> Optional[AdaptiveConcurrency]:
+    """
+    Builds the process-wide controller from the environment:
+    - NEWS_FLOW_ADAPTIVE_CONCURRENCY: set to 0/false/off to disable it (enabled by default)
+    - NEWS_FLOW_ADAPTIVE_INITIAL / _MIN / _MAX: starting, lowest and highest concurrency per key
+    """
+    if os.getenv("NEWS_FLOW_ADAPTIVE_CONCURRENCY", "1").lower() in ("0", "false", "off", "no"):
+        logging.info("Adaptive concurrency control disabled")
+        return None
+    return AdaptiveConcurrency(
+        initial=float(os.getenv("NEWS_FLOW_ADAPTIVE_INITIAL", 4)),
+        minimum=float(os.getenv("NEWS_FLOW_ADAPTIVE_MIN", 1)),
+        maximum=float(os.getenv("NEWS_FLOW_ADAPTIVE_MAX", 64)),
+    )
+
+
+adaptive_concurrency = adaptive_concurrency_from_env()
+
+
+@contextlib.contextmanager
+def adaptive_slot(key: str) -> Iterator[SlotOutcome]:
+    """slot() of the process-wide controller, or a no-op when it is disabled."""
+    if adaptive_concurrency is None:
+        yield SlotOutcome()
+        return
+    with adaptive_concurrency.slot(key) as outcome:
+        yield outcome
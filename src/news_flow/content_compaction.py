@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+import litellm
+
+# Tokens of article content each task gets to see. The planning crew pastes the content into
+# three of its tasks, so it gets less than the critique and the writer.
+DEFAULT_CONTENT_BUDGETS: Dict[str, int] = {
+    "critique_news": 4_000,
+    "plan_research": 3_000,
+    "write_articles": 6_000,
+}
+
+# Marks the place where content was cut to fit a budget
+TRUNCATION_MARK = "[...]"
+
+# Lines scrapers pick up from navigation, footers, cookie banners and share widgets
+BOILERPLATE = re.compile(
+    r"\b(cookie|cookies|accept all|privacy policy|terms of (use|service)|all rights reserved|subscribe|"
+    r"newsletter|sign in|sign up|log in|create an account|skip to (main )?content|follow us|share (this|on)|"
+    r"advertisement|related articles|read more|you may also like|recommended for you|back to top)\b",
+    re.IGNORECASE,
+)
+# Boilerplate phrases only drop short blocks; a long paragraph mentioning a newsletter is still content
+BOILERPLATE_MAX_WORDS = 20
+MARKDOWN_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+MARKDOWN_IMAGE_ONLY = re.compile(r"^(!\[[^\]]*\]\([^)]*\)\s*)+$")
+# Blocks that are mostly link text (menus, tag clouds, link lists) are navigation
+MAX_LINK_SHARE = 0.6
+
+
+def count_tokens(text: str) -> int:
+    """Token count with the tokenizer bundled with litellm, so no network is needed."""
+    return litellm.token_counter(text=text) if text else 0
+
+
+def _blocks(text: str) -> List[str]:
+    return [block.strip() for block in re.split(r"\n\s*\n", text) if block.strip()]
+
+
+def _is_boilerplate(block: str) -> bool:
+    if MARKDOWN_IMAGE_ONLY.match(block):
+        return True
+    link_chars = sum(len(match.group(0)) for match in MARKDOWN_LINK.finditer(block))
+    if link_chars > MAX_LINK_SHARE * len(block):
+        return True
+    return len(block.split()) <= BOILERPLATE_MAX_WORDS and BOILERPLATE.search(block) is not None
+
+
+def extract_main_text(text: str) -> str:
+    """
+    The article text of a scraped page: its paragraphs without navigation, footer, cookie
+    and share boilerplate, and with paragraphs repeated further down the page dropped.
+    """
+    seen = set()
+    kept = []
+    for block in _blocks(text):
+        if _is_boilerplate(block):
+            continue
+        key = " ".join(MARKDOWN_LINK.sub(r"\1", block).lower().split())
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append(block)
+    return "\n\n".join(kept)
+
+
+def fit_to_budget(text: str, budget: int) -> str:
+    """
+    The text cut to at most budget tokens. Whole paragraphs are kept from the start, since
+    news put what matters first; the paragraph that crosses the budget is cut mid-way.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    kept, used = [], count_tokens(TRUNCATION_MARK)
+    for block in _blocks(text):
+        tokens = count_tokens(block) + 1  # and the paragraph break
+        if used + tokens > budget:
+            encoded = litellm.encode(model="", text=block)
+            if budget - used > 0:
+                kept.append(litellm.decode(model="", tokens=encoded[:budget - used]))
+            break
+        kept.append(block)
+        used += tokens
+    return "\n\n".join(kept + [TRUNCATION_MARK])
+
+
+class ContentCompactor:
+    """
+    Shrinks scraped article content before it is pasted into prompts: clean() extracts the
+    main text once per article, fit() cuts it to the token budget of the task it is for.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None):
+        self.budgets = {**DEFAULT_CONTENT_BUDGETS, **(budgets or {})}
+
+    def clean(self, text: str) -> str:
+        return extract_main_text(text)
+
+    def fit(self, text: str, task: str) -> str:
+        budget = self.budgets.get(task)
+        return fit_to_budget(text, budget) if budget else text
+
+
+def content_compactor_from_env() -> Optional[ContentCompactor]:
+    """
+    Builds the content compactor from the environment:
+    - NEWS_FLOW_COMPACT_CONTENT: set to 0/false/off to pass article content to the crews as scraped
+    - NEWS_FLOW_CONTENT_BUDGETS: JSON of token budgets by step overriding the defaults,
+      e.g. '{"write_articles": 10000}'
+    """
+    if os.getenv("NEWS_FLOW_COMPACT_CONTENT", "1").lower() in ("0", "false", "off", "no"):
+        logging.info("Article content compaction disabled")
+        return None
+    return ContentCompactor(json.loads(os.getenv("NEWS_FLOW_CONTENT_BUDGETS", "{}")))
+
+
+content_compactor = content_compactor_from_env()
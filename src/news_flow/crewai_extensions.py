@@ -1,9 +1,19 @@
+import asyncio
+import atexit
+import contextlib
 import json
+import logging
+import os
 import re
 import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional, Type, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
 
+from crewai import Crew, CrewOutput
 from crewai.flow.persistence.sqlite import SQLiteFlowPersistence
 from crewai.utilities.serialization import to_serializable
 from pydantic import BaseModel, ValidationError
@@ -16,24 +26,426 @@ from crewai.utilities.converter import (
     validate_model,
 )
 from crewai.utilities.printer import Printer
+from crewai.types.usage_metrics import UsageMetrics
+
+from news_flow.state_patch import apply_patch, make_patch
+
+
+# Nesting depth serialized in full; NewsState -> plan -> key_ideas -> ideas -> idea is already 5 levels
+MAX_STATE_DEPTH = 32
+# Attempts of the background writer at a batch before it gives up on it
+MAX_WRITE_ATTEMPTS = 3
+# Flows whose last written state the writer keeps in memory to diff the next snapshot against
+MAX_CACHED_HEADS = 64
+# Stored states and patches starting with this marker are zlib-compressed JSON, anything else is plain JSON text
+COMPRESSED_MARKER = b"zlib:"
+COMPRESS_MIN_BYTES = 1024
+# Flows deleted per transaction by the retention policy, so writers of other processes never wait long
+RETENTION_CHUNK = 100
+# Flows fetched per query by load_states, under SQLite's limit on bound parameters
+LOAD_BATCH = 500
+
+
+def encode_json(value: Any, compress: bool = True) -> Union[str, bytes]:
+    """JSON of value, zlib-compressed behind COMPRESSED_MARKER when it is big enough to be worth it."""
+    text = json.dumps(value)
+    if not compress or len(text) < COMPRESS_MIN_BYTES:
+        return text
+    return COMPRESSED_MARKER + zlib.compress(text.encode("utf-8"))
+
+
+def decode_json(stored: Union[str, bytes]) -> Any:
+    """Reads a value written by encode_json, including the plain JSON text of older rows."""
+    if isinstance(stored, bytes) and stored.startswith(COMPRESSED_MARKER):
+        stored = zlib.decompress(stored[len(COMPRESSED_MARKER):])
+    return json.loads(stored)
 
 
 class SQLiteFlowPersistenceJSON(SQLiteFlowPersistence):
-    """SQLite persistence with robust JSON serialization for state data."""
+    """
+    SQLite persistence with robust JSON serialization for state data and write-behind saves.
+
+    save_state only snapshots the state on the flow thread and hands it to a background
+    writer, which inserts everything pending in one transaction on a single long-lived WAL
+    connection. Consecutive snapshots of a flow that are still waiting are coalesced into the
+    latest one, so many concurrent flows never contend for the database lock. At most
+    max_pending flows can wait at once; beyond that save_state blocks until the writer catches
+    up. Pending snapshots are flushed before a state is loaded and when the process exits.
+
+    The snapshot @persist saves when a step method finishes waits for the writer, so a
+    finished step is durable once the next step starts. Snapshots saved inside a step with
+    wait=False (item checkpoints) are not: a crash loses those the writer has not committed
+    yet, and their items run again on resume. With
+    write_behind=False every save_state waits for its own write.
+
+    States are stored incrementally: a full base snapshot in flow_states followed by JSON
+    Patch deltas in flow_state_deltas holding only what changed since the previous snapshot.
+    After compact_every deltas the next snapshot is a new base, and every compact_interval
+    seconds (or on compact()) the writer folds the deltas of each flow into a new base.
+
+    States and patches over COMPRESS_MIN_BYTES are stored zlib-compressed. Once a flow saves
+    the state of one of its final_methods, its intermediate snapshots are dropped and only
+    the final state is kept. The periodic maintenance also expires whole flows not updated
+    for max_age seconds and then the least recently updated flows while the database holds
+    more than max_bytes of states, deleting them in small transactions between writes.
+
+    The flow_heads table points at the current base of every flow and is updated in the
+    same transaction as each write, so resuming a flow is a primary key lookup whatever
+    the size of flow_states. list_flows and load_states serve many flows per query.
+
+    Several worker processes share the database: writes, compaction and retention take
+    the write lock up front (BEGIN IMMEDIATE), so the head a delta is written on cannot
+    be compacted or expired by another process in between, and loads read a head and
+    its deltas from one snapshot.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        write_behind: bool = True,
+        max_pending: int = 256,
+        compact_every: int = 20,
+        compact_interval: float = 600.0,
+        compress: bool = True,
+        final_methods: Tuple[str, ...] = (),
+        max_age: Optional[float] = 30 * 24 * 3600,
+        max_bytes: Optional[int] = 1024 * 1024 * 1024,
+    ):
+        self.write_behind = write_behind
+        self.max_pending = max_pending
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self.compress = compress
+        self.final_methods = final_methods
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._pending: "OrderedDict[str, Tuple[str, str, Any]]" = OrderedDict()
+        # flow_uuid -> (base id, deltas written on it, last written state), owned by the writer
+        self._heads: "OrderedDict[str, Tuple[int, int, Any]]" = OrderedDict()
+        self._writing = False
+        self._compact_requested = False
+        self._last_compaction = time.monotonic()
+        self._condition = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        super().__init__(db_path=db_path)
+        atexit.register(self.close)
+
+    def init_db(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            # lets the retention policy give freed pages back; only takes effect on a new database
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        super().init_db()
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            # WAL lets readers (load_state, the API) run while the writer commits
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS flow_state_deltas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                flow_uuid TEXT NOT NULL,
+                base_id INTEGER NOT NULL,
+                method_name TEXT NOT NULL,
+                timestamp DATETIME NOT NULL,
+                patch_json TEXT NOT NULL
+            )
+            """
+            )
+            conn.execute(
+                """
+            CREATE INDEX IF NOT EXISTS idx_flow_state_deltas_base
+            ON flow_state_deltas(base_id, id)
+            """
+            )
+            conn.execute(
+                """
+            CREATE INDEX IF NOT EXISTS idx_flow_state_deltas_uuid
+            ON flow_state_deltas(flow_uuid)
+            """
+            )
+            conn.execute(
+                """
+            CREATE INDEX IF NOT EXISTS idx_flow_states_uuid_timestamp
+            ON flow_states(flow_uuid, timestamp)
+            """
+            )
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS flow_heads (
+                flow_uuid TEXT PRIMARY KEY,
+                base_id INTEGER NOT NULL,
+                method_name TEXT NOT NULL,
+                timestamp DATETIME NOT NULL
+            )
+            """
+            )
+            conn.execute(
+                """
+            CREATE INDEX IF NOT EXISTS idx_flow_heads_timestamp
+            ON flow_heads(timestamp)
+            """
+            )
+            if conn.execute("SELECT 1 FROM flow_heads LIMIT 1").fetchone() is None:
+                self._backfill_heads(conn)
+
+    @staticmethod
+    def _backfill_heads(conn: sqlite3.Connection) -> None:
+        """Points flow_heads at the latest base of each flow of a database written before it existed."""
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO flow_heads (flow_uuid, base_id, method_name, timestamp)
+            SELECT flow_uuid, id, method_name, timestamp FROM flow_states
+            WHERE id IN (SELECT MAX(id) FROM flow_states GROUP BY flow_uuid)
+            """
+        )
+        conn.execute(
+            """
+            UPDATE flow_heads SET (method_name, timestamp) = (
+                SELECT method_name, timestamp FROM flow_state_deltas
+                WHERE base_id = flow_heads.base_id ORDER BY id DESC LIMIT 1
+            )
+            WHERE EXISTS (SELECT 1 FROM flow_state_deltas WHERE base_id = flow_heads.base_id)
+            """
+        )
 
     def save_state(
         self,
         flow_uuid: str,
         method_name: str,
         state_data: Union[Dict[str, Any], BaseModel],
+        wait: bool = True,
     ) -> None:
-        """Save the current flow state to SQLite using robust serialization."""
-        # Use to_serializable for robust conversion to JSON-compatible types
-        serializable_state = to_serializable(state_data)
-
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """
+        """
+        Queue the current flow state for the background writer using robust serialization,
+        and unless wait is False (and write-behind is on) wait until it is written.
+        """
+        # Use to_serializable for robust conversion to JSON-compatible types; it builds new
+        # containers, so later changes to the live state do not leak into the snapshot.
+        # Its default depth of 5 would turn the lists inside each plan into repr strings.
+        serializable_state = to_serializable(state_data, max_depth=MAX_STATE_DEPTH)
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+        with self._condition:
+            while flow_uuid not in self._pending and len(self._pending) >= self.max_pending:
+                self._condition.wait()
+            self._pending.pop(flow_uuid, None)
+            self._pending[flow_uuid] = (method_name, timestamp, serializable_state)
+            self._ensure_writer()
+            self._condition.notify_all()
+        if wait or not self.write_behind:
+            self.flush()
+
+    def load_state(self, flow_uuid: str) -> Optional[Dict[str, Any]]:
+        """Rebuilds the latest state of the flow from its last base snapshot and the deltas on it."""
+        self.flush()
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("BEGIN")
+            row = conn.execute(
+                "SELECT s.id, s.state_json FROM flow_heads h JOIN flow_states s ON s.id = h.base_id WHERE h.flow_uuid = ?",
+                (flow_uuid,),
+            ).fetchone()
+            if row is None:
+                # rows saved by the stock crewAI persistence have no head
+                row = conn.execute(
+                    "SELECT id, state_json FROM flow_states WHERE flow_uuid = ? ORDER BY id DESC LIMIT 1",
+                    (flow_uuid,),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._rebuild(conn, *row)
+
+    def load_states(self, flow_uuids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Latest state of each of the flows, with one query per LOAD_BATCH flows. Unknown ids are left out."""
+        self.flush()
+        states = {}
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("BEGIN")
+            for start in range(0, len(flow_uuids), LOAD_BATCH):
+                chunk = flow_uuids[start:start + LOAD_BATCH]
+                placeholders = ", ".join("?" * len(chunk))
+                bases = conn.execute(
+                    f"""
+            SELECT h.flow_uuid, s.id, s.state_json FROM flow_heads h JOIN flow_states s ON s.id = h.base_id
+            WHERE h.flow_uuid IN ({placeholders})
+            """,
+                    chunk,
+                ).fetchall()
+                if not bases:
+                    continue
+                patches: Dict[int, List[Any]] = {}
+                base_ids = [base_id for _, base_id, _ in bases]
+                for base_id, patch_json in conn.execute(
+                    f"SELECT base_id, patch_json FROM flow_state_deltas WHERE base_id IN ({', '.join('?' * len(base_ids))}) ORDER BY id",
+                    base_ids,
+                ):
+                    patches.setdefault(base_id, []).append(patch_json)
+                for flow_uuid, base_id, state_json in bases:
+                    state = decode_json(state_json)
+                    for patch_json in patches.get(base_id, []):
+                        state = apply_patch(state, decode_json(patch_json))
+                    states[flow_uuid] = state
+        return states
+
+    def list_flows(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """Persisted flows, most recently updated first, with the last method each one saved."""
+        self.flush()
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            rows = conn.execute(
+                "SELECT flow_uuid, method_name, timestamp FROM flow_heads ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [{"flow_uuid": flow_uuid, "method_name": method_name, "timestamp": timestamp} for flow_uuid, method_name, timestamp in rows]
+
+    def head_version(self, flow_uuid: str) -> Optional[Tuple[str, str]]:
+        """
+        Method name and timestamp of the flow's last save, read from flow_heads without
+        rebuilding the state; it changes whenever the state does. None for unknown flows.
+        """
+        self.flush()
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            return conn.execute(
+                "SELECT method_name, timestamp FROM flow_heads WHERE flow_uuid = ?", (flow_uuid,)
+            ).fetchone()
+
+    @staticmethod
+    def _rebuild(conn: sqlite3.Connection, base_id: int, state_json: Union[str, bytes]) -> Dict[str, Any]:
+        state = decode_json(state_json)
+        for (patch_json,) in conn.execute(
+            "SELECT patch_json FROM flow_state_deltas WHERE base_id = ? ORDER BY id", (base_id,)
+        ):
+            state = apply_patch(state, decode_json(patch_json))
+        return state
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every queued snapshot is written. Returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._writing, timeout=timeout)
+
+    def compact(self) -> None:
+        """Has the writer run its maintenance (compaction and retention) now, and waits for it."""
+        with self._condition:
+            self._compact_requested = True
+            self._ensure_writer()
+            self._condition.notify_all()
+            self._condition.wait_for(lambda: not self._compact_requested)
+
+    def close(self) -> None:
+        """Flushes the queue and stops the writer (also runs at interpreter exit)."""
+        self.flush()
+        with self._condition:
+            writer, self._writer = self._writer, None
+            self._condition.notify_all()
+        if writer is not None:
+            writer.join()
+
+    def _ensure_writer(self) -> None:
+        """Starts the writer thread on first use; must be called with the condition held."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="flow-state-writer", daemon=True)
+            self._writer.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # WAL stays consistent with synchronous=NORMAL; only the last commits can be lost on power failure
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        return self._conn
+
+    def _write_loop(self) -> None:
+        current = threading.current_thread()
+        failures = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._pending or self._compact_requested or self._writer is not current
+                )
+                if not self._pending and not self._compact_requested:
+                    break
+                batch, self._pending = self._pending, OrderedDict()
+                compact = self._compact_requested or time.monotonic() - self._last_compaction > self.compact_interval
+                self._writing = True
+                self._condition.notify_all()
+            if compact:
+                self._run_maintenance()
+            if not batch:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+                continue
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    heads = self._write_batch(conn, batch)
+                # only remember what was committed, a rolled back batch is diffed again from scratch
+                self._update_heads(heads)
+                failures = 0
+            except Exception:
+                failures += 1
+                if failures >= MAX_WRITE_ATTEMPTS:
+                    logging.exception("Dropping %d flow states after %d failed writes", len(batch), failures)
+                    failures = 0
+                    continue
+                logging.exception("Failed to persist %d flow states, retrying", len(batch))
+                with self._condition:
+                    # newer snapshots queued meanwhile win over the failed ones
+                    for flow_uuid, entry in batch.items():
+                        self._pending.setdefault(flow_uuid, entry)
+                time.sleep(1.0)
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: "OrderedDict[str, Tuple[str, str, Any]]") -> Dict[str, Tuple[int, int, Any]]:
+        """
+        Writes a delta for flows with a recent base in memory and a new base for the others.
+        A flow that finished gets a new base and loses its intermediate snapshots. A cached
+        base that is no longer the flow's head (another process ran or compacted the flow
+        since) is ignored; the caller holds the write lock, so the head cannot move meanwhile.
+        """
+        heads = {}
+        for flow_uuid, (method_name, timestamp, state) in batch.items():
+            head = self._heads.get(flow_uuid)
+            if head is not None and conn.execute(
+                "SELECT 1 FROM flow_heads WHERE flow_uuid = ? AND base_id = ?", (flow_uuid, head[0])
+            ).fetchone() is None:
+                head = None
+            if method_name in self.final_methods:
+                base_id = self._insert_base(conn, flow_uuid, method_name, timestamp, state)
+                conn.execute("DELETE FROM flow_states WHERE flow_uuid = ? AND id < ?", (flow_uuid, base_id))
+                conn.execute("DELETE FROM flow_state_deltas WHERE flow_uuid = ?", (flow_uuid,))
+                heads[flow_uuid] = (base_id, 0, state)
+            elif head is not None and head[1] < self.compact_every:
+                base_id, deltas, previous = head
+                conn.execute(
+                    """
+            INSERT INTO flow_state_deltas (flow_uuid, base_id, method_name, timestamp, patch_json)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+                    (flow_uuid, base_id, method_name, timestamp, encode_json(make_patch(previous, state), self.compress)),
+                )
+                heads[flow_uuid] = (base_id, deltas + 1, state)
+            else:
+                base_id = self._insert_base(conn, flow_uuid, method_name, timestamp, state)
+                heads[flow_uuid] = (base_id, 0, state)
+            self._set_head(conn, flow_uuid, heads[flow_uuid][0], method_name, timestamp)
+        return heads
+
+    @staticmethod
+    def _set_head(conn: sqlite3.Connection, flow_uuid: str, base_id: int, method_name: str, timestamp: str) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO flow_heads (flow_uuid, base_id, method_name, timestamp) VALUES (?, ?, ?, ?)",
+            (flow_uuid, base_id, method_name, timestamp),
+        )
+
+    def _insert_base(self, conn: sqlite3.Connection, flow_uuid: str, method_name: str, timestamp: str, state: Any) -> int:
+        cursor = conn.execute(
+            """
             INSERT INTO flow_states (
                 flow_uuid,
                 method_name,
@@ -41,24 +453,306 @@ class SQLiteFlowPersistenceJSON(SQLiteFlowPersistence):
                 state_json
             ) VALUES (?, ?, ?, ?)
             """,
-                (
-                    flow_uuid,
-                    method_name,
-                    datetime.now(timezone.utc).isoformat(),
-                    json.dumps(serializable_state),  # Dump the serializable dict
-                ),
+            (flow_uuid, method_name, timestamp, encode_json(state, self.compress)),  # Dump the serializable dict
+        )
+        return cursor.lastrowid
+
+    def _update_heads(self, heads: Dict[str, Tuple[int, int, Any]]) -> None:
+        for flow_uuid, head in heads.items():
+            self._heads[flow_uuid] = head
+            self._heads.move_to_end(flow_uuid)
+        while len(self._heads) > MAX_CACHED_HEADS:
+            self._heads.popitem(last=False)
+
+    def _run_maintenance(self) -> None:
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                heads = self._compact(conn)
+            self._update_heads(heads)
+            if heads:
+                logging.info("Compacted the state deltas of %d flows", len(heads))
+            expired = self._expire(conn)
+            if expired:
+                logging.info("Retention policy removed %d flows from %s", expired, self.db_path)
+                conn.execute("PRAGMA incremental_vacuum").fetchall()
+        except Exception:
+            logging.exception("Flow state maintenance failed")
+        finally:
+            self._last_compaction = time.monotonic()
+            with self._condition:
+                self._compact_requested = False
+                self._condition.notify_all()
+
+    def _compact(self, conn: sqlite3.Connection) -> Dict[str, Tuple[int, int, Any]]:
+        """Folds the deltas on each flow's latest base into a new base and drops the folded deltas."""
+        rows = conn.execute(
+            """
+            SELECT h.flow_uuid, s.id, s.state_json FROM flow_heads h JOIN flow_states s ON s.id = h.base_id
+            WHERE EXISTS (SELECT 1 FROM flow_state_deltas WHERE base_id = h.base_id)
+            """
+        ).fetchall()
+        heads = {}
+        for flow_uuid, base_id, state_json in rows:
+            state = self._rebuild(conn, base_id, state_json)
+            method_name, timestamp = conn.execute(
+                "SELECT method_name, timestamp FROM flow_state_deltas WHERE base_id = ? ORDER BY id DESC LIMIT 1",
+                (base_id,),
+            ).fetchone()
+            new_base_id = self._insert_base(conn, flow_uuid, method_name, timestamp, state)
+            self._set_head(conn, flow_uuid, new_base_id, method_name, timestamp)
+            conn.execute("DELETE FROM flow_state_deltas WHERE flow_uuid = ? AND base_id <= ?", (flow_uuid, base_id))
+            heads[flow_uuid] = (new_base_id, 0, state)
+        return heads
+
+    def _expire(self, conn: sqlite3.Connection) -> int:
+        """Deletes the flows past max_age, then the oldest ones until the states fit in max_bytes."""
+        if self.max_age is None and self.max_bytes is None:
+            return 0
+        flows = conn.execute(
+            """
+            SELECT flow_uuid, MAX(timestamp), SUM(size) FROM (
+                SELECT flow_uuid, timestamp, length(state_json) AS size FROM flow_states
+                UNION ALL
+                SELECT flow_uuid, timestamp, length(patch_json) AS size FROM flow_state_deltas
             )
-
-# --- LiteLLM Monkey Patch for Stop Parameter ---
+            GROUP BY flow_uuid
+            ORDER BY MAX(timestamp)
+            """
+        ).fetchall()
+        total = sum(size for _, _, size in flows)
+        cutoff = None
+        if self.max_age is not None:
+            cutoff = datetime.fromtimestamp(time.time() - self.max_age, timezone.utc).isoformat()
+        expired = []
+        for flow_uuid, last_update, size in flows:
+            too_old = cutoff is not None and last_update < cutoff
+            over_budget = self.max_bytes is not None and total > self.max_bytes
+            if not too_old and not over_budget:
+                break
+            expired.append((flow_uuid, last_update))
+            total -= size
+
+        deleted = 0
+        for start in range(0, len(expired), RETENTION_CHUNK):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # flows another process saved since they were selected are kept
+                chunk = [
+                    (flow_uuid,)
+                    for flow_uuid, last_update in expired[start:start + RETENTION_CHUNK]
+                    if not conn.execute(
+                        "SELECT 1 FROM flow_heads WHERE flow_uuid = ? AND timestamp > ?", (flow_uuid, last_update)
+                    ).fetchone()
+                ]
+                conn.executemany("DELETE FROM flow_states WHERE flow_uuid = ?", chunk)
+                conn.executemany("DELETE FROM flow_state_deltas WHERE flow_uuid = ?", chunk)
+                conn.executemany("DELETE FROM flow_heads WHERE flow_uuid = ?", chunk)
+            for (flow_uuid,) in chunk:
+                self._heads.pop(flow_uuid, None)
+            deleted += len(chunk)
+        return deleted
+
+def flow_persistence_from_env(db_path: str = 'flow_states.db', final_methods: Tuple[str, ...] = ()) -> SQLiteFlowPersistenceJSON:
+    """
+    Builds the flow state persistence from the environment:
+    - NEWS_FLOW_STATE_WRITE_BEHIND: set to 0/false/off to write every state synchronously (write-behind by default)
+    - NEWS_FLOW_STATE_MAX_PENDING: flows whose snapshots may wait for the writer before saves block (default 256)
+    - NEWS_FLOW_STATE_COMPACT_EVERY: deltas stored on a base before the next snapshot is a full one (default 20)
+    - NEWS_FLOW_STATE_COMPACT_INTERVAL: seconds between compactions and retention runs (default 600)
+    - NEWS_FLOW_STATE_COMPRESS: set to 0/false/off to store states as plain JSON text (compressed by default)
+    - NEWS_FLOW_STATE_MAX_AGE_DAYS: days after its last update a flow is deleted (default 30, 0 keeps them)
+    - NEWS_FLOW_STATE_MAX_MB: size budget of the stored states (default 1024, 0 for no budget)
+    """
+    max_age_days = float(os.getenv("NEWS_FLOW_STATE_MAX_AGE_DAYS", 30))
+    max_mb = float(os.getenv("NEWS_FLOW_STATE_MAX_MB", 1024))
+    return SQLiteFlowPersistenceJSON(
+        db_path=db_path,
+        write_behind=os.getenv("NEWS_FLOW_STATE_WRITE_BEHIND", "1").lower() not in ("0", "false", "off", "no"),
+        max_pending=int(os.getenv("NEWS_FLOW_STATE_MAX_PENDING", 256)),
+        compact_every=int(os.getenv("NEWS_FLOW_STATE_COMPACT_EVERY", 20)),
+        compact_interval=float(os.getenv("NEWS_FLOW_STATE_COMPACT_INTERVAL", 600)),
+        compress=os.getenv("NEWS_FLOW_STATE_COMPRESS", "1").lower() not in ("0", "false", "off", "no"),
+        final_methods=final_methods,
+        max_age=max_age_days * 24 * 3600 if max_age_days > 0 else None,
+        max_bytes=int(max_mb * 1024 * 1024) if max_mb > 0 else None,
+    )
+
+# --- Bounded Concurrent Fan-Out ---
+
+async def kickoff_for_each_bounded(
+    crew: Crew,
+    inputs: List[Dict[str, Any]],
+    max_concurrency: int = 4,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    on_result: Optional[Callable[[int, CrewOutput], None]] = None,
+    on_start: Optional[Callable[[int], None]] = None,
+) -> List[CrewOutput]:
+    """
+    Concurrent counterpart of Crew.kickoff_for_each_async with a cap on in-flight crews.
+
+    Each input runs on its own copy of the crew (like kickoff_for_each does), at most
+    max_concurrency at a time. Pass a semaphore instead to share one cap between several
+    concurrent calls. on_result(index, output) is called as soon as each crew finishes, and
+    on_start(index) right before each crew starts, inside the asyncio task that runs it.
+    Results are returned in the same order as the inputs and the usage metrics of all
+    copies are aggregated on the parent crew.
+    """
+    if not inputs:
+        return []
+    if semaphore is None:
+        if on_result is None and on_start is None and (max_concurrency <= 0 or max_concurrency >= len(inputs)):
+            return await crew.kickoff_for_each_async(inputs=inputs)
+        semaphore = asyncio.Semaphore(max_concurrency if max_concurrency > 0 else len(inputs))
+
+    crew_copies = [crew.copy() for _ in inputs]
+
+    async def run_crew(index: int, crew_copy: Crew, input_data: Dict[str, Any]) -> CrewOutput:
+        async with semaphore:
+            if on_start is not None:
+                on_start(index)
+            output = await crew_copy.kickoff_async(inputs=input_data)
+        if on_result is not None:
+            on_result(index, output)
+        return output
+
+    results = await asyncio.gather(
+        *(run_crew(index, crew_copy, input_data) for index, (crew_copy, input_data) in enumerate(zip(crew_copies, inputs)))
+    )
+
+    total_usage_metrics = UsageMetrics()
+    for crew_copy in crew_copies:
+        if crew_copy.usage_metrics:
+            total_usage_metrics.add_usage_metrics(crew_copy.usage_metrics)
+    crew.usage_metrics = total_usage_metrics
+    return list(results)
+
+# --- LiteLLM Monkey Patch for Stop Parameter, Response Cache and Rate Limiting ---
 import litellm
 
+from news_flow.llm_cache import (
+    CACHE_OPT_OUT_PARAM,
+    cache_from_env,
+    has_content,
+    is_cacheable,
+    make_cache_key,
+)
+
+from news_flow.adaptive_concurrency import adaptive_slot
+from news_flow.rate_limiter import estimate_tokens, provider_of, rate_limiter
+from news_flow.telemetry import telemetry
+from news_flow.transport import install_transport
+
+# LLM calls and tool clients share one pooled keep-alive transport
+install_transport()
+
 original_completion = litellm.completion
 
+# Process-wide response cache, None when disabled through NEWS_FLOW_LLM_CACHE
+llm_cache = cache_from_env()
+
+class _StreamInSlot:
+    """
+    Streamed completion that keeps its adaptive concurrency slot until the stream is used
+    up, fails or is closed, so the limit sees the whole generation and not just the time to
+    open the stream. The tokens reported in the last chunks are charged at the end.
+    """
+
+    def __init__(self, stream: Any, slot: contextlib.ExitStack, provider: str, reserved: int):
+        self._stream = iter(stream)
+        self._slot = slot
+        self._provider = provider
+        self._reserved = reserved
+        self._usage = None
+
+    def __iter__(self) -> "_StreamInSlot":
+        return self
+
+    def __next__(self) -> Any:
+        try:
+            chunk = next(self._stream)
+        except StopIteration:
+            self._finish(None)
+            raise
+        except BaseException as e:
+            self._finish(e)
+            raise
+        self._usage = getattr(chunk, 'usage', None) or self._usage
+        return chunk
+
+    def __getattr__(self, name: str) -> Any:
+        if name == '_stream':
+            raise AttributeError(name)
+        return getattr(self._stream, name)
+
+    def close(self) -> None:
+        """Frees the slot of a stream abandoned before its end; it is not counted as a success."""
+        self._finish(GeneratorExit())
+        close = getattr(self._stream, 'close', None)
+        if close is not None:
+            close()
+
+    def __del__(self) -> None:
+        self._finish(GeneratorExit())
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        slot, self._slot = self.__dict__.get('_slot'), None
+        if slot is None:
+            return
+        if error is None:
+            slot.__exit__(None, None, None)
+        else:
+            slot.__exit__(type(error), error, error.__traceback__)
+        if error is None and rate_limiter is not None and self._usage is not None:
+            rate_limiter.record_tokens(self._provider, (self._usage.total_tokens or 0) - self._reserved)
+
+def rate_limited_completion(*args, **kwargs):
+    """
+    Waits for the provider's request and token budget and for a slot in the model's adaptive
+    concurrency limit, then charges the tokens actually used. The call itself, without the
+    waits, is recorded in the telemetry store. Streamed calls hold their slot until the
+    stream ends (see _StreamInSlot).
+    """
+    model = kwargs.get('model') or (args[0] if args else '')
+    provider = provider_of(model)
+    reserved = estimate_tokens(kwargs.get('messages'))
+    if rate_limiter is not None:
+        rate_limiter.acquire(provider, tokens=reserved)
+    with contextlib.ExitStack() as slot:
+        slot.enter_context(adaptive_slot(model))
+        if telemetry is not None:
+            response = telemetry.observe_completion(kwargs, lambda: original_completion(*args, **kwargs))
+        else:
+            response = original_completion(*args, **kwargs)
+        if kwargs.get('stream'):
+            return _StreamInSlot(response, slot.pop_all(), provider, reserved)
+    usage = getattr(response, 'usage', None)
+    if rate_limiter is not None and usage is not None:
+        rate_limiter.record_tokens(provider, (usage.total_tokens or 0) - reserved)
+    return response
+
 def patched_completion(*args, **kwargs):
     if 'stop' in kwargs:
         print("Removing 'stop' parameter from LiteLLM call...")
         kwargs.pop('stop')
-    return original_completion(*args, **kwargs)
+    # LLMs built with llm_cache=False opt their calls out of the cache
+    use_cache = kwargs.pop(CACHE_OPT_OUT_PARAM, True)
+    cacheable = llm_cache is not None and use_cache and not args and is_cacheable(kwargs)
+
+    if cacheable:
+        cache_key = make_cache_key(kwargs)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            logging.debug("LLM cache hit for model %s", kwargs.get('model'))
+            if telemetry is not None:
+                telemetry.record_cache_hit(kwargs)
+            return llm_cache.to_response(cached)
+
+    response = rate_limited_completion(*args, **kwargs)
+    if cacheable and has_content(response):
+        llm_cache.set(cache_key, kwargs.get('model', ''), response.model_dump())
+    return response
 
 litellm.completion = patched_completion
 
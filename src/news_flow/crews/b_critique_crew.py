@@ -3,6 +3,7 @@ from crewai.project import CrewBase, agent, crew, task
 from news_flow.types import CritiqueList
 from crewai.llm import LLM
 from news_flow.llm_configs import o4_mini_with_gpt4_1_fallback
+from news_flow.prompt_layout import task_config
 
 
 @CrewBase
@@ -16,14 +17,13 @@ class CritiqueCrew:
         return Agent(
             config=self.agents_config["editorial_analyst"],
             llm=o4_mini_with_gpt4_1_fallback(),
-            max_rpm=10,
             verbose=True
         )
 
     @task
     def critique_task(self) -> Task:
         return Task(
-            config=self.tasks_config["critique_task"],
+            config=task_config(self.tasks_config["critique_task"]),
             output_pydantic=CritiqueList,
         )
 
@@ -34,6 +34,7 @@ class CritiqueCrew:
         # https://docs.crewai.com/concepts/knowledge#what-is-knowledge
 
         return Crew(
+            name="CritiqueCrew",
             agents=self.agents,  # Automatically created by the @agent decorator
             tasks=self.tasks,  # Automatically created by the @task decorator
             process=Process.sequential,
@@ -1,8 +1,11 @@
+from typing import Any, Dict, List, TypeVar
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
+from pydantic import BaseModel
 from news_flow.types import NewsResearchPlan, Ideas, Datapoints, CounterArguments
 from crewai.llm import LLM
 from news_flow.llm_configs import o4_mini_with_gpt4_1_fallback
+from news_flow.prompt_layout import task_config
 
 
 @CrewBase
@@ -16,28 +19,27 @@ class PlanningCrew:
         return Agent(
             config=self.agents_config["editorial_analyst"],
             llm=o4_mini_with_gpt4_1_fallback(),
-            max_rpm=10,
             verbose=True
         )
 
     @task
     def elicit_key_ideas_task(self) -> Task:
         return Task(
-            config=self.tasks_config["elicit_key_ideas_task"],
+            config=task_config(self.tasks_config["elicit_key_ideas_task"]),
             output_pydantic=Ideas,
         )
     
     @task
     def elicit_datapoints_task(self) -> Task:
         return Task(
-            config=self.tasks_config["elicit_datapoints_task"],
+            config=task_config(self.tasks_config["elicit_datapoints_task"]),
             output_pydantic=Datapoints,
         )
     
     @task
     def create_counterarguments_task(self) -> Task:
         return Task(
-            config=self.tasks_config["create_counterarguments_task"],
+            config=task_config(self.tasks_config["create_counterarguments_task"]),
             output_pydantic=CounterArguments,
         )
     
@@ -55,8 +57,78 @@ class PlanningCrew:
         # https://docs.crewai.com/concepts/knowledge#what-is-knowledge
 
         return Crew(
+            name="PlanningCrew",
             agents=self.agents,  # Automatically created by the @agent decorator
             tasks=self.tasks,  # Automatically created by the @task decorator
             process=Process.sequential,
             verbose=True,
         )
+
+    # Alternatives to the four-task crew, selected with NewsState.planning_mode. Their tasks
+    # are not decorated with @task, so they do not end up in crew().
+
+    def single_pass_plan_task(self) -> Task:
+        return Task(
+            config=task_config(self.tasks_config["single_pass_plan_task"]),
+            output_pydantic=NewsResearchPlan,
+            name="single_pass_plan_task",
+        )
+
+    def single_pass_crew(self) -> Crew:
+        """Creates a crew that extracts the whole research plan in one structured call"""
+        return Crew(
+            name="PlanningCrew.single_pass",
+            agents=[self.editorial_analyst()],
+            tasks=[self.single_pass_plan_task()],
+            process=Process.sequential,
+            verbose=True,
+        )
+
+    def extraction_crews(self) -> Dict[str, Crew]:
+        """
+        Creates one single-task crew per extraction (key ideas, datapoints, counterarguments).
+        They can run in parallel; merge_research_plan combines their outputs without an LLM.
+        """
+        tasks = {
+            "key_ideas": self.elicit_key_ideas_task(),
+            "datapoints": self.elicit_datapoints_task(),
+            "counter_arguments": self.create_counterarguments_task(),
+        }
+        return {
+            part: Crew(
+                name=f"PlanningCrew.{part}", agents=[self.editorial_analyst()], tasks=[task],
+                process=Process.sequential, verbose=True,
+            )
+            for part, task in tasks.items()
+        }
+
+
+Items = TypeVar("Items", bound=BaseModel)
+
+
+def _unique(model: Items, field: str, text_field: str) -> Items:
+    """The model with the repeated items of its list field dropped, compared on their normalized text."""
+    seen = set()
+    items: List[Any] = []
+    for item in getattr(model, field):
+        key = " ".join(getattr(item, text_field).lower().split())
+        if key not in seen:
+            seen.add(key)
+            items.append(item)
+    return model.model_copy(update={field: items})
+
+
+def merge_research_plan(
+    inputs: Dict[str, Any], ideas: Ideas, datapoints: Datapoints, counter_arguments: CounterArguments
+) -> NewsResearchPlan:
+    """
+    The research plan of an article from the outputs of its extraction crews: what
+    consolidate_analysis_task does, without the LLM call. Title and url come from the inputs.
+    """
+    return NewsResearchPlan(
+        news_title=inputs["news_title"],
+        source_url=inputs["source"],
+        key_ideas=_unique(ideas, "ideas", "key_idea"),
+        key_datapoints=_unique(datapoints, "datapoints", "datapoint"),
+        counter_arguments=_unique(counter_arguments, "counter_arguments", "counter_argument"),
+    )
@@ -25,7 +25,6 @@ class ResearchCrew:
             config=self.agents_config["web_research_analyst"],
             llm=gemini_flash_with_gpt4_1_mini_fallback(),
             tools=[serper_search, firecrawl],
-            max_rpm=6, # to not overwhelm the firecrawl API
             verbose=True
         )
     
@@ -35,7 +34,6 @@ class ResearchCrew:
             config=self.agents_config["web_research_analyst_2"],
             llm=gpt4_1_mini_with_gemini_flash_fallback(),
             tools=[brave_search, tavily_scrape],
-            max_rpm=6, # to not overwhelm the tavily API
             verbose=True
         )
     
@@ -81,6 +79,7 @@ class ResearchCrew:
         # https://docs.crewai.com/concepts/knowledge#what-is-knowledge
 
         return Crew(
+            name="ResearchCrew",
             agents=self.agents,  # Automatically created by the @agent decorator
             tasks=self.tasks,  # Automatically created by the @task decorator
             process=Process.sequential,
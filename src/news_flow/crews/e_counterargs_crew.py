@@ -21,7 +21,6 @@ class CounterArgumentsCrew:
             config=self.agents_config["web_counter_analyst"],
             llm=gemini_flash_with_gpt4_1_mini_fallback(),
             tools=[serper_search, firecrawl],
-            max_rpm=4,
             verbose=True
         )
     
@@ -31,7 +30,6 @@ class CounterArgumentsCrew:
             config=self.agents_config["web_counter_analyst_2"],
             llm=gpt4_1_mini_with_gemini_flash_fallback(),
             tools=[brave_search, tavily_scrape],
-            max_rpm=4,
             verbose=True
         )
     
@@ -76,6 +74,7 @@ class CounterArgumentsCrew:
         # https://docs.crewai.com/concepts/knowledge#what-is-knowledge
 
         return Crew(
+            name="CounterArgsCrew",
             agents=self.agents,  # Automatically created by the @agent decorator
             tasks=self.tasks,  # Automatically created by the @task decorator
             process=Process.sequential,
@@ -2,6 +2,7 @@ from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 from crewai.llm import LLM
 from news_flow.llm_configs import o4_mini_high_reasoning
+from news_flow.flow_events import STREAM_WRITER_TOKENS
 from news_flow.tools import tavily_search, tavily_scrape
 
 # If you want to run a snippet of code before or after the crew starts,
@@ -19,7 +20,7 @@ class WriterCrew:
     def expert_writer(self) -> Agent:
         return Agent(
             config=self.agents_config["expert_writer"],
-            llm=o4_mini_high_reasoning(),
+            llm=o4_mini_high_reasoning(stream=STREAM_WRITER_TOKENS),
             verbose=True,
             max_iter=10,
             tools=[tavily_search, tavily_scrape],
@@ -38,6 +39,7 @@ class WriterCrew:
         # https://docs.crewai.com/concepts/knowledge#what-is-knowledge
 
         return Crew(
+            name="WriterCrew",
             agents=self.agents,  # Automatically created by the @agent decorator
             tasks=self.tasks,  # Automatically created by the @task decorator
             process=Process.sequential,
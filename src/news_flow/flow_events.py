@@ -0,0 +1,176 @@
+import contextlib
+import contextvars
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from crewai.events.event_bus import crewai_event_bus
+from crewai.events.types.flow_events import MethodExecutionFinishedEvent
+from crewai.events.types.llm_events import LLMStreamChunkEvent
+
+# Events kept per flow for subscribers that connect late or reconnect with Last-Event-ID
+MAX_EVENTS_PER_FLOW = 10_000
+# Logs of finished flows kept around for late subscribers, oldest dropped first
+MAX_CLOSED_FLOWS = 100
+
+# Set to 0/false/off to build the writer LLM without streaming (its calls can then use the response cache again)
+STREAM_WRITER_TOKENS = os.getenv("NEWS_FLOW_STREAM_WRITER", "1").lower() not in ("0", "false", "off", "no")
+
+# (flow id, step, item index, crew name) of the crew running in this thread or task; crew threads
+# started with asyncio.to_thread inherit it, so LLM stream chunks and calls can be traced to their flow
+_scope: contextvars.ContextVar[Optional[Tuple[str, str, Optional[int], Optional[str]]]] = contextvars.ContextVar(
+    "news_flow_event_scope", default=None
+)
+
+
+class FlowEventLog:
+    """Numbered events of one flow, appended by the flow's threads and read by any number of subscribers."""
+
+    def __init__(self, max_events: int = MAX_EVENTS_PER_FLOW):
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self.last_id = 0
+        self.closed = False
+        self.current_step: Optional[str] = None
+        self._condition = threading.Condition()
+
+    def append(self, event: str, data: Dict[str, Any]) -> None:
+        with self._condition:
+            self.last_id += 1
+            self.events.append({"id": self.last_id, "event": event, "data": data})
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def reopen(self) -> None:
+        with self._condition:
+            self.closed = False
+
+    def wait(self, after: int, timeout: float) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Events numbered after the given id, waiting up to timeout for the first one.
+        Also returns whether the log is closed, i.e. no more events will follow.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.last_id > after or self.closed, timeout=timeout)
+            return [event for event in self.events if event["id"] > after], self.closed
+
+
+class FlowEvents:
+    """
+    Registry of the event logs of the flows of this process, by flow id.
+
+    In a worker process, set forward to a callable (e.g. a multiprocessing queue's put) to
+    send every open, publish and close to the process serving the subscribers instead, which
+    passes them to apply().
+    """
+
+    def __init__(self, max_closed: int = MAX_CLOSED_FLOWS):
+        self.max_closed = max_closed
+        self.forward: Optional[Callable[[Tuple[Any, ...]], None]] = None
+        self._logs: "OrderedDict[str, FlowEventLog]" = OrderedDict()
+        # last current_step published by each running flow of this process
+        self._steps: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def log_for(self, flow_id: str) -> FlowEventLog:
+        with self._lock:
+            log = self._logs.get(flow_id)
+            if log is None:
+                log = self._logs[flow_id] = FlowEventLog()
+            return log
+
+    def get(self, flow_id: str) -> Optional[FlowEventLog]:
+        with self._lock:
+            return self._logs.get(flow_id)
+
+    def open(self, flow_id: str) -> None:
+        """Starts (or, for a resumed flow, continues) the log of a flow that is about to run."""
+        self._dispatch(("open", flow_id))
+
+    def publish(self, flow_id: str, event: str, **data: Any) -> None:
+        self._dispatch(("publish", flow_id, event, data))
+
+    def step(self, flow_id: str, current_step: str, method: str) -> None:
+        """Publishes a 'step' event if current_step differs from the last one published for the flow."""
+        with self._lock:
+            if self._steps.get(flow_id) == current_step:
+                return
+            self._steps[flow_id] = current_step
+        self.publish(flow_id, "step", current_step=current_step, method=method)
+
+    def close(self, flow_id: str) -> None:
+        """Marks the flow as finished so its subscribers end their streams."""
+        with self._lock:
+            self._steps.pop(flow_id, None)
+        self._dispatch(("close", flow_id))
+
+    def apply(self, message: Tuple[Any, ...]) -> None:
+        """Applies an open, publish or close of this process or one forwarded by a worker process."""
+        action, flow_id, *args = message
+        log = self.log_for(flow_id)
+        if action == "open":
+            log.reopen()
+            with self._lock:
+                self._logs.move_to_end(flow_id)
+        elif action == "publish":
+            event, data = args
+            if event == "step":
+                log.current_step = data["current_step"]
+            log.append(event, data)
+        elif action == "close":
+            log.close()
+            # drop the oldest finished logs
+            with self._lock:
+                closed = [key for key, log in self._logs.items() if log.closed]
+                for key in closed[:max(len(closed) - self.max_closed, 0)]:
+                    del self._logs[key]
+
+    def _dispatch(self, message: Tuple[Any, ...]) -> None:
+        if self.forward is not None:
+            self.forward(message)
+        else:
+            self.apply(message)
+
+
+flow_events = FlowEvents()
+
+
+@contextlib.contextmanager
+def event_scope(flow_id: str, step: str, item: Optional[int] = None, crew: Optional[str] = None) -> Iterator[None]:
+    """Attributes the LLM stream chunks and calls of the crew run inside the block to a flow, step and item."""
+    token = _scope.set((flow_id, step, item, crew))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def bind_event_scope(flow_id: str, step: str, item: Optional[int] = None, crew: Optional[str] = None) -> None:
+    """event_scope for the rest of the current asyncio task, for crews started from inside one."""
+    _scope.set((flow_id, step, item, crew))
+
+
+def current_scope() -> Optional[Tuple[str, str, Optional[int], Optional[str]]]:
+    """(flow id, step, item index, crew name) set by event_scope, None outside of a flow step."""
+    return _scope.get()
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _on_stream_chunk(source: Any, event: LLMStreamChunkEvent) -> None:
+    scope = _scope.get()
+    if scope is None or not scope[0] or not event.chunk:
+        return
+    flow_id, step, item, _ = scope
+    flow_events.publish(flow_id, "token", step=step, item=item, agent=event.agent_role, text=event.chunk)
+
+
+@crewai_event_bus.on(MethodExecutionFinishedEvent)
+def _on_method_finished(source: Any, event: MethodExecutionFinishedEvent) -> None:
+    flow_id = getattr(event.state, "id", None)
+    current_step = getattr(event.state, "current_step", None)
+    if flow_id and current_step:
+        flow_events.step(flow_id, current_step, event.method_name)
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Flow state fields a status can include; the list fields are returned a page at a time
+SUMMARY_FIELDS = ('current_step', 'topic', 'perspective', 'tone', 'flow_tokens', 'article_progress', 'stage_cache_stats')
+LIST_FIELDS = ('news_list', 'critiques', 'plan', 'news_evidence', 'counter_arguments', 'articles')
+# What a status includes when no fields are asked for
+DEFAULT_FIELDS = ('current_step', 'news_list', 'plan', 'news_evidence', 'counter_arguments', 'articles', 'flow_tokens')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Flows whose projection is kept in memory, least recently polled dropped first
+MAX_CACHED_FLOWS = 64
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Fields of a comma-separated ?fields= value, or the default ones. Raises ValueError for unknown fields."""
+    if not fields:
+        return DEFAULT_FIELDS
+    selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in selected if field not in SUMMARY_FIELDS + LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Expected any of: {', '.join(SUMMARY_FIELDS + LIST_FIELDS)}")
+    return selected
+
+
+class StatusProjection:
+    """The parts of a persisted flow state a status poll can return, with the item count of each list."""
+
+    def __init__(self, state: Optional[Dict[str, Any]]):
+        state = state or {}
+        self.summary = {field: state.get(field) for field in SUMMARY_FIELDS}
+        news_list = state.get('news_list')
+        self.has_news_list = news_list is not None
+        self.lists: Dict[str, List[Any]] = {
+            field: (news_list or {}).get('news_list', []) if field == 'news_list' else state.get(field) or []
+            for field in LIST_FIELDS
+        }
+
+    def render(self, fields: Sequence[str], offset: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """
+        The selected fields, each list field cut to items [offset, offset + limit). 'pages'
+        holds the total of every list returned, so clients can ask for the next page.
+        """
+        body: Dict[str, Any] = {}
+        pages = {}
+        for field in fields:
+            if field in SUMMARY_FIELDS:
+                body[field] = self.summary[field]
+                continue
+            items = self.lists[field]
+            page = items[offset:offset + limit]
+            # news_list keeps the shape of the NewsList model
+            body[field] = ({'news_list': page} if self.has_news_list else None) if field == 'news_list' else page
+            pages[field] = {"offset": offset, "limit": limit, "total": len(items)}
+        if pages:
+            body["pages"] = pages
+        return body
+
+
+class FlowStatusCache:
+    """
+    Status projections of persisted flows, rebuilt only when the flow saves a new state.
+
+    version() reads the flow's head (method and timestamp of its last save) without touching
+    the state, so polls of a flow that has not moved cost one primary key lookup; get()
+    rebuilds the projection from the full state once per new version.
+    """
+
+    def __init__(self, persistence: Any, max_flows: int = MAX_CACHED_FLOWS):
+        self.persistence = persistence
+        self.max_flows = max_flows
+        self._projections: "OrderedDict[str, Tuple[Any, StatusProjection]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(self, flow_id: str) -> Optional[Tuple[str, str]]:
+        version = self.persistence.head_version(flow_id)
+        return tuple(version) if version is not None else None
+
+    def get(self, flow_id: str, version: Optional[Tuple[str, str]]) -> StatusProjection:
+        with self._lock:
+            cached = self._projections.get(flow_id)
+            if cached is not None and version is not None and cached[0] == version:
+                self._projections.move_to_end(flow_id)
+                return cached[1]
+        projection = StatusProjection(self.persistence.load_state(flow_id))
+        if version is not None:
+            with self._lock:
+                self._projections[flow_id] = (version, projection)
+                self._projections.move_to_end(flow_id)
+                while len(self._projections) > self.max_flows:
+                    self._projections.popitem(last=False)
+        return projection
@@ -0,0 +1,569 @@
+import contextlib
+import importlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+from news_flow.flow_events import flow_events
+from news_flow.utils import data_path
+
+# Job statuses; queued and running jobs are active. An attached job runs no flow of its own:
+# it follows the job (its leader) that runs or ran the same request
+QUEUED, RUNNING, COMPLETED, FAILED, ATTACHED = "queued", "running", "completed", "failed", "attached"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Duration assumed for a job before any has completed (a full flow takes 30-40 minutes)
+DEFAULT_JOB_SECONDS = 1800.0
+# Completed jobs averaged to estimate the Retry-After of a rejected submission
+DURATION_SAMPLE = 20
+MAX_RETRY_AFTER = 600
+
+# How often the pool checks that its worker processes are alive
+SUPERVISE_INTERVAL = 5.0
+# Exit code of a worker that stopped its flow because another worker took over the job
+LOST_LEASE_EXIT_CODE = 75
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_queued jobs are already waiting."""
+
+    def __init__(self, queued: int, retry_after: int):
+        super().__init__(f"{queued} jobs are already queued, retry in {retry_after}s")
+        self.queued = queued
+        self.retry_after = retry_after
+
+
+class JobExists(Exception):
+    """Raised by JobQueue.submit when a finished job already has the id and replacing it was not asked for."""
+
+    def __init__(self, job_id: str, status: str):
+        super().__init__(f"job {job_id} already exists ({status})")
+        self.job_id = job_id
+        self.status = status
+
+
+class JobQueue(ABC):
+    """
+    Queue of flow runs shared by every replica of the service and their worker processes.
+
+    submit() admits a job only while fewer than max_queued jobs wait, and raises QueueFull
+    otherwise. Workers claim() the oldest queued job under a lease of lease_seconds, renew it
+    with heartbeat() while the flow runs and then complete() or fail() it. A job whose lease
+    runs out (its worker or whole replica died) is claimed again by any worker; since the
+    flow saves its state after every step, the rerun resumes where the job stopped. A job
+    is failed instead once it has been started max_attempts times.
+
+    Jobs submitted with a request key are coalesced: while a job with the same key is active,
+    or completed less than result_ttl seconds ago, a new job is attached to it instead of
+    running its own flow. get() reports an attached job with the status of its leader and
+    the leader's id under 'leader', whose flow state holds the result.
+
+    Worker ids must be unique across replicas. Implementations are pickled into the worker
+    processes, so they should hold configuration only and connect on use.
+    """
+
+    def __init__(self, max_queued: int = 20, max_attempts: int = 3, lease_seconds: float = 60.0, result_ttl: float = 3600.0):
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+
+    @abstractmethod
+    def submit(self, job_id: str, inputs: Dict[str, Any], key: Optional[str] = None, replace: bool = False) -> Dict[str, Any]:
+        """
+        Queues a run of the flow with the given inputs and returns the job. A job with the
+        same id that is still queued or running is returned as is; a finished one is replaced
+        when replace is set (to rerun its flow) and raises JobExists otherwise.
+        With a key, the job is attached to an active or recently completed job with that key
+        if there is one; attached jobs take no place in the queue. Jobs attached to a leader
+        that is replaced with another key stop following it and report their result expired.
+        """
+
+    @abstractmethod
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Leases the oldest queued (or expired) job to the worker and returns it, or None if there is none."""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Extends the worker's lease on the job. False if the worker no longer holds it."""
+
+    @abstractmethod
+    def complete(self, job_id: str, worker: str) -> bool:
+        """Marks the job completed, if the worker still holds its lease."""
+
+    @abstractmethod
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        """Marks the job failed, if the worker still holds its lease."""
+
+    @abstractmethod
+    def recover(self, worker: str) -> List[str]:
+        """
+        Puts the running jobs of a worker known to be dead back in the queue right away,
+        without waiting for their leases to run out. Returns the ids of the requeued jobs.
+        """
+
+    @abstractmethod
+    def release(self, worker: str) -> List[str]:
+        """Puts the running jobs of a worker stopped on purpose back in the queue without counting the attempt."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job, with its place in the queue (0 is next) while it is queued."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Jobs by status and the admission limit."""
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Reference JobQueue in one SQLite file, for replicas that share a machine (or a volume
+    with working file locks). Every change runs in a BEGIN IMMEDIATE transaction, so
+    check-then-write steps such as admission and claiming are atomic across processes.
+    Expired leases are reclaimed by claim() itself, so no replica has to sweep them.
+    """
+
+    def __init__(self, db_path: str = "jobs.db", **options: Any):
+        super().__init__(**options)
+        self.db_path = db_path
+        self.init_db()
+
+    def init_db(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                inputs_json TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                lease_expires_at REAL,
+                request_key TEXT,
+                leader_id TEXT
+            )
+            """
+            )
+            # queues created before leases and coalescing existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column in ("lease_expires_at REAL", "request_key TEXT", "leader_id TEXT"):
+                if column.split()[0] not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_request_key ON jobs (request_key, created_at)")
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction that takes the database lock up front, so check-then-write is atomic across processes."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def submit(self, job_id: str, inputs: Dict[str, Any], key: Optional[str] = None, replace: bool = False) -> Dict[str, Any]:
+        with self._transaction() as conn:
+            job = self._resolve(conn, self._get(conn, job_id))
+            if job is not None and job["status"] in ACTIVE_STATUSES:
+                return job
+            if job is not None and not replace:
+                raise JobExists(job_id, job["status"])
+            now = time.time()
+            leader = self._leader_for(conn, key, now) if key is not None else None
+            if leader is not None and leader != job_id:
+                conn.execute(
+                    """
+            INSERT OR REPLACE INTO jobs (id, status, inputs_json, created_at, request_key, leader_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                    (job_id, ATTACHED, json.dumps(inputs), now, key, leader),
+                )
+                logging.info("Job %s attached to job %s with the same request", job_id, leader)
+                return self._resolve(conn, self._get(conn, job_id))
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFull(queued, self._retry_after(conn))
+            if key is None and job is not None and job["leader"] is None:
+                # rerunning a job by id alone continues the same flow, so it still answers the same request
+                key = job["request_key"]
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, inputs_json, created_at, request_key) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(inputs), now, key),
+            )
+            return self._get(conn, job_id)
+
+    def _leader_for(self, conn: sqlite3.Connection, key: str, now: float) -> Optional[str]:
+        """Newest job with the key that is queued, running or completed within result_ttl."""
+        row = conn.execute(
+            """
+            SELECT id FROM jobs
+            WHERE request_key = ? AND leader_id IS NULL
+              AND (status IN (?, ?) OR (status = ? AND finished_at >= ?))
+            ORDER BY created_at DESC LIMIT 1
+            """,
+            (key, QUEUED, RUNNING, COMPLETED, now - self.result_ttl),
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        with self._transaction() as conn:
+            now = time.time()
+            expired = conn.execute(
+                "SELECT id, worker FROM jobs WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+                (RUNNING, now),
+            ).fetchall()
+            for job_id, owner in expired:
+                logging.warning("Lease of job %s held by %s expired", job_id, owner)
+            self._requeue(conn, [job_id for job_id, _ in expired])
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """
+            UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?,
+                lease_expires_at = ?, error = NULL
+            WHERE id = ?
+            """,
+                (RUNNING, worker, now, now + self.lease_seconds, row[0]),
+            )
+            return self._get(conn, row[0])
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time() + self.lease_seconds, job_id, worker, RUNNING),
+            ).rowcount > 0
+
+    def complete(self, job_id: str, worker: str) -> bool:
+        return self._finish(job_id, worker, COMPLETED, None)
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        return self._finish(job_id, worker, FAILED, error)
+
+    def _finish(self, job_id: str, worker: str, status: str, error: Optional[str]) -> bool:
+        with self._transaction() as conn:
+            return conn.execute(
+                """
+            UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL
+            WHERE id = ? AND worker = ? AND status = ?
+            """,
+                (status, error, time.time(), job_id, worker, RUNNING),
+            ).rowcount > 0
+
+    def recover(self, worker: str) -> List[str]:
+        with self._transaction() as conn:
+            job_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND worker = ?", (RUNNING, worker)
+            ).fetchall()]
+            return self._requeue(conn, job_ids)
+
+    def _requeue(self, conn: sqlite3.Connection, job_ids: List[str]) -> List[str]:
+        """Puts interrupted jobs back in the queue, ahead of newer jobs, or fails those out of attempts."""
+        requeued = []
+        for job_id in job_ids:
+            attempts = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL WHERE id = ?",
+                    (FAILED, f"interrupted {attempts} times", time.time(), job_id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, lease_expires_at = NULL WHERE id = ?", (QUEUED, job_id)
+                )
+                requeued.append(job_id)
+        return requeued
+
+    def release(self, worker: str) -> List[str]:
+        with self._transaction() as conn:
+            job_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND worker = ?", (RUNNING, worker)
+            ).fetchall()]
+            conn.execute(
+                """
+            UPDATE jobs SET status = ?, worker = NULL, lease_expires_at = NULL, attempts = attempts - 1
+            WHERE status = ? AND worker = ?
+            """,
+                (QUEUED, RUNNING, worker),
+            )
+        return job_ids
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            job = self._resolve(conn, self._get(conn, job_id))
+            if job is not None and job["status"] == QUEUED:
+                job["position"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (QUEUED, job["created_at"])
+                ).fetchone()[0]
+            return job
+
+    def stats(self) -> Dict[str, Any]:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        stats = {status: counts.get(status, 0) for status in (QUEUED, RUNNING, COMPLETED, FAILED, ATTACHED)}
+        stats["max_queued"] = self.max_queued
+        return stats
+
+    @staticmethod
+    def _get(conn: sqlite3.Connection, job_id: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute(
+            """
+            SELECT id, status, inputs_json, attempts, worker, error, created_at, started_at, finished_at,
+                lease_expires_at, request_key, leader_id
+            FROM jobs WHERE id = ?
+            """,
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = (
+            "id", "status", "inputs", "attempts", "worker", "error", "created_at", "started_at", "finished_at",
+            "lease_expires_at", "request_key", "leader",
+        )
+        job = dict(zip(keys, row))
+        job["inputs"] = json.loads(job["inputs"])
+        return job
+
+    def _resolve(self, conn: sqlite3.Connection, job: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        An attached job as seen by its clients: its leader's progress under its own id and
+        inputs. A leader since resubmitted with another request no longer holds the result.
+        """
+        if job is None or job["leader"] is None:
+            return job
+        leader = self._get(conn, job["leader"])
+        if leader is None:
+            return dict(job, status=FAILED, error=f"leader job {job['leader']} no longer exists")
+        if leader["request_key"] != job["request_key"]:
+            return dict(job, status=FAILED, error=f"result of job {leader['id']} expired: it was resubmitted with another request")
+        return dict(leader, id=job["id"], inputs=job["inputs"], leader=leader["id"])
+
+    def _retry_after(self, conn: sqlite3.Connection) -> int:
+        """Seconds until a queued job is likely to start: the average job duration spread over the running jobs."""
+        durations = [row[0] for row in conn.execute(
+            "SELECT finished_at - started_at FROM jobs WHERE status = ? ORDER BY finished_at DESC LIMIT ?",
+            (COMPLETED, DURATION_SAMPLE),
+        )]
+        average = sum(durations) / len(durations) if durations else DEFAULT_JOB_SECONDS
+        running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (RUNNING,)).fetchone()[0]
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(average / max(running, 1))))
+
+
+def _heartbeat(queue: JobQueue, job_id: str, worker: str, done: threading.Event) -> None:
+    """
+    Renews the lease of a running job until done is set, three times per lease. A worker
+    that lost the lease (it stalled past it and the job was claimed again) exits right away:
+    the new holder reruns the flow, and running both would pay for the same LLM calls twice
+    and interleave writes to the flow's persisted state. The pool starts a new worker.
+    A renewal that fails on a database error (a lock held too long under load) is retried,
+    and the worker only exits once its lease has run out without being renewed.
+    """
+    expires = time.monotonic() + queue.lease_seconds
+    interval = queue.lease_seconds / 3
+    while not done.wait(interval):
+        try:
+            renewed = queue.heartbeat(job_id, worker)
+        except sqlite3.Error:
+            if time.monotonic() < expires:
+                logging.warning("Could not renew the lease of job %s, retrying", job_id, exc_info=True)
+                # the last retry falls due when the lease runs out
+                interval = min(queue.lease_seconds / 3, max(expires - time.monotonic(), 0.0))
+                continue
+            if done.is_set():
+                return
+            logging.exception("Could not renew the lease of job %s before it ran out, stopping this worker", job_id)
+            os._exit(LOST_LEASE_EXIT_CODE)
+        if not renewed and not done.is_set():
+            logging.error("Lost the lease of job %s to another worker, stopping this worker", job_id)
+            os._exit(LOST_LEASE_EXIT_CODE)
+        expires = time.monotonic() + queue.lease_seconds
+        interval = queue.lease_seconds / 3
+
+
+def _worker_main(name: str, queue: JobQueue, events: Any, stop: Any, poll_interval: float) -> None:
+    """Worker process: runs queued flows one at a time and sends their events to the pool through the events pipe."""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - {name} - %(levelname)s - %(message)s')
+    # imported here so importing the queue alone does not load every crew and tool; the API
+    # process has them loaded already (through flow_persistence), spawned workers load them here
+    from news_flow.main import NewsFlow, flow_persistence
+
+    # crews of a flow run on several threads, and a pipe end is not thread-safe
+    send_lock = threading.Lock()
+
+    def forward(message):
+        with send_lock:
+            events.send(message)
+
+    flow_events.forward = forward
+    # a worker whose replica died finishes its flow but takes no new jobs
+    parent = multiprocessing.parent_process()
+    while not stop.is_set() and (parent is None or parent.is_alive()):
+        job = queue.claim(name)
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        logging.info("Starting job %s (attempt %d)", job["id"], job["attempts"])
+        done = threading.Event()
+        threading.Thread(target=_heartbeat, args=(queue, job["id"], name, done), name="job-heartbeat", daemon=True).start()
+        flow_events.open(job["id"])
+        error = None
+        try:
+            NewsFlow().kickoff(inputs=job["inputs"])
+        except Exception as e:
+            logging.exception("Job %s failed", job["id"])
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            # set before the job is finished, so a heartbeat failing on the finished job does not stop the worker
+            done.set()
+        try:
+            # the final state must be readable before the job shows as completed
+            flow_persistence.flush()
+            finished = queue.fail(job["id"], name, error) if error is not None else queue.complete(job["id"], name)
+        finally:
+            flow_events.close(job["id"])
+        if not finished:
+            logging.warning("Job %s was reclaimed by another worker before it finished here", job["id"])
+
+
+class WorkerPool:
+    """
+    Fixed pool of worker processes running the jobs of a JobQueue, at most one flow each.
+    Every replica of the service runs its own pool on the shared queue; worker ids are
+    prefixed with replica_id (host name, process id and a random suffix by default).
+
+    Flow events of the workers are relayed to this process's flow_events, so event streams
+    can be served from here. Each worker has its own pipe, so a worker killed halfway through
+    sending cannot block the others. A supervisor thread requeues the jobs of workers that
+    die and starts replacements.
+    """
+
+    def __init__(self, queue: JobQueue, workers: int = 2, poll_interval: float = 1.0, replica_id: Optional[str] = None):
+        self.queue = queue
+        self.replica_id = replica_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.workers = workers
+        self.poll_interval = poll_interval
+        # spawn, not fork: the API process runs threads (persistence writer, HTTP pools)
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[str, Any] = {}
+        self._stop = self._context.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._spawn(f"{self.replica_id}/worker-{index}")
+        self._start_thread(self._supervise, "job-worker-supervisor")
+        logging.info("Started %d job workers on replica %s", self.workers, self.replica_id)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Lets idle workers exit, terminates busy ones after timeout and puts their jobs back in the queue."""
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for name, process in self._processes.items():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            released = self.queue.release(name)
+            if released:
+                logging.info("Requeued jobs %s of stopped %s", released, name)
+        # relay threads end when their worker's pipe closes
+        for thread in self._threads:
+            thread.join(SUPERVISE_INTERVAL)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {"pid": process.pid, "alive": process.is_alive()} for name, process in self._processes.items()}
+
+    def _start_thread(self, target: Any, name: str, *args: Any) -> None:
+        thread = threading.Thread(target=target, name=name, args=args, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _spawn(self, name: str) -> None:
+        reader, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(name, self.queue, writer, self._stop, self.poll_interval),
+            name=name,
+            daemon=True,
+        )
+        process.start()
+        # only the worker holds the write end now, so the reader sees EOF when it exits
+        writer.close()
+        self._processes[name] = process
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        self._start_thread(self._relay_events, f"job-events-{name}", reader)
+
+    @staticmethod
+    def _relay_events(reader: Any) -> None:
+        with reader:
+            while True:
+                try:
+                    message = reader.recv()
+                except (EOFError, OSError):
+                    return
+                flow_events.apply(message)
+
+    def _supervise(self) -> None:
+        while not self._stop.wait(SUPERVISE_INTERVAL):
+            for name, process in list(self._processes.items()):
+                if process.is_alive() or self._stop.is_set():
+                    continue
+                requeued = self.queue.recover(worker=name)
+                logging.warning("%s exited with code %s, requeued jobs %s", name, process.exitcode, requeued)
+                self._spawn(name)
+
+
+def job_queue_from_env() -> JobQueue:
+    """
+    Builds the job queue from the environment:
+    - NEWS_FLOW_JOB_BACKEND: 'sqlite' (default) or the 'module:Class' of another JobQueue,
+      which is built with the options below
+    - NEWS_FLOW_JOBS_DB: SQLite file of the queue (jobs.db under NEWS_FLOW_DATA_DIR by default)
+    - NEWS_FLOW_QUEUE_MAX: jobs allowed to wait before submissions are rejected (20 by default)
+    - NEWS_FLOW_JOB_MAX_ATTEMPTS: times an interrupted job is started before it is failed (3 by default)
+    - NEWS_FLOW_JOB_LEASE: seconds a job stays claimed without a heartbeat (60 by default)
+    - NEWS_FLOW_RESULT_TTL: seconds a completed job answers identical requests (3600 by default, 0 turns it off)
+    """
+    options = dict(
+        max_queued=int(os.getenv("NEWS_FLOW_QUEUE_MAX", 20)),
+        max_attempts=int(os.getenv("NEWS_FLOW_JOB_MAX_ATTEMPTS", 3)),
+        lease_seconds=float(os.getenv("NEWS_FLOW_JOB_LEASE", 60)),
+        result_ttl=float(os.getenv("NEWS_FLOW_RESULT_TTL", 3600)),
+    )
+    backend = os.getenv("NEWS_FLOW_JOB_BACKEND", "sqlite")
+    if backend == "sqlite":
+        return SQLiteJobQueue(db_path=os.getenv("NEWS_FLOW_JOBS_DB", data_path("jobs.db")), **options)
+    module_name, _, class_name = backend.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)(**options)
+
+
+def worker_pool_from_env(queue: JobQueue) -> WorkerPool:
+    """
+    Worker pool for the given queue:
+    - NEWS_FLOW_WORKERS: worker processes of this replica (2 by default)
+    - NEWS_FLOW_REPLICA_ID: name of this replica in worker ids (generated by default)
+    """
+    return WorkerPool(queue, workers=int(os.getenv("NEWS_FLOW_WORKERS", 2)), replica_id=os.getenv("NEWS_FLOW_REPLICA_ID"))
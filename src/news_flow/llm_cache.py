@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import litellm
+from pydantic import BaseModel
+
+from news_flow.utils import data_path
+
+# Parameters that change what the model answers. Everything else (api keys, timeouts,
+# retries, fallbacks) is left out of the key so it does not split identical calls.
+CACHE_KEY_PARAMS = (
+    "model",
+    "messages",
+    "tools",
+    "tool_choice",
+    "functions",
+    "temperature",
+    "top_p",
+    "n",
+    "stop",
+    "max_tokens",
+    "max_completion_tokens",
+    "presence_penalty",
+    "frequency_penalty",
+    "logit_bias",
+    "response_format",
+    "seed",
+    "reasoning_effort",
+    "base_url",
+    "api_base",
+)
+
+# Keyword argument that turns the cache off for the calls of a single LLM, e.g. LLM(..., llm_cache=False)
+CACHE_OPT_OUT_PARAM = "llm_cache"
+
+
+def _json_default(value: Any) -> Any:
+    """Makes pydantic classes/instances (e.g. response_format) hashable in a stable way."""
+    if isinstance(value, type) and issubclass(value, BaseModel):
+        return value.model_json_schema()
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return str(value)
+
+
+def make_cache_key(params: Dict[str, Any]) -> str:
+    """Content address of a completion call: sha256 over the parameters that shape the answer."""
+    keyed = {name: params[name] for name in CACHE_KEY_PARAMS if params.get(name) is not None}
+    payload = json.dumps(keyed, sort_keys=True, default=_json_default, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent SQLite cache of LiteLLM completion responses.
+
+    Entries expire after ttl_seconds and, once the stored responses go over max_bytes,
+    the least recently used ones are evicted.
+    """
+
+    def __init__(self, db_path: str = "llm_cache.db", ttl_seconds: int = 7 * 24 * 3600, max_bytes: int = 512 * 1024 * 1024):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "saved_prompt_tokens": 0, "saved_completion_tokens": 0}
+        self.init_db()
+
+    def init_db(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response_json TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+            )
+            conn.execute(
+                """
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access
+            ON llm_cache(last_access)
+            """
+            )
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored response dict, or None on a miss or an expired entry."""
+        now = time.time()
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            row = conn.execute(
+                "SELECT response_json, created_at FROM llm_cache WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (cache_key,))
+                row = None
+            if row is None:
+                self._count("misses")
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, cache_key))
+        self._count("hits")
+        return json.loads(row[0])
+
+    def set(self, cache_key: str, model: str, response: Dict[str, Any]) -> None:
+        response_json = json.dumps(response, default=_json_default)
+        now = time.time()
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                """
+            INSERT OR REPLACE INTO llm_cache (cache_key, model, response_json, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                (cache_key, model, response_json, len(response_json), now, now),
+            )
+            self._evict(conn)
+        self._count("stores")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drops expired entries, then least recently used ones until the cache fits in max_bytes."""
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for cache_key, size in conn.execute("SELECT cache_key, size FROM llm_cache ORDER BY last_access ASC"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((cache_key,))
+            total -= size
+        conn.executemany("DELETE FROM llm_cache WHERE cache_key = ?", evicted)
+        self._count("evictions", len(evicted))
+
+    def to_response(self, data: Dict[str, Any]) -> litellm.ModelResponse:
+        """
+        Rebuilds a ModelResponse from a cache entry. Usage is zeroed so replayed calls do not
+        count as spent tokens; what they would have cost is added to the stats instead.
+        """
+        response = litellm.ModelResponse(**data)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._count("saved_prompt_tokens", usage.prompt_tokens or 0)
+            self._count("saved_completion_tokens", usage.completion_tokens or 0)
+        response.usage = litellm.Usage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+        return response
+
+    def clear(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[stat] += amount
+
+
+def is_cacheable(params: Dict[str, Any]) -> bool:
+    """Streaming calls go straight to the provider."""
+    return not params.get("stream")
+
+
+def has_content(response: Any) -> bool:
+    """Only responses with text or tool calls are worth replaying."""
+    choices = getattr(response, "choices", None)
+    if not choices:
+        return False
+    message = getattr(choices[0], "message", None)
+    return bool(getattr(message, "content", None) or getattr(message, "tool_calls", None))
+
+
+def cache_from_env() -> Optional[LLMResponseCache]:
+    """
+    Builds the process-wide cache from the environment:
+    - NEWS_FLOW_LLM_CACHE: set to 0/false/off to disable the cache (enabled by default)
+    - NEWS_FLOW_LLM_CACHE_PATH: SQLite file (default llm_cache.db under NEWS_FLOW_DATA_DIR)
+    - NEWS_FLOW_LLM_CACHE_TTL: seconds an entry stays valid (default 7 days)
+    - NEWS_FLOW_LLM_CACHE_MAX_MB: size budget before LRU eviction (default 512)
+    """
+    if os.getenv("NEWS_FLOW_LLM_CACHE", "1").lower() in ("0", "false", "off", "no"):
+        logging.info("LLM response cache disabled")
+        return None
+    return LLMResponseCache(
+        db_path=os.getenv("NEWS_FLOW_LLM_CACHE_PATH", data_path("llm_cache.db")),
+        ttl_seconds=int(os.getenv("NEWS_FLOW_LLM_CACHE_TTL", 7 * 24 * 3600)),
+        max_bytes=int(float(os.getenv("NEWS_FLOW_LLM_CACHE_MAX_MB", 512)) * 1024 * 1024),
+    )
+
@@ -1,10 +1,14 @@
 from crewai.llm import LLM
 
-def o4_mini_with_gemini_flash_fallback():
+# Installs the litellm.completion wrapper that serves the response cache and consumes llm_cache
+import news_flow.crewai_extensions  # noqa: F401
+
+def o4_mini_with_gemini_flash_fallback(llm_cache: bool = True):
     """
     LLM Configuration:
     - Model: openai/o4-mini
     - Retries: 3
+    - Response cache: on, pass llm_cache=False to opt the tasks of this LLM out
     - Fallbacks:
         1. openrouter/google/gemini-2.5-flash-preview (via OpenRouter)
         2. openai/gpt-4o
@@ -12,6 +16,7 @@ def o4_mini_with_gemini_flash_fallback():
     return LLM(
         model="openai/o4-mini", 
         num_retries=3,
+        llm_cache=llm_cache,
         fallbacks=[
             {
                 "model": "openrouter/google/gemini-2.5-flash-preview",
@@ -23,11 +28,12 @@ def o4_mini_with_gemini_flash_fallback():
         ],
     )
 
-def gemini_flash_with_gpt4_1_mini_fallback():
+def gemini_flash_with_gpt4_1_mini_fallback(llm_cache: bool = True):
     """
     LLM Configuration:
     - Model: openrouter/google/gemini-2.5-flash-preview (via OpenRouter)
     - Retries: 3
+    - Response cache: on, pass llm_cache=False to opt the tasks of this LLM out
     - Fallbacks:
         1. openai/gpt-4.1-mini
         2. groq/llama-3.3-70b-versatile
@@ -36,6 +42,7 @@ def gemini_flash_with_gpt4_1_mini_fallback():
         model="openrouter/google/gemini-2.5-flash-preview", 
         base_url="https://openrouter.ai/api/v1",
         num_retries=3,
+        llm_cache=llm_cache,
         fallbacks=[
             {
                 "model": "openai/gpt-4.1-mini",
@@ -46,17 +53,19 @@ def gemini_flash_with_gpt4_1_mini_fallback():
         ],
     )
 
-def o4_mini_with_gpt4_1_fallback():
+def o4_mini_with_gpt4_1_fallback(llm_cache: bool = True):
     """
     LLM Configuration:
     - Model: openai/o4-mini
     - Retries: 3
+    - Response cache: on, pass llm_cache=False to opt the tasks of this LLM out
     - Fallbacks:
         1. openai/gpt-4.1
     """
     return LLM(
         model="openai/o4-mini",
         num_retries=3,
+        llm_cache=llm_cache,
         fallbacks=[
             {
                 "model": "openai/gpt-4.1"
@@ -64,11 +73,12 @@ def o4_mini_with_gpt4_1_fallback():
         ],
     )
 
-def gpt4_1_mini_with_gemini_flash_fallback():
+def gpt4_1_mini_with_gemini_flash_fallback(llm_cache: bool = True):
     """
     LLM Configuration:
     - Model: openai/gpt-4.1-mini
     - Retries: 3
+    - Response cache: on, pass llm_cache=False to opt the tasks of this LLM out
     - Fallbacks:
         1. openrouter/google/gemini-2.5-flash-preview (via OpenRouter)
         2. groq/llama-3.3-70b-versatile
@@ -76,6 +86,7 @@ def gpt4_1_mini_with_gemini_flash_fallback():
     return LLM(
         model="openai/gpt-4.1-mini", 
         num_retries=3,
+        llm_cache=llm_cache,
         fallbacks=[
             {
                 "model": "openrouter/google/gemini-2.5-flash-preview",
@@ -87,13 +98,17 @@ def gpt4_1_mini_with_gemini_flash_fallback():
         ],
     )
 
-def o4_mini_high_reasoning():
+def o4_mini_high_reasoning(llm_cache: bool = True, stream: bool = False):
     """
     LLM Configuration:
     - Model: openai/o4-mini
     - Reasoning Effort: high
+    - Response cache: on, pass llm_cache=False to opt the tasks of this LLM out
+    - Streaming: off, pass stream=True to emit the tokens as they are generated (streamed calls skip the cache)
     """
     return LLM(
         model='openai/o4-mini',
         reasoning_effort="high",
+        llm_cache=llm_cache,
+        stream=stream,
     ) 
\ No newline at end of file
@@ -1,21 +1,36 @@
 # Standard Library Imports
+import asyncio
 import json
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Literal, Optional
 
 # Third-Party Imports (CrewAI, Pydantic, etc.)
 from pydantic import BaseModel
+from crewai import Crew, CrewOutput
+from crewai.types.usage_metrics import UsageMetrics
 from crewai.flow import Flow, listen, start, persist, router, or_
 
 # Application-Specific Imports (News Flow Modules)
 from news_flow.crews import *
+from news_flow.crews.c_planning_crew import merge_research_plan
 from news_flow.types import (
-    NewsList, NewsResearchPlan, SupportingEvidence, CounterArgumentSources, CritiqueList
+    NewsList, NewsWithSources, NewsResearchPlan, SupportingEvidence, CounterArgumentSources, CritiqueList
 )
 
+from news_flow.tools import search_cache, scrape_cache
+from news_flow.transport import configure_transport
+from news_flow.adaptive_concurrency import adaptive_concurrency
+from news_flow.flow_events import bind_event_scope, event_scope, flow_events
+from news_flow.stage_cache import crew_fingerprint, stage_cache
+from news_flow.content_compaction import content_compactor, count_tokens
+from news_flow.prompt_layout import article_context
+from news_flow.telemetry import telemetry
+
 # Local Module Imports (Helper Functions)
 from news_flow.utils import (
     calculate_tokens_usage,
+    data_path,
+    input_hash,
     save_flow_step_output,
     consolidate_news_json,
     cleanup_consolidated_json,
@@ -23,7 +38,7 @@ from news_flow.utils import (
 
 # --- Apply Patches ---
 # Patch SQLite persistence for robust JSON handling
-from news_flow.crewai_extensions import SQLiteFlowPersistenceJSON
+from news_flow.crewai_extensions import flow_persistence_from_env, kickoff_for_each_bounded, llm_cache
 # Patch LiteLLM completion to handle empty responses
 # import news_flow.crewai_extensions # IMPORTANT: Importing this executes the patch
 # if not news_flow.crewai_extensions.is_litellm_patched():
@@ -56,24 +71,63 @@ class NewsState(BaseModel):
     current_date: str = ''
     language: str = 'en' # TODO not being used yet
     current_step: str = ''  # New field to track the current step
+    fan_out: bool = True # dispatch all per-item crews of a step together instead of one by one
+    max_concurrent_crews: int = 4 # cap on crews running at the same time in fan-out and pipeline mode
+    pipeline: bool = False # run each article through critique -> plan -> research/counterargs -> write on its own
+    # 'crew': four sequential planning tasks, 'single_pass': one structured call per article,
+    # 'parallel': key ideas, datapoints and counterarguments as three parallel calls merged locally
+    planning_mode: Literal['crew', 'single_pass', 'parallel'] = 'crew'
+    article_progress: Dict[str, str] = {} # last finished step of each article in pipeline mode
+    item_checkpoints: Dict[str, Dict[str, Any]] = {} # finished crew outputs of unfinished steps, by step and input hash
+    stage_cache_stats: Dict[str, Dict[str, int]] = {} # crews of each step answered from the stage cache (hits) or run (misses)
+
+# Article steps in order, with the state field each one fills in
+STEP_OUTPUTS = {
+    'critique_news': 'critiques',
+    'plan_research': 'plan',
+    'research_news': 'news_evidence',
+    'counter_args': 'counter_arguments',
+    'write_articles': 'articles',
+}
+STEP_ORDER = list(STEP_OUTPUTS)
+
+# Router output that makes the flow continue after each finished step. Router outputs trigger
+# the listeners of the method with the same name, so a step's name runs what listens to it.
+RESUME_EVENTS = {
+    'discover_news': 'discover_news',  # -> choose_execution_mode
+    'scrape_news': 'scrape_news',  # -> choose_execution_mode
+    'critique_news': 'critique_news',  # -> plan_research
+    'plan_research': 'plan_research',  # -> research_news
+    'research_news': 'research_news',  # -> counter_args
+    'counter_args': 'counter_args',  # -> write_articles
+    'write_articles': None,  # the flow is finished
+}
+
+# write_articles and run_article_pipelines are the last steps of the stage and pipeline modes
+flow_persistence = flow_persistence_from_env(db_path=data_path('flow_states.db'), final_methods=('write_articles', 'run_article_pipelines'))
 
-@persist(persistence=SQLiteFlowPersistenceJSON(db_path='flow_states.db'))
+@persist(persistence=flow_persistence)
 class NewsFlow(Flow[NewsState]):
 
     @start()
     def initialize(self):
         # TODO beautify printing, remove content, summarize Lists (just give counts)
         logging.info("Initializing flow with these parameters: %s", self.state)
-        # TODO add more initialization logic here: load via config how much paralellism to use, log verbosity, crewai verbosity
+        # TODO add more initialization logic here: log verbosity, crewai verbosity
+        configure_transport(self.state.max_concurrent_crews)
         if self.state.current_step == '':
             self.state.current_step = "initialize"
     
     @router(initialize)
     def load_state(self):
         logging.info("Trying to load state from database...")
+        if self.state.start_from_method:
+            step, self.state.start_from_method = self.state.start_from_method, None
+            logging.info("Starting after step: %s", step)
+            return self._resume_after(step)
         if self.state.current_step != 'initialize':
             logging.info("Resuming from latest step: %s", self.state.current_step)
-            return self.state.current_step  # Resume from the latest checkpoint. TODO: actually need to map from method names to event names
+            return self._resume_after(self.state.current_step)
         elif self.state.topic:
             logging.info("Topic provided, starting with discover step.")
             return 'discover'
@@ -87,178 +141,116 @@ class NewsFlow(Flow[NewsState]):
     @listen('discover')
     def discover_news(self):
         logging.info("Discovering news")
-        result = (
-            DiscoverCrew().crew()
-            .kickoff(inputs={"topic": self.state.topic, 
-                             "num_starting_pool_news": self.state.num_starting_pool_news, 
-                             "num_max_news": self.state.num_max_news,
-                             "current_date": self.state.current_date,
-                             "perspective": self.state.perspective,})
-        )
+        result = self._kickoff('discover_news', DiscoverCrew().crew(),
+                               {"topic": self.state.topic, 
+                                "num_starting_pool_news": self.state.num_starting_pool_news, 
+                                "num_max_news": self.state.num_max_news,
+                                "current_date": self.state.current_date,
+                                "perspective": self.state.perspective,})
         
         logging.info("Saving state variables for discover_news")
         self.state.news_list = result.pydantic
-        self.state.flow_tokens['discover_news'] = {"prompt_tokens": result.token_usage.prompt_tokens, 
-                                                   "completion_tokens": result.token_usage.completion_tokens}
+        self.state.flow_tokens['discover_news'] = self._step_tokens([result])
+        self._compact_news_content()
         save_flow_step_output(result.pydantic, 'news_list.json')
         self.state.current_step = "discover_news"
 
     @listen('scrape')
     def scrape_news(self):
         logging.info("Scraping news")
-        result = (
-            ScrapeCrew().crew()
-            .kickoff(inputs={"urls": self.state.urls[0]}) # for now only one url
-        )
+        result = self._kickoff('scrape_news', ScrapeCrew().crew(), {"urls": self.state.urls[0]}) # for now only one url
 
         self.state.topic = result.pydantic.news_list[0].topic
 
         logging.info("Saving state variables for scrape_news")
         self.state.news_list = result.pydantic
-        self.state.flow_tokens['scrape_news'] = {"prompt_tokens": result.token_usage.prompt_tokens, 
-                                                   "completion_tokens": result.token_usage.completion_tokens}
+        self.state.flow_tokens['scrape_news'] = self._step_tokens([result])
+        self._compact_news_content()
         save_flow_step_output(result.pydantic, 'news_list.json')
         self.state.current_step = "scrape_news"
 
 
-    @listen(or_(scrape_news, discover_news))
-    def critique_news(self):
+    @router(or_(scrape_news, discover_news))
+    def choose_execution_mode(self):
+        if self.state.pipeline:
+            logging.info("Pipeline mode, each article advances through the steps on its own.")
+            return 'pipeline'
+        return 'stages'
+
+    @listen('stages')
+    async def critique_news(self):
         logging.info("Starting critique...")
-        for news in self.state.news_list.news_list:
-            logging.info("--> Kicking off critique crews for article: %s", news.news_title)
-            critique_dicts = [
-                {
-                    "news_title": news.news_title,
-                    "summary": news.summary,
-                    "source": news.source_url,
-                    "perspective": self.state.perspective,
-                    "article_content": news.content,
-                    "topic": self.state.topic
-                }
-            ]
-            results = (
-                CritiqueCrew().crew()
-                .kickoff_for_each(inputs=critique_dicts)
-            )  
-
-            logging.info("Saving state variables for critique_news")
-            for result in results:
-                self.state.critiques.append(result.pydantic)
-                save_flow_step_output(result.pydantic, filename=f'critique.json', subfolder=result.pydantic.news_title) 
-            self.state.current_step = "critique_news"
+        critique_dicts = self._critique_inputs(self.state.news_list.news_list)
+        logging.info("--> Kicking off critique crews for %d articles", len(critique_dicts))
+        results = await self._kickoff_for_each('critique_news', CritiqueCrew().crew(), critique_dicts)
+
+        logging.info("Saving state variables for critique_news")
+        for result in results:
+            self.state.critiques.append(result.pydantic)
+            save_flow_step_output(result.pydantic, filename=f'critique.json', subfolder=result.pydantic.news_title) 
+        self.state.flow_tokens['critique_news'] = self._step_tokens(results)
+        self._finish_step("critique_news")
 
 
     @listen(critique_news)
-    def plan_research(self):
+    async def plan_research(self):
 
-        # preparing the news list for the next crew
-        news_list_dicts = [
-            {
-                "news_title": news.news_title,
-                "summary": news.summary,
-                "source": news.source_url,
-                "topic": self.state.topic,
-                "perspective": self.state.perspective,
-                "article_content": news.content
-            }
-            for news in self.state.news_list.news_list
-        ]
-        logging.info("Planning research for %d news items", len(news_list_dicts))
+        news_items = self.state.news_list.news_list
+        logging.info("Planning research for %d news items (%s mode)", len(news_items), self.state.planning_mode)
 
-        results = (
-            PlanningCrew().crew()
-            .kickoff_for_each(inputs=news_list_dicts)
-        )
+        results = await self._plan_research(news_items)
 
         logging.info("Saving state variables for plan_research")
-        prompt_tokens = 0
-        completion_tokens = 0
         for plan in results:
             self.state.plan.append(plan.pydantic)
             save_flow_step_output(plan.pydantic, filename=f'research_plan.json', subfolder=plan.pydantic.news_title) 
-            prompt_tokens += plan.token_usage.prompt_tokens
-            completion_tokens += plan.token_usage.completion_tokens
-        self.state.flow_tokens['plan_research'] = {"prompt_tokens": prompt_tokens, 
-                                                   "completion_tokens": completion_tokens}
-        self.state.current_step = "plan_research"
+        self.state.flow_tokens['plan_research'] = self._step_tokens(results)
+        self._finish_step("plan_research")
 
     @listen(plan_research)
-    def research_news(self):
+    async def research_news(self):
         logging.info("Starting research...")
-        for plan in self.state.plan: # iterate over each plan (one for each news item)
-            logging.info("--> Kicking off research crews for article: %s", plan.news_title)
-            
-            key_idea_dicts = [
-                {
-                    "news_title": plan.news_title,
-                    "source": plan.source_url,
-                    "perspective": self.state.topic,
-                    "key_idea": idea.key_idea,
-                    "rationale": idea.rationale
-                    #"topic": self.state.topic,
-                }
-                for idea in plan.key_ideas.ideas
-            ]  
-            
-            results = (
-                ResearchCrew().crew()
-                .kickoff_for_each(inputs=key_idea_dicts) # kick off crews for each key idea and save results
-            )
+        # gather the (article, key idea) inputs of every plan (one plan for each news item)
+        key_idea_dicts = self._key_idea_inputs(self.state.plan)
+        logging.info("--> Kicking off research crews for %d key ideas across %d articles",
+                     len(key_idea_dicts), len(self.state.plan))
+
+        # kick off crews for each key idea and save results
+        results = await self._kickoff_for_each('research_news', ResearchCrew().crew(), key_idea_dicts)
 
         logging.info("----Finished researching news----")
         logging.info("Saving state variables for research_news")
-        prompt_tokens = 0
-        completion_tokens = 0
         i = 0
         for evidence in results:
             self.state.news_evidence.append(evidence.pydantic)
             save_flow_step_output(evidence.pydantic, filename=f'evidence_{i}.json', subfolder=evidence.pydantic.news_title) 
-            prompt_tokens += evidence.token_usage.prompt_tokens
-            completion_tokens += evidence.token_usage.completion_tokens
             i += 1
-        self.state.flow_tokens['research_news'] = {"prompt_tokens": prompt_tokens, 
-                                                   "completion_tokens": completion_tokens}
-        self.state.current_step = "research_news"
+        self.state.flow_tokens['research_news'] = self._step_tokens(results)
+        self._finish_step("research_news")
 
     @listen(research_news)
-    def counter_args(self):
+    async def counter_args(self):
         logging.info("Starting counter args...")
-        for plan in self.state.plan: # iterate over each plan (one for each news item)
-            logging.info("--> Kicking off counterargs crews for article: %s", plan.news_title)
-            
-            counterargs_dicts = [
-                {
-                    "news_title": plan.news_title,
-                    "source": plan.source_url,
-                    "perspective": self.state.perspective,
-                    "counterargument": counter_arg.counter_argument,
-                    "counter_rationale": counter_arg.rationale
-                }
-                for counter_arg in plan.counter_arguments.counter_arguments
-            ]  
-            
-            results = (
-                CounterArgumentsCrew().crew()
-                .kickoff_for_each(inputs=counterargs_dicts) # kick off crews for each key idea and save results
-            )
+        # gather the (article, counterargument) inputs of every plan (one plan for each news item)
+        counterargs_dicts = self._counterargs_inputs(self.state.plan)
+        logging.info("--> Kicking off counterargs crews for %d counterarguments across %d articles",
+                     len(counterargs_dicts), len(self.state.plan))
+
+        # kick off crews for each counterargument and save results
+        results = await self._kickoff_for_each('counter_args', CounterArgumentsCrew().crew(), counterargs_dicts)
         
         logging.info("----Finished finding counterargs support----")
         logging.info("Saving state variables for counter_args")
-        prompt_tokens = 0
-        completion_tokens = 0
         i = 0
         for counterargs in results:
             self.state.counter_arguments.append(counterargs.pydantic)
             save_flow_step_output(counterargs.pydantic, filename=f'counterargs_{i}.json', subfolder=counterargs.pydantic.news_title) 
-            prompt_tokens += counterargs.token_usage.prompt_tokens
-            completion_tokens += counterargs.token_usage.completion_tokens
             i += 1
-        self.state.flow_tokens['counter_args'] = {"prompt_tokens": prompt_tokens, 
-                                                  "completion_tokens": completion_tokens}
-        self.state.current_step = "counter_args"
+        self.state.flow_tokens['counter_args'] = self._step_tokens(results)
+        self._finish_step("counter_args")
         
     @listen(counter_args)
-    def write_articles(self):
+    async def write_articles(self):
         logging.info("Starting writing articles")
         # Use the new function which returns a plain dict.
         news_json = consolidate_news_json(
@@ -270,47 +262,395 @@ class NewsFlow(Flow[NewsState]):
         )
         save_flow_step_output(cleanup_consolidated_json(news_json), filename='final_research_output.json')
 
-        # Iterate over the consolidated news items in the JSON structure.
-        for news_item in news_json["news_list"]:
-            # Create JSON string representations of the lists from the dict.
-            evidence_str = json.dumps(news_item["supporting_evidence"])
-            datapoints_str = json.dumps(news_item["datapoints"])
-            counterargs_str = json.dumps(news_item["counter_argument_sources"])
-            critiques_str = json.dumps(news_item["critiques"])
-            
-            writer_dics = [
-                {
-                    "title": news_item["news_title"],
-                    "url": news_item["source_url"],
-                    "original_content": news_item["content"],
-                    "evidence": evidence_str,
-                    "datapoints": datapoints_str,
-                    "counterarguments": counterargs_str,
-                    "critiques": critiques_str,
-                    "perspective": self.state.perspective,
-                    "tone": self.state.tone,
-                }
-            ]
-            
-            results = (
-                WriterCrew().crew()
-                .kickoff_for_each(inputs=writer_dics)
+        writer_dics = self._writer_inputs(news_json)
+        results = await self._kickoff_for_each('write_articles', WriterCrew().crew(), writer_dics)
+
+        i = 0
+        for article in results:
+            self.state.articles.append(article.raw)
+            save_flow_step_output(article.raw, filename=f'article_{i}.md')
+            i += 1
+        self.state.flow_tokens['write_articles'] = self._step_tokens(results)
+        self._finish_step("write_articles")
+
+    @listen('pipeline')
+    async def run_article_pipelines(self):
+        news_items = self.state.news_list.news_list
+        logging.info("Starting article pipelines for %d articles", len(news_items))
+        # one cap shared by every article, so a fast article can take the slots a slow one is not using
+        semaphore = asyncio.Semaphore(max(self.state.max_concurrent_crews, 1))
+        await asyncio.gather(
+            *(self._article_pipeline(i, news, semaphore) for i, news in enumerate(news_items))
+        )
+        logging.info("----Finished all article pipelines----")
+        self.state.item_checkpoints.clear()
+        self.state.current_step = "write_articles"
+
+    async def _article_pipeline(self, index: int, news: NewsWithSources, semaphore: asyncio.Semaphore):
+        """
+        Runs the whole chain for a single article: critique and planning, then research and
+        counterarguments for its plan, then the writer. Nothing waits on the other articles.
+        """
+        title = news.news_title
+
+        async def critique() -> List[CritiqueList]:
+            results = await self._kickoff_for_each(
+                'critique_news', CritiqueCrew().crew(), self._critique_inputs([news]), semaphore=semaphore
             )
-            
-            prompt_tokens = 0
-            completion_tokens = 0
-            i = 0
-            for article in results:
-                self.state.articles.append(article.raw)
-                save_flow_step_output(article.raw, filename=f'article_{i}.md')
-                prompt_tokens += article.token_usage.prompt_tokens
-                completion_tokens += article.token_usage.completion_tokens
-                i += 1
-            self.state.flow_tokens['write_articles'] = {
-                "prompt_tokens": prompt_tokens, 
-                "completion_tokens": completion_tokens
+            self._add_step_tokens('critique_news', results)
+            for result in results:
+                self.state.critiques.append(result.pydantic)
+                save_flow_step_output(result.pydantic, filename='critique.json', subfolder=result.pydantic.news_title)
+            return [result.pydantic for result in results]
+
+        # the critique is only needed by the writer, so it runs next to the rest of the chain
+        critique_task = asyncio.create_task(critique())
+
+        logging.info("--> [%s] Planning research", title)
+        results = await self._plan_research([news], semaphore=semaphore)
+        self._add_step_tokens('plan_research', results)
+        plans = [result.pydantic for result in results]
+        for plan in plans:
+            self.state.plan.append(plan)
+            save_flow_step_output(plan, filename='research_plan.json', subfolder=plan.news_title)
+        self.state.article_progress[title] = "plan_research"
+
+        logging.info("--> [%s] Researching key ideas and counterarguments", title)
+        research_results, counterargs_results = await asyncio.gather(
+            self._kickoff_for_each('research_news', ResearchCrew().crew(), self._key_idea_inputs(plans), semaphore=semaphore),
+            self._kickoff_for_each('counter_args', CounterArgumentsCrew().crew(), self._counterargs_inputs(plans), semaphore=semaphore),
+        )
+        self._add_step_tokens('research_news', research_results)
+        self._add_step_tokens('counter_args', counterargs_results)
+        evidence_list = [result.pydantic for result in research_results]
+        counterargs_list = [result.pydantic for result in counterargs_results]
+        for i, evidence in enumerate(evidence_list):
+            self.state.news_evidence.append(evidence)
+            save_flow_step_output(evidence, filename=f'evidence_{i}.json', subfolder=evidence.news_title)
+        for i, counterargs in enumerate(counterargs_list):
+            self.state.counter_arguments.append(counterargs)
+            save_flow_step_output(counterargs, filename=f'counterargs_{i}.json', subfolder=counterargs.news_title)
+        self.state.article_progress[title] = "counter_args"
+
+        critiques = await critique_task
+        news_json = consolidate_news_json(
+            evidence_list,
+            plans,
+            counterargs_list,
+            NewsList(news_list=[news]),
+            critiques
+        )
+        save_flow_step_output(cleanup_consolidated_json(news_json), filename='final_research_output.json', subfolder=title)
+
+        logging.info("--> [%s] Writing article", title)
+        results = await self._kickoff_for_each(
+            'write_articles', WriterCrew().crew(), self._writer_inputs(news_json), semaphore=semaphore
+        )
+        self._add_step_tokens('write_articles', results)
+        for article in results:
+            self.state.articles.append(article.raw)
+            save_flow_step_output(article.raw, filename=f'article_{index}.md')
+        self.state.article_progress[title] = "write_articles"
+        logging.info("--> [%s] Article finished", title)
+
+    def _resume_after(self, step: str) -> Optional[str]:
+        """
+        Clears what the steps after the given one produced and returns the router output that
+        runs them again. Crews those steps already finished are restored from item_checkpoints.
+        """
+        if step not in RESUME_EVENTS:
+            raise ValueError(f"Cannot resume after '{step}', expected one of: {', '.join(RESUME_EVENTS)}")
+        if step in STEP_OUTPUTS and self.state.news_list is None:
+            raise ValueError(f"Cannot resume after '{step}': the flow has no news list yet")
+
+        if self.state.pipeline and step != 'write_articles':
+            # pipeline mode runs every article step inside run_article_pipelines, so it restarts them all
+            later_steps, event = STEP_ORDER, 'pipeline'
+        else:
+            later_steps = STEP_ORDER[STEP_ORDER.index(step) + 1:] if step in STEP_ORDER else STEP_ORDER
+            event = RESUME_EVENTS[step]
+        for later_step in later_steps:
+            setattr(self.state, STEP_OUTPUTS[later_step], [])
+            self.state.flow_tokens.pop(later_step, None)
+        self.state.current_step = step
+        return event
+
+    def _finish_step(self, step: str):
+        """Marks a stage as done; its outputs are in the state now, so its item checkpoints go."""
+        for key in [key for key in self.state.item_checkpoints if key == step or key.startswith(f"{step}:")]:
+            del self.state.item_checkpoints[key]
+        self.state.current_step = step
+
+    async def _plan_research(
+        self, news_items: List[NewsWithSources], semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[CrewOutput]:
+        """
+        Research plans of the news items, made the way planning_mode says. In parallel mode
+        the three extraction crews of all items share one cap (the given semaphore or
+        max_concurrent_crews), each is checkpointed as its own 'plan_research:<part>' step,
+        and every item's outputs are merged into a plan whose tokens are theirs summed.
+        """
+        inputs = self._planning_inputs(news_items)
+        if self.state.planning_mode == 'single_pass':
+            return await self._kickoff_for_each('plan_research', PlanningCrew().single_pass_crew(), inputs, semaphore=semaphore)
+        if self.state.planning_mode == 'crew':
+            return await self._kickoff_for_each('plan_research', PlanningCrew().crew(), inputs, semaphore=semaphore)
+
+        semaphore = semaphore or asyncio.Semaphore(max(self.state.max_concurrent_crews, 1))
+        crews = PlanningCrew().extraction_crews()
+        parts = await asyncio.gather(
+            *(self._kickoff_for_each(f'plan_research:{part}', crew, inputs, semaphore=semaphore) for part, crew in crews.items())
+        )
+        results = []
+        for input_data, (ideas, datapoints, counter_arguments) in zip(inputs, zip(*parts)):
+            plan = merge_research_plan(input_data, ideas.pydantic, datapoints.pydantic, counter_arguments.pydantic)
+            token_usage = UsageMetrics()
+            for output in (ideas, datapoints, counter_arguments):
+                token_usage.add_usage_metrics(output.token_usage)
+            results.append(CrewOutput(raw=plan.model_dump_json(), pydantic=plan, tasks_output=[], token_usage=token_usage))
+        return results
+
+    def _compact_news_content(self):
+        """
+        Replaces the scraped content of every news item with its main text, without page
+        boilerplate and repeated paragraphs. The tokens of the content before and after, and
+        of what each task gets after cutting it to its budget, go to flow_tokens.
+        """
+        if content_compactor is None:
+            return
+        counts = {"scraped_tokens": 0, "cleaned_tokens": 0, **{task: 0 for task in content_compactor.budgets}}
+        for news in self.state.news_list.news_list:
+            counts["scraped_tokens"] += count_tokens(news.content)
+            news.content = content_compactor.clean(news.content)
+            counts["cleaned_tokens"] += count_tokens(news.content)
+            for task in content_compactor.budgets:
+                counts[task] += count_tokens(content_compactor.fit(news.content, task))
+        logging.info("Article content compacted from %d to %d tokens", counts["scraped_tokens"], counts["cleaned_tokens"])
+        self.state.flow_tokens['content_compaction'] = counts
+
+    def _fit_content(self, content: str, task: str) -> str:
+        """The article content cut to the token budget of the task it is pasted into."""
+        return content_compactor.fit(content, task) if content_compactor is not None else content
+
+    def _critique_inputs(self, news_items: List[NewsWithSources]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "news_title": news.news_title,
+                "summary": news.summary,
+                "source": news.source_url,
+                "perspective": self.state.perspective,
+                "article_context": article_context(
+                    news.news_title, news.source_url, news.summary, self._fit_content(news.content, 'critique_news')
+                ),
+                "topic": self.state.topic
             }
-        self.state.current_step = "write_articles"
+            for news in news_items
+        ]
+
+    def _planning_inputs(self, news_items: List[NewsWithSources]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "news_title": news.news_title,
+                "summary": news.summary,
+                "source": news.source_url,
+                "topic": self.state.topic,
+                "perspective": self.state.perspective,
+                "article_context": article_context(
+                    news.news_title, news.source_url, news.summary, self._fit_content(news.content, 'plan_research')
+                )
+            }
+            for news in news_items
+        ]
+
+    def _key_idea_inputs(self, plans: List[NewsResearchPlan]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "news_title": plan.news_title,
+                "source": plan.source_url,
+                "perspective": self.state.topic,
+                "key_idea": idea.key_idea,
+                "rationale": idea.rationale
+                #"topic": self.state.topic,
+            }
+            for plan in plans
+            for idea in plan.key_ideas.ideas
+        ]
+
+    def _counterargs_inputs(self, plans: List[NewsResearchPlan]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "news_title": plan.news_title,
+                "source": plan.source_url,
+                "perspective": self.state.perspective,
+                "counterargument": counter_arg.counter_argument,
+                "counter_rationale": counter_arg.rationale
+            }
+            for plan in plans
+            for counter_arg in plan.counter_arguments.counter_arguments
+        ]
+
+    def _writer_inputs(self, news_json: dict) -> List[Dict[str, Any]]:
+        # Build one writer input for each consolidated news item in the JSON structure.
+        return [
+            {
+                "title": news_item["news_title"],
+                "url": news_item["source_url"],
+                "original_content": self._fit_content(news_item["content"], 'write_articles'),
+                # JSON string representations of the lists from the dict.
+                "evidence": json.dumps(news_item["supporting_evidence"]),
+                "datapoints": json.dumps(news_item["datapoints"]),
+                "counterarguments": json.dumps(news_item["counter_argument_sources"]),
+                "critiques": json.dumps(news_item["critiques"]),
+                "perspective": self.state.perspective,
+                "tone": self.state.tone,
+            }
+            for news_item in news_json["news_list"]
+        ]
+
+    @staticmethod
+    def _step_tokens(results: List[CrewOutput]) -> Dict[str, int]:
+        """
+        Token usage of the given crew outputs. cached_prompt_tokens is the part of prompt_tokens
+        the provider served from its prompt cache (billed at a discount).
+        """
+        return {
+            "prompt_tokens": sum(result.token_usage.prompt_tokens for result in results),
+            "completion_tokens": sum(result.token_usage.completion_tokens for result in results),
+            "cached_prompt_tokens": sum(result.token_usage.cached_prompt_tokens for result in results),
+        }
+
+    def _add_step_tokens(self, step: str, results: List[CrewOutput]):
+        """Adds the token usage of the given crew outputs to the running totals of a step."""
+        step_tokens = self.state.flow_tokens.setdefault(step, {})
+        for name, tokens in self._step_tokens(results).items():
+            step_tokens[name] = step_tokens.get(name, 0) + tokens
+
+    def _kickoff(self, step: str, crew: Crew, inputs: Dict[str, Any]) -> CrewOutput:
+        """Runs a single crew, or takes its output from the stage cache if it already ran on these inputs."""
+        key = input_hash(inputs)
+        crew_hash = crew_fingerprint(crew) if stage_cache is not None else None
+        record = self._cached_stage_result(step, crew_hash, key)
+        if record is not None:
+            model = crew.tasks[-1].output_pydantic if crew.tasks else None
+            return self._restore_output(record, model)
+        with event_scope(self.state.id, step, crew=crew.name):
+            output = crew.kickoff(inputs=inputs)
+        if crew_hash is not None:
+            stage_cache.set(step, crew_hash, key, self._checkpoint_record(output))
+        return output
+
+    def _cached_stage_result(self, step: str, crew_hash: Optional[str], key: str) -> Optional[Dict[str, Any]]:
+        """
+        Output record of a crew that some flow already ran on the same inputs, or None. A
+        reused output cost nothing, so its tokens are zeroed and counted as saved instead.
+        """
+        if crew_hash is None:
+            return None
+        stats = self.state.stage_cache_stats.setdefault(
+            step, {"hits": 0, "misses": 0, "saved_prompt_tokens": 0, "saved_completion_tokens": 0}
+        )
+        record = stage_cache.get(step, crew_hash, key)
+        if record is None:
+            stats["misses"] += 1
+            return None
+        stats["hits"] += 1
+        stats["saved_prompt_tokens"] += record["prompt_tokens"]
+        stats["saved_completion_tokens"] += record["completion_tokens"]
+        return dict(record, prompt_tokens=0, completion_tokens=0, cached_prompt_tokens=0)
+
+    async def _kickoff_for_each(
+        self, step: str, crew: Crew, inputs: List[Dict[str, Any]], semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[CrewOutput]:
+        """
+        Runs a crew once per input. In fan-out mode all inputs of the step are dispatched
+        together (at most max_concurrent_crews at a time, or under the given shared semaphore),
+        otherwise they run one after another.
+
+        Each finished crew is checkpointed under the step and the hash of its input, and the
+        state is saved right away. Inputs already checkpointed by an interrupted run are not
+        run again; their outputs are rebuilt from the checkpoint. Neither are inputs any flow
+        already ran the same crew on: their outputs come from the stage cache.
+
+        Every finished crew is also published as an 'item' event of the flow, and the LLM
+        tokens the crews stream are published as 'token' events tagged with their item.
+        """
+        checkpoints = self.state.item_checkpoints.setdefault(step, {})
+        keys = [input_hash(input_data) for input_data in inputs]
+        todo = [i for i, key in enumerate(keys) if key not in checkpoints]
+        if len(todo) < len(inputs):
+            logging.info("--> %s: %d of %d items restored from checkpoints", step, len(inputs) - len(todo), len(inputs))
+
+        crew_hash = crew_fingerprint(crew) if stage_cache is not None else None
+        cached = {}
+        for i in todo:
+            record = self._cached_stage_result(step, crew_hash, keys[i])
+            if record is not None:
+                cached[i] = checkpoints[keys[i]] = record
+        if cached:
+            logging.info("--> %s: %d of %d items reused from the stage cache", step, len(cached), len(inputs))
+            todo = [i for i in todo if i not in cached]
+
+        outputs: Dict[int, CrewOutput] = {}
+
+        def on_result(position: int, output: CrewOutput):
+            index = todo[position]
+            outputs[index] = output
+            checkpoints[keys[index]] = self._checkpoint_record(output)
+            if crew_hash is not None:
+                stage_cache.set(step, crew_hash, keys[index], checkpoints[keys[index]])
+            if self.state.id:
+                # item checkpoints stay write-behind; the save at the end of the step waits for the writer
+                flow_persistence.save_state(self.state.id, f"{step}_item", self.state, wait=False)
+                flow_events.publish(
+                    self.state.id, "item", step=step, item=index, key=keys[index],
+                    completed=len(inputs) - len(todo) + len(outputs), total=len(inputs),
+                )
+
+        def on_start(position: int):
+            bind_event_scope(self.state.id, step, todo[position], crew=crew.name)
+
+        todo_inputs = [inputs[i] for i in todo]
+        if semaphore is not None or self.state.fan_out:
+            await kickoff_for_each_bounded(
+                crew, todo_inputs, self.state.max_concurrent_crews, semaphore=semaphore,
+                on_result=on_result, on_start=on_start if self.state.id else None,
+            )
+        else:
+            for position, input_data in enumerate(todo_inputs):
+                # on a worker thread, so the crew does not block the event loop the other steps share;
+                # the thread inherits the event scope
+                with event_scope(self.state.id, step, todo[position], crew=crew.name):
+                    output = await asyncio.to_thread(crew.copy().kickoff, inputs=input_data)
+                on_result(position, output)
+
+        model = crew.tasks[-1].output_pydantic if crew.tasks else None
+        return [outputs.get(i) or self._restore_output(checkpoints[key], model) for i, key in enumerate(keys)]
+
+    @staticmethod
+    def _checkpoint_record(output: CrewOutput) -> Dict[str, Any]:
+        return {
+            "raw": output.raw,
+            "pydantic": output.pydantic.model_dump() if output.pydantic is not None else None,
+            "prompt_tokens": output.token_usage.prompt_tokens,
+            "completion_tokens": output.token_usage.completion_tokens,
+            "cached_prompt_tokens": output.token_usage.cached_prompt_tokens,
+        }
+
+    @staticmethod
+    def _restore_output(record: Dict[str, Any], model: Optional[type]) -> CrewOutput:
+        """CrewOutput of a checkpointed crew; it keeps the tokens the crew used when it ran."""
+        return CrewOutput(
+            raw=record["raw"],
+            pydantic=model.model_validate(record["pydantic"]) if model is not None and record["pydantic"] is not None else None,
+            tasks_output=[],
+            token_usage=UsageMetrics(
+                prompt_tokens=record["prompt_tokens"],
+                completion_tokens=record["completion_tokens"],
+                total_tokens=record["prompt_tokens"] + record["completion_tokens"],
+                # checkpoints written before cached tokens were tracked do not have them
+                cached_prompt_tokens=record.get("cached_prompt_tokens", 0),
+            ),
+        )
 
     def get_state(self) -> NewsState:
         """
@@ -345,9 +685,31 @@ def kickoff():
 
     # Use logging for completion messages
     logging.info("------ Flow completed ------")
-    total_cost = calculate_tokens_usage(news_flow.state.flow_tokens)
-    logging.info(f"-----> Total cost of the flow: ~${total_cost['total_costs']:.4f}")
-    logging.info(f"-----> Total tokens used: {total_cost['total_tokens']}")
+    if telemetry is not None:
+        # Priced per call from the model that served it, including retries and fallbacks
+        for step in telemetry.summary(news_flow.state.id, group_by=("step", "crew")):
+            logging.info(f"-----> {step['step']} ({step['crew']}): ${step['cost'] or 0:.4f}, "
+                         f"{step['prompt_tokens']} prompt / {step['completion_tokens']} completion tokens, "
+                         f"{step['llm_calls']} LLM and {step['tool_calls']} tool calls")
+        totals = telemetry.summary(news_flow.state.id)
+        totals = totals[0] if totals else {}
+        logging.info(f"-----> Total cost of the flow: ${totals.get('cost') or 0:.4f}"
+                     f" ({totals.get('unpriced_calls') or 0} calls to models without a known price)")
+        logging.info(f"-----> Total tokens used: {(totals.get('prompt_tokens') or 0) + (totals.get('completion_tokens') or 0)}")
+    else:
+        total_cost = calculate_tokens_usage(news_flow.state.flow_tokens)
+        logging.info(f"-----> Total cost of the flow: ~${total_cost['total_costs']:.4f}")
+        logging.info(f"-----> Total tokens used: {total_cost['total_tokens']}")
+    if llm_cache is not None:
+        logging.info(f"-----> LLM cache stats: {llm_cache.stats}")
+    if search_cache is not None:
+        logging.info(f"-----> Search cache stats: {search_cache.get_stats()}")
+    if scrape_cache is not None:
+        logging.info(f"-----> Scrape cache stats: {scrape_cache.stats}")
+    if stage_cache is not None:
+        logging.info(f"-----> Stage cache stats: {stage_cache.stats}")
+    if adaptive_concurrency is not None:
+        logging.info(f"-----> Adaptive concurrency limits: {adaptive_concurrency.snapshot()}")
 
 def plot():
     news_flow = NewsFlow()
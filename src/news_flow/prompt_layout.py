@@ -0,0 +1,30 @@
+import os
+from typing import Any, Dict
+
+# Placeholder of the article block in the task descriptions of the critique and planning crews
+ARTICLE_PLACEHOLDER = "{article_context}"
+
+# Set to 0/false/off to keep the article block where the task descriptions put it, after the instructions
+PROMPT_CACHE_LAYOUT = os.getenv("NEWS_FLOW_PROMPT_CACHE_LAYOUT", "1").lower() not in ("0", "false", "off", "no")
+
+
+def article_context(title: str, source: str, summary: str, content: str) -> str:
+    """
+    The article block the critique and planning tasks share. Every task of an article must
+    get the same string, so their prompts share a byte-identical prefix.
+    """
+    return f"Article title: {title}\nArticle link: {source}\nArticle summary: {summary}\nArticle content: {content}"
+
+
+def task_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The task config with, in the prompt cache layout, the article block moved in front of the
+    instructions. With the same agent and the article first, the calls of all tasks about
+    one article start with the same tokens, which providers like OpenAI serve from their
+    prompt cache at a discount; only the instructions after it are new to the provider.
+    """
+    description = config.get("description", "")
+    if not PROMPT_CACHE_LAYOUT or ARTICLE_PLACEHOLDER not in description:
+        return config
+    instructions = description.replace(ARTICLE_PLACEHOLDER, "").strip()
+    return {**config, "description": f"{ARTICLE_PLACEHOLDER}\n\n{instructions}"}
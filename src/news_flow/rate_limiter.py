@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from news_flow.utils import data_path
+
+# Default budgets per provider. rpm counts calls, tpm counts LLM tokens (prompt + completion).
+# Override them with NEWS_FLOW_RATE_LIMITS, e.g. '{"firecrawl": {"rpm": 20}, "openai": {"rpm": 1000, "tpm": 400000}}'
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    "openai": {"rpm": 500, "tpm": 200_000},
+    "openrouter": {"rpm": 200, "tpm": 400_000},
+    "groq": {"rpm": 30, "tpm": 6_000},
+    "tavily": {"rpm": 60},
+    "firecrawl": {"rpm": 10},
+    "serper": {"rpm": 100},
+    "brave": {"rpm": 60},
+}
+
+# Longest single sleep while waiting, so a refilled bucket is noticed quickly
+MAX_WAIT_STEP = 1.0
+
+
+def provider_of(model: str) -> str:
+    """LiteLLM provider prefix of a model name: 'openrouter/google/gemini...' -> 'openrouter'."""
+    return model.split("/", 1)[0] if "/" in model else "openai"
+
+
+def estimate_tokens(messages: Optional[List[Dict[str, Any]]]) -> int:
+    """Rough prompt size (~4 characters per token), used to reserve tokens before the call."""
+    if not messages:
+        return 0
+    return sum(len(str(message.get("content") or "")) for message in messages) // 4
+
+
+class ProviderRateLimiter:
+    """
+    Token-bucket rate limiter keyed by provider, shared by every thread and process on the host.
+
+    Each provider has a requests bucket (rpm) and optionally a tokens bucket (tpm), both
+    refilled continuously and holding at most one minute of budget. The buckets live in a
+    SQLite file and are updated inside BEGIN IMMEDIATE transactions, so concurrent flows,
+    API workers and crews all draw from the same budget. Callers block until it allows them.
+    """
+
+    def __init__(self, db_path: str = "rate_limits.db", limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.db_path = db_path
+        self.limits = limits if limits is not None else DEFAULT_RATE_LIMITS
+        self.init_db()
+
+    def init_db(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                provider TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                level REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (provider, kind)
+            )
+            """
+            )
+
+    def _rates(self, provider: str) -> Dict[str, float]:
+        """Per-minute capacity of each bucket of the provider: {'requests': rpm, 'tokens': tpm}."""
+        limit = self.limits.get(provider) or {}
+        rates = {}
+        if limit.get("rpm"):
+            rates["requests"] = float(limit["rpm"])
+        if limit.get("tpm"):
+            rates["tokens"] = float(limit["tpm"])
+        return rates
+
+    def _take(self, provider: str, wanted: Dict[str, float], force: bool = False) -> float:
+        """
+        Refills the provider's buckets and takes the wanted amounts if they are all available
+        (or unconditionally with force). Returns 0 on success, else the seconds to wait.
+        """
+        rates = self._rates(provider)
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            levels = {}
+            for kind, per_minute in rates.items():
+                row = conn.execute(
+                    "SELECT level, updated_at FROM rate_buckets WHERE provider = ? AND kind = ?",
+                    (provider, kind),
+                ).fetchone()
+                level, updated_at = row if row is not None else (per_minute, now)
+                levels[kind] = min(per_minute, level + (now - updated_at) * per_minute / 60.0)
+
+            wait = 0.0
+            if not force:
+                for kind, amount in wanted.items():
+                    if kind not in rates or levels[kind] >= amount:
+                        continue
+                    # a request bigger than the whole bucket only waits for a full bucket
+                    missing = min(amount, rates[kind]) - levels[kind]
+                    wait = max(wait, missing * 60.0 / rates[kind])
+            if wait <= 0:
+                for kind, amount in wanted.items():
+                    if kind in levels:
+                        levels[kind] -= amount
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_buckets (provider, kind, level, updated_at) VALUES (?, ?, ?, ?)",
+                [(provider, kind, level, now) for kind, level in levels.items()],
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def acquire(self, provider: str, tokens: int = 0) -> float:
+        """Blocks until the provider's budget allows one more request (and tokens). Returns seconds waited."""
+        if not self._rates(provider):
+            return 0.0
+        wanted = {"requests": 1.0, "tokens": float(tokens)}
+        waited = 0.0
+        while True:
+            wait = self._take(provider, wanted)
+            if wait <= 0:
+                if waited:
+                    logging.info("Rate limiter held a %s call for %.1fs", provider, waited)
+                return waited
+            step = min(wait, MAX_WAIT_STEP)
+            time.sleep(step)
+            waited += step
+
+    def record_tokens(self, provider: str, tokens: int) -> None:
+        """Charges tokens used beyond what was reserved (negative values give tokens back)."""
+        if tokens and "tokens" in self._rates(provider):
+            self._take(provider, {"tokens": float(tokens)}, force=True)
+
+
+def rate_limiter_from_env() -> Optional[ProviderRateLimiter]:
+    """
+    Builds the process-wide limiter from the environment:
+    - NEWS_FLOW_RATE_LIMIT: set to 0/false/off to disable rate limiting (enabled by default)
+    - NEWS_FLOW_RATE_LIMIT_PATH: SQLite file holding the buckets (default rate_limits.db under NEWS_FLOW_DATA_DIR)
+    - NEWS_FLOW_RATE_LIMITS: JSON overrides of DEFAULT_RATE_LIMITS per provider
+    """
+    if os.getenv("NEWS_FLOW_RATE_LIMIT", "1").lower() in ("0", "false", "off", "no"):
+        logging.info("Provider rate limiting disabled")
+        return None
+    limits = {provider: dict(limit) for provider, limit in DEFAULT_RATE_LIMITS.items()}
+    for provider, limit in json.loads(os.getenv("NEWS_FLOW_RATE_LIMITS", "{}")).items():
+        limits.setdefault(provider, {}).update(limit)
+    return ProviderRateLimiter(db_path=os.getenv("NEWS_FLOW_RATE_LIMIT_PATH", data_path("rate_limits.db")), limits=limits)
+
+
+rate_limiter = rate_limiter_from_env()
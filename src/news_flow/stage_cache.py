@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from crewai import Crew
+
+from news_flow.llm_cache import _json_default
+from news_flow.utils import data_path
+
+# LLM settings that change what a crew answers; keys, retries and timeouts are left out
+LLM_FINGERPRINT_FIELDS = (
+    "model", "temperature", "top_p", "n", "max_tokens", "max_completion_tokens", "presence_penalty",
+    "frequency_penalty", "response_format", "seed", "reasoning_effort", "base_url", "api_base",
+)
+
+
+def llm_fingerprint(llm: Any) -> Dict[str, Any]:
+    if llm is None or isinstance(llm, str):
+        return {"model": llm}
+    fingerprint = {field: getattr(llm, field, None) for field in LLM_FINGERPRINT_FIELDS}
+    fingerprint["fallbacks"] = (getattr(llm, "additional_params", None) or {}).get("fallbacks")
+    return fingerprint
+
+
+def crew_fingerprint(crew: Crew) -> str:
+    """
+    Hash of everything besides the inputs that shapes a crew's output: the task and agent
+    texts loaded from the YAML configs, the output models, the tools and the LLM configs.
+    """
+    description = {
+        "agents": [
+            {
+                "role": agent.role,
+                "goal": agent.goal,
+                "backstory": agent.backstory,
+                "tools": sorted(tool.name for tool in agent.tools or []),
+                "llm": llm_fingerprint(agent.llm),
+            }
+            for agent in crew.agents
+        ],
+        "tasks": [
+            {
+                "description": task.description,
+                "expected_output": task.expected_output,
+                "output_pydantic": task.output_pydantic,
+                "output_json": task.output_json,
+            }
+            for task in crew.tasks
+        ],
+        "process": str(crew.process),
+    }
+    payload = json.dumps(description, sort_keys=True, default=_json_default, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class StageResultCache:
+    """
+    Persistent SQLite store of finished crew outputs, shared by all flows.
+
+    Entries are keyed on the step, the crew fingerprint and the hash of the crew's inputs,
+    so a flow that runs a crew on inputs some earlier flow already ran it on reuses that
+    output. Entries expire after ttl_seconds.
+    """
+
+    def __init__(self, db_path: str = "stage_cache.db", ttl_seconds: int = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.init_db()
+
+    def init_db(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS stage_results (
+                step TEXT NOT NULL,
+                crew_hash TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                record_json TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (step, crew_hash, input_hash)
+            )
+            """
+            )
+
+    def get(self, step: str, crew_hash: str, input_hash: str) -> Optional[Dict[str, Any]]:
+        """The stored output record, or None on a miss or an expired entry."""
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            row = conn.execute(
+                "SELECT record_json FROM stage_results WHERE step = ? AND crew_hash = ? AND input_hash = ? AND created_at >= ?",
+                (step, crew_hash, input_hash, time.time() - self.ttl_seconds),
+            ).fetchone()
+        if row is None:
+            self._count(step, "misses")
+            return None
+        record = json.loads(row[0])
+        self._count(step, "hits")
+        self._count(step, "saved_prompt_tokens", record.get("prompt_tokens", 0))
+        self._count(step, "saved_completion_tokens", record.get("completion_tokens", 0))
+        return record
+
+    def set(self, step: str, crew_hash: str, input_hash: str, record: Dict[str, Any]) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                """
+            INSERT OR REPLACE INTO stage_results (step, crew_hash, input_hash, record_json, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+                (step, crew_hash, input_hash, json.dumps(record, default=_json_default), time.time()),
+            )
+            conn.execute("DELETE FROM stage_results WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+    def clear(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("DELETE FROM stage_results")
+
+    def _count(self, step: str, stat: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            step_stats = self.stats.setdefault(
+                step, {"hits": 0, "misses": 0, "saved_prompt_tokens": 0, "saved_completion_tokens": 0}
+            )
+            step_stats[stat] += amount
+
+
+def stage_cache_from_env() -> Optional[StageResultCache]:
+    """
+    Builds the process-wide stage result cache from the environment:
+    - NEWS_FLOW_STAGE_CACHE: set to 0/false/off to disable the cache (enabled by default)
+    - NEWS_FLOW_STAGE_CACHE_PATH: SQLite file (default stage_cache.db under NEWS_FLOW_DATA_DIR)
+    - NEWS_FLOW_STAGE_CACHE_TTL: seconds an entry stays valid (default 7 days)
+    """
+    if os.getenv("NEWS_FLOW_STAGE_CACHE", "1").lower() in ("0", "false", "off", "no"):
+        logging.info("Stage result cache disabled")
+        return None
+    return StageResultCache(
+        db_path=os.getenv("NEWS_FLOW_STAGE_CACHE_PATH", data_path("stage_cache.db")),
+        ttl_seconds=int(os.getenv("NEWS_FLOW_STAGE_CACHE_TTL", 7 * 24 * 3600)),
+    )
+
+
+stage_cache = stage_cache_from_env()
@@ -0,0 +1,70 @@
+import copy
+from typing import Any, Dict, List
+
+# JSON Patch (RFC 6902) subset used to store flow state deltas: add, replace and remove
+PatchOp = Dict[str, Any]
+
+
+def _escape(key: str) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old: Any, new: Any, path: str = "") -> List[PatchOp]:
+    """
+    JSON Patch turning old into new. Dicts are diffed key by key and lists that only grew
+    get their new items appended, so appending an article to a list of twenty only stores
+    that article. Any other change replaces the value at its path.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[PatchOp] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(make_patch(old[key], value, child))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) > len(old) and new[:len(old)] == old:
+        return [{"op": "add", "path": f"{path}/-", "value": value} for value in new[len(old):]]
+    if isinstance(old, list) and isinstance(new, list) and len(new) == len(old):
+        ops = []
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            ops.extend(make_patch(old_item, new_item, f"{path}/{index}"))
+        return ops
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(doc: Any, ops: List[PatchOp]) -> Any:
+    """Applies a patch made by make_patch to doc in place (pass a copy to keep it) and returns it."""
+    for op in ops:
+        if op["path"] == "":
+            doc = copy.deepcopy(op["value"])
+            continue
+        *parents, last = [_unescape(token) for token in op["path"].split("/")[1:]]
+        target = doc
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        value = copy.deepcopy(op.get("value"))
+        if isinstance(target, list):
+            if op["op"] == "remove":
+                del target[int(last)]
+            elif last == "-":
+                target.append(value)
+            elif op["op"] == "add":
+                target.insert(int(last), value)
+            else:
+                target[int(last)] = value
+        elif op["op"] == "remove":
+            del target[last]
+        else:
+            target[last] = value
+    return doc
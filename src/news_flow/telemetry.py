@@ -0,0 +1,300 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+
+from news_flow.flow_events import current_scope
+from news_flow.rate_limiter import provider_of
+from news_flow.utils import data_path
+
+# Columns a summary can be grouped by
+GROUP_FIELDS = ("flow_id", "step", "crew", "kind", "name", "provider", "status")
+
+# Models litellm sent the LLM call running in this context to, one entry per attempt
+# (retries repeat a model, fallbacks switch to the next one)
+_attempts: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("news_flow_llm_attempts", default=None)
+
+
+class _AttemptRecorder(CustomLogger):
+    """litellm hook run before every request it sends, including retries and fallbacks."""
+
+    def log_pre_api_call(self, model, messages, kwargs):
+        attempts = _attempts.get()
+        if attempts is not None:
+            attempts.append(model)
+
+
+def _hops_and_retries(attempts: List[str]) -> tuple:
+    """Fallback hops (switches to another model) and retries (repeated attempts on one model)."""
+    hops = sum(1 for previous, model in zip(attempts, attempts[1:]) if model != previous)
+    return hops, max(len(attempts) - 1 - hops, 0)
+
+
+def _usage_counts(usage: Any) -> Dict[str, int]:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_prompt_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+def _cost(model: str, provider: str, usage: Any) -> Optional[float]:
+    """Price of the call from litellm's model price map, None for models it does not know."""
+    if usage is None:
+        return None
+    try:
+        prompt_cost, completion_cost = litellm.cost_per_token(
+            model=model,
+            custom_llm_provider=provider,
+            prompt_tokens=usage.prompt_tokens or 0,
+            completion_tokens=usage.completion_tokens or 0,
+            usage_object=usage,
+        )
+    except Exception:
+        return None
+    return prompt_cost + completion_cost
+
+
+class TelemetryStore:
+    """
+    Persistent SQLite log of every LLM and tool call, tagged with the flow, step, item and
+    crew it ran for, and aggregated on demand. LLM calls record the model that served them
+    (which differs from the requested one when a fallback fired), their tokens and price,
+    latency, retries and fallback hops; tool calls record latency and payload sizes. Rows
+    older than retention_seconds are dropped.
+    """
+
+    def __init__(self, db_path: str = "telemetry.db", retention_seconds: int = 30 * 24 * 3600):
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self.init_db()
+
+    def init_db(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                flow_id TEXT,
+                step TEXT,
+                item INTEGER,
+                crew TEXT,
+                kind TEXT NOT NULL,
+                name TEXT NOT NULL,
+                requested TEXT,
+                provider TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                cached_prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                cost REAL,
+                latency_ms REAL NOT NULL DEFAULT 0,
+                retries INTEGER NOT NULL DEFAULT 0,
+                fallback_hops INTEGER NOT NULL DEFAULT 0,
+                payload_bytes INTEGER NOT NULL DEFAULT 0,
+                response_bytes INTEGER NOT NULL DEFAULT 0
+            )
+            """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_flow ON calls (flow_id, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_created ON calls (created_at)")
+            conn.execute("DELETE FROM calls WHERE created_at < ?", (time.time() - self.retention_seconds,))
+
+    def record(self, kind: str, name: str, status: str = "ok", **fields: Any) -> None:
+        """Stores one call, attributed to the flow scope of the calling thread or task."""
+        flow_id, step, item, crew = current_scope() or (None, None, None, None)
+        row = {
+            "created_at": time.time(), "flow_id": flow_id or None, "step": step, "item": item, "crew": crew,
+            "kind": kind, "name": name, "status": status, **fields,
+        }
+        try:
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                conn.execute(
+                    f"INSERT INTO calls ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})", tuple(row.values())
+                )
+        except sqlite3.Error as e:
+            # telemetry must never fail the call it observes
+            logging.warning("Could not record %s call to %s: %s", kind, name, e)
+
+    def summary(self, flow_id: Optional[str] = None, group_by: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        """
+        Totals of the calls of one flow (or of all flows), one row per combination of the
+        group_by columns, most expensive first. Raises ValueError for unknown columns.
+        """
+        unknown = [field for field in group_by if field not in GROUP_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown group_by: {', '.join(unknown)}. Expected any of: {', '.join(GROUP_FIELDS)}")
+        columns = ", ".join(group_by)
+        query = f"""
+            SELECT {columns + ',' if columns else ''}
+                COUNT(*) AS calls,
+                SUM(kind = 'llm') AS llm_calls,
+                SUM(kind = 'tool') AS tool_calls,
+                SUM(status = 'error') AS errors,
+                SUM(status = 'cache_hit') AS cache_hits,
+                SUM(prompt_tokens) AS prompt_tokens,
+                SUM(completion_tokens) AS completion_tokens,
+                SUM(cached_prompt_tokens) AS cached_prompt_tokens,
+                SUM(cost) AS cost,
+                SUM(kind = 'llm' AND status = 'ok' AND cost IS NULL) AS unpriced_calls,
+                AVG(latency_ms) AS avg_latency_ms,
+                MAX(latency_ms) AS max_latency_ms,
+                SUM(latency_ms) AS total_latency_ms,
+                SUM(retries) AS retries,
+                SUM(fallback_hops) AS fallback_hops,
+                SUM(payload_bytes) AS payload_bytes,
+                SUM(response_bytes) AS response_bytes
+            FROM calls
+            {'WHERE flow_id = ?' if flow_id is not None else ''}
+            {'GROUP BY ' + columns if columns else ''}
+            ORDER BY cost DESC
+        """
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(query, (flow_id,) if flow_id is not None else ()).fetchall()
+        return [dict(row) for row in rows if row["calls"]]
+
+    def calls(self, flow_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """The calls of a flow in the order they were made."""
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT * FROM calls WHERE flow_id = ? ORDER BY id LIMIT ? OFFSET ?", (flow_id, limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def observe_completion(self, kwargs: Dict[str, Any], complete: Callable[[], Any]) -> Any:
+        """
+        Runs one logical LLM call (complete() may retry and fall back inside litellm) and
+        records it. Streamed responses are recorded once the caller has read the stream.
+        """
+        requested = kwargs.get("model", "")
+        payload_bytes = len(json.dumps(kwargs.get("messages"), default=str))
+        attempts: List[str] = []
+        token = _attempts.set(attempts)
+        start = time.perf_counter()
+        try:
+            response = complete()
+        except Exception as e:
+            self._record_llm(requested, attempts, start, payload_bytes, error=e)
+            raise
+        finally:
+            _attempts.reset(token)
+        if kwargs.get("stream"):
+            return self._observe_stream(response, requested, attempts, start, payload_bytes)
+        message = response.choices[0].message if getattr(response, "choices", None) else None
+        response_bytes = len(getattr(message, "content", None) or "") + len(str(getattr(message, "tool_calls", None) or ""))
+        self._record_llm(requested, attempts, start, payload_bytes, response=response, response_bytes=response_bytes)
+        return response
+
+    def _observe_stream(self, stream: Any, requested: str, attempts: List[str], start: float, payload_bytes: int) -> Iterator[Any]:
+        last, usage, response_bytes, error = None, None, 0, None
+        try:
+            for chunk in stream:
+                last = chunk
+                usage = getattr(chunk, "usage", None) or usage
+                choices = getattr(chunk, "choices", None)
+                if choices:
+                    response_bytes += len(getattr(choices[0].delta, "content", None) or "")
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._record_llm(
+                requested, attempts, start, payload_bytes, response=last, usage=usage,
+                response_bytes=response_bytes, error=error,
+            )
+
+    def _record_llm(
+        self,
+        requested: str,
+        attempts: List[str],
+        start: float,
+        payload_bytes: int,
+        response: Any = None,
+        usage: Any = None,
+        response_bytes: int = 0,
+        error: Optional[Exception] = None,
+    ) -> None:
+        hops, retries = _hops_and_retries(attempts)
+        usage = usage if usage is not None else getattr(response, "usage", None)
+        hidden = getattr(response, "_hidden_params", None) or {}
+        served = getattr(response, "model", None) or (attempts[-1] if attempts else requested)
+        provider = hidden.get("custom_llm_provider") or provider_of(requested)
+        self.record(
+            "llm", served, "error" if error is not None else "ok",
+            requested=requested, provider=provider, error=str(error)[:500] if error is not None else None,
+            cost=_cost(served, provider, usage) if error is None else None,
+            latency_ms=(time.perf_counter() - start) * 1000, retries=retries, fallback_hops=hops,
+            payload_bytes=payload_bytes, response_bytes=response_bytes, **_usage_counts(usage),
+        )
+
+    def record_cache_hit(self, kwargs: Dict[str, Any]) -> None:
+        """An LLM call answered by the response cache: no provider, tokens or cost."""
+        requested = kwargs.get("model", "")
+        self.record("llm", requested, "cache_hit", requested=requested, provider=provider_of(requested))
+
+    def observe_tool(self, name: str, run: Callable[[], Any], kwargs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        payload_bytes = len(json.dumps(kwargs, default=str))
+        try:
+            result = run()
+        except Exception as e:
+            self.record(
+                "tool", name, "error", error=str(e)[:500], latency_ms=(time.perf_counter() - start) * 1000,
+                payload_bytes=payload_bytes,
+            )
+            raise
+        self.record(
+            "tool", name, latency_ms=(time.perf_counter() - start) * 1000,
+            payload_bytes=payload_bytes, response_bytes=len(str(result)),
+        )
+        return result
+
+
+def telemetry_from_env() -> Optional[TelemetryStore]:
+    """
+    Builds the process-wide telemetry store from the environment:
+    - NEWS_FLOW_TELEMETRY: set to 0/false/off to record no calls (enabled by default)
+    - NEWS_FLOW_TELEMETRY_PATH: SQLite file (default telemetry.db under NEWS_FLOW_DATA_DIR)
+    - NEWS_FLOW_TELEMETRY_RETENTION_DAYS: days calls are kept (default 30)
+    """
+    if os.getenv("NEWS_FLOW_TELEMETRY", "1").lower() in ("0", "false", "off", "no"):
+        logging.info("Call telemetry disabled")
+        return None
+    return TelemetryStore(
+        db_path=os.getenv("NEWS_FLOW_TELEMETRY_PATH", data_path("telemetry.db")),
+        retention_seconds=int(float(os.getenv("NEWS_FLOW_TELEMETRY_RETENTION_DAYS", 30)) * 24 * 3600),
+    )
+
+
+telemetry = telemetry_from_env()
+
+# crewAI replaces litellm.callbacks on every call, so the attempt hook goes in input_callback
+if telemetry is not None and not any(isinstance(callback, _AttemptRecorder) for callback in litellm.input_callback):
+    litellm.input_callback.append(_AttemptRecorder())
+
+
+def instrumented_tool(cls: type) -> type:
+    """Class decorator that records every _run of a crewAI tool in the telemetry store."""
+    run = cls._run
+
+    @functools.wraps(run)
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        if telemetry is None:
+            return run(self, *args, **kwargs)
+        return telemetry.observe_tool(self.name, lambda: run(self, *args, **kwargs), {"args": args, **kwargs})
+
+    cls._run = _run
+    return cls
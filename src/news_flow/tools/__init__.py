@@ -1,14 +1,13 @@
 import os
-from dotenv import load_dotenv
-from crewai_tools import SerperDevTool, FirecrawlScrapeWebsiteTool, BraveSearchTool
 from news_flow.tools.tavily import TavilySearchTool, TavilyScrapeTool
-# Load environment variables from .env file first
-load_dotenv()
+from news_flow.tools.search_cache import CachedSerperDevTool, CachedBraveSearchTool, search_cache
+from news_flow.tools.scrape_cache import CachedFirecrawlScrapeWebsiteTool, scrape_cache
+# Environment variables from .env are loaded by the news_flow package before any of these imports
 
-# Initialize tools once here
-serper_search = SerperDevTool()
-brave_search = BraveSearchTool()
-firecrawl = FirecrawlScrapeWebsiteTool(
+# Initialize tools once here (search tools share the search_cache, scrape tools the scrape_cache)
+serper_search = CachedSerperDevTool()
+brave_search = CachedBraveSearchTool()
+firecrawl = CachedFirecrawlScrapeWebsiteTool(
     api_key=os.getenv("FIRECRAWL_API_KEY")
 )
 tavily_search = TavilySearchTool(topic="general", include_images=True, include_raw_content=True)
@@ -22,4 +21,4 @@ tavily_scrape = TavilyScrapeTool(include_images=True)
 
 # Explicitly define what gets imported with 'from . import *' if desired,
 # or rely on direct imports like 'from news_flow.tools import serper_search'
-__all__ = ["serper_search", "brave_search", "firecrawl", "tavily_search", "tavily_scrape"]
+__all__ = ["serper_search", "brave_search", "firecrawl", "tavily_search", "tavily_scrape", "search_cache", "scrape_cache"]
@@ -0,0 +1,94 @@
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from news_flow.tools.scrape_cache import canonicalize_url
+
+TAVILY_MAX_EXTRACT_URLS = 20  # Tavily extract accepts at most 20 urls per request
+
+
+class ExtractBatcher:
+    """
+    Collects the URLs that concurrent agents want to extract during a short window and sends
+    them as a single deduplicated extract call, then hands each caller its own results.
+
+    extract is called with a list of URLs and must return a Tavily-style response with
+    'results' and 'failed_results'. Callers block until the batch holding their URLs is done.
+    """
+
+    def __init__(self, extract: Callable[[List[str]], Dict[str, Any]], window: float = 0.05, max_batch: int = TAVILY_MAX_EXTRACT_URLS):
+        self._extract = extract
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, Future]] = {}
+        self._timer: Optional[threading.Timer] = None
+        self.stats = {'requests': 0, 'urls': 0, 'batches': 0, 'deduplicated': 0}
+
+    def extract(self, urls: List[str]) -> Dict[str, Any]:
+        futures: Dict[str, Future] = {}
+        full_batch = None
+        with self._lock:
+            self.stats['requests'] += 1
+            for url in urls:
+                key = canonicalize_url(url)
+                if key in futures:
+                    continue
+                self.stats['urls'] += 1
+                if key in self._pending:
+                    self.stats['deduplicated'] += 1
+                else:
+                    self._pending[key] = (url, Future())
+                futures[key] = self._pending[key][1]
+            if len(self._pending) >= self.max_batch:
+                full_batch = self._take_batch()
+            elif self._timer is None and self._pending:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full_batch:
+            self._send(full_batch)
+
+        response: Dict[str, Any] = {'results': [], 'failed_results': []}
+        for future in futures.values():
+            status, item = future.result()
+            response[status].append(item)
+        return response
+
+    def _take_batch(self) -> Dict[str, Tuple[str, Future]]:
+        """Detaches the pending URLs; must be called with the lock held."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch: Dict[str, Tuple[str, Future]]) -> None:
+        items = list(batch.items())
+        for start in range(0, len(items), self.max_batch):
+            chunk = dict(items[start:start + self.max_batch])
+            with self._lock:
+                self.stats['batches'] += 1
+            logging.debug("Sending batched extract for %d urls", len(chunk))
+            try:
+                response = self._extract([url for url, _ in chunk.values()])
+            except Exception as e:
+                for _, future in chunk.values():
+                    future.set_exception(e)
+                continue
+
+            for status in ('results', 'failed_results'):
+                for item in response.get(status) or []:
+                    entry = chunk.pop(canonicalize_url(item.get('url', '')), None)
+                    if entry is not None:
+                        entry[1].set_result((status, item))
+            # URLs the provider silently dropped are reported back as failures
+            for url, future in chunk.values():
+                future.set_result(('failed_results', {'url': url, 'error': 'No result returned by extract'}))
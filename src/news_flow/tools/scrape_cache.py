@@ -0,0 +1,338 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from crewai_tools import FirecrawlScrapeWebsiteTool
+
+from news_flow.telemetry import instrumented_tool
+from news_flow.transport import http_session
+from news_flow.utils import data_path
+
+# Query parameters that only track the visitor and never change the page content
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref_src', 'igshid')
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of a URL used as the cache key: lowercase scheme and host, no default
+    port, no fragment, no tracking parameters, sorted query and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and not ((scheme == 'http' and parts.port == 80) or (scheme == 'https' and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def content_of(provider: str, payload: Any) -> str:
+    """Plain page text of a provider payload, the form every scrape tool can reuse."""
+    if provider == 'tavily':
+        return payload.get('raw_content') or ''
+    if isinstance(payload, dict):
+        return payload.get('markdown') or payload.get('content') or ''
+    return str(payload or '')
+
+
+def to_jsonable(payload: Any) -> Any:
+    """Firecrawl returns pydantic documents in recent versions and plain dicts in older ones."""
+    if hasattr(payload, 'model_dump'):
+        return payload.model_dump()
+    return payload
+
+
+class ScrapeCache:
+    """
+    Compressed SQLite cache of scraped pages shared by all the scrape tools.
+
+    Entries are keyed by canonical URL and keep the page's ETag/Last-Modified validators,
+    taken from the scrape response when the provider passes them on. Within fresh_ttl an
+    entry is served as is; after that it is revalidated with a conditional HEAD request and
+    only re-scraped when the page changed. Entries stored without validators get them with
+    a HEAD request the first time they are revalidated, so scraping never waits on one.
+    Pages without validators are re-scraped after max_age. The least recently used entries
+    are evicted once the compressed payloads go over max_bytes.
+    """
+
+    def __init__(
+        self,
+        db_path: str = 'scrape_cache.db',
+        fresh_ttl: int = 3600,
+        max_age: int = 24 * 3600,
+        max_bytes: int = 1024 * 1024 * 1024,
+        revalidate_timeout: float = 10.0,
+    ):
+        self.db_path = db_path
+        self.fresh_ttl = fresh_ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.revalidate_timeout = revalidate_timeout
+        self._stats_lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'changed': 0, 'evictions': 0}
+        self.init_db()
+
+    def init_db(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS scrape_cache (
+                url TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                validated_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                validators_checked INTEGER NOT NULL DEFAULT 0
+            )
+            """
+            )
+            # caches created when validators were always fetched while storing a page
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(scrape_cache)")}
+            if "validators_checked" not in columns:
+                conn.execute("ALTER TABLE scrape_cache ADD COLUMN validators_checked INTEGER NOT NULL DEFAULT 1")
+            conn.execute(
+                """
+            CREATE INDEX IF NOT EXISTS idx_scrape_cache_last_access
+            ON scrape_cache(last_access)
+            """
+            )
+
+    def get(self, url: str) -> Optional[Tuple[str, Any]]:
+        """Returns (provider, payload) for a page that is still valid, or None if it must be scraped."""
+        key = canonicalize_url(url)
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            row = conn.execute(
+                """
+            SELECT provider, payload, etag, last_modified, fetched_at, validated_at, validators_checked
+            FROM scrape_cache WHERE url = ?
+            """,
+                (key,),
+            ).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+
+        provider, payload, etag, last_modified, fetched_at, validated_at, validators_checked = row
+        now = time.time()
+        if now - validated_at > self.fresh_ttl:
+            if not validators_checked:
+                etag, last_modified = self._validators(url)
+                with sqlite3.connect(self.db_path, timeout=30) as conn:
+                    conn.execute(
+                        "UPDATE scrape_cache SET etag = ?, last_modified = ?, validators_checked = 1 WHERE url = ?",
+                        (etag, last_modified, key),
+                    )
+                # nothing to compare them with yet, so the page is trusted up to max_age this time
+                unchanged = now - fetched_at <= self.max_age
+            else:
+                unchanged = self._revalidate(url, etag, last_modified, fetched_at)
+            if not unchanged:
+                self._count('misses')
+                return None
+            self._count('revalidated')
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                conn.execute("UPDATE scrape_cache SET validated_at = ? WHERE url = ?", (now, key))
+        else:
+            self._count('hits')
+
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("UPDATE scrape_cache SET last_access = ? WHERE url = ?", (now, key))
+        return provider, json.loads(zlib.decompress(payload))
+
+    def _revalidate(self, url: str, etag: Optional[str], last_modified: Optional[str], fetched_at: float) -> bool:
+        """True if the page has not changed since it was scraped."""
+        if not etag and not last_modified:
+            return time.time() - fetched_at <= self.max_age
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            response = http_session('revalidate').head(url, headers=headers, timeout=self.revalidate_timeout, allow_redirects=True)
+        except requests.RequestException as e:
+            logging.debug("Scrape cache revalidation failed for %s: %s", url, e)
+            return time.time() - fetched_at <= self.max_age
+        if response.status_code == 304:
+            return True
+        if response.ok:
+            new_etag = response.headers.get('ETag')
+            new_last_modified = response.headers.get('Last-Modified')
+            if etag and new_etag:
+                return new_etag == etag
+            if last_modified and new_last_modified:
+                return new_last_modified == last_modified
+        return False
+
+    @staticmethod
+    def _response_validators(payload: Any) -> Tuple[Optional[str], Optional[str]]:
+        """ETag and Last-Modified of the page, if the provider passed them on in its response or its metadata."""
+        found: Dict[str, str] = {}
+        for fields in (payload, payload.get('metadata') if isinstance(payload, dict) else None):
+            if not isinstance(fields, dict):
+                continue
+            for name, value in fields.items():
+                normalized = str(name).lower().replace('-', '').replace('_', '')
+                if normalized in ('etag', 'lastmodified') and isinstance(value, str) and value:
+                    found.setdefault(normalized, value)
+        return found.get('etag'), found.get('lastmodified')
+
+    def _validators(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            response = http_session('revalidate').head(url, timeout=self.revalidate_timeout, allow_redirects=True)
+        except requests.RequestException:
+            return None, None
+        if not response.ok:
+            return None, None
+        return response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+    def set(self, url: str, provider: str, payload: Any) -> None:
+        key = canonicalize_url(url)
+        payload = to_jsonable(payload)
+        content_hash = hashlib.sha256(content_of(provider, payload).encode('utf-8')).hexdigest()
+        compressed = zlib.compress(json.dumps(payload, default=str).encode('utf-8'))
+        etag, last_modified = self._response_validators(payload)
+        now = time.time()
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            previous = conn.execute("SELECT content_hash FROM scrape_cache WHERE url = ?", (key,)).fetchone()
+            if previous is not None and previous[0] != content_hash:
+                self._count('changed')
+            conn.execute(
+                """
+            INSERT OR REPLACE INTO scrape_cache (
+                url, provider, payload, content_hash, etag, last_modified, size, fetched_at, validated_at, last_access,
+                validators_checked
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    key, provider, compressed, content_hash, etag, last_modified, len(compressed), now, now, now,
+                    int(bool(etag or last_modified)),
+                ),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM scrape_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for url, size in conn.execute("SELECT url, size FROM scrape_cache ORDER BY last_access ASC"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((url,))
+            total -= size
+        conn.executemany("DELETE FROM scrape_cache WHERE url = ?", evicted)
+        self._count('evictions', len(evicted))
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[stat] += amount
+
+
+def scrape_cache_from_env() -> Optional[ScrapeCache]:
+    """
+    Builds the process-wide scrape cache from the environment:
+    - NEWS_FLOW_SCRAPE_CACHE: set to 0/false/off to disable the cache (enabled by default)
+    - NEWS_FLOW_SCRAPE_CACHE_PATH: SQLite file (default scrape_cache.db under NEWS_FLOW_DATA_DIR)
+    - NEWS_FLOW_SCRAPE_CACHE_MAX_MB: size budget of the compressed pages (default 1024)
+    """
+    if os.getenv("NEWS_FLOW_SCRAPE_CACHE", "1").lower() in ("0", "false", "off", "no"):
+        logging.info("Scrape cache disabled")
+        return None
+    return ScrapeCache(
+        db_path=os.getenv("NEWS_FLOW_SCRAPE_CACHE_PATH", data_path("scrape_cache.db")),
+        max_bytes=int(float(os.getenv("NEWS_FLOW_SCRAPE_CACHE_MAX_MB", 1024)) * 1024 * 1024),
+    )
+
+
+scrape_cache = scrape_cache_from_env()
+
+
+def cached_scrape(provider: str, url: str, fetch: Callable[[], Any], adapt: Callable[[str, str, Any], Any]) -> Any:
+    """
+    Scrapes a single URL through the shared cache. Pages cached by another provider are
+    converted with adapt(url, cached_provider, payload) into what this tool returns.
+    """
+    if scrape_cache is None:
+        return fetch()
+    cached = scrape_cache.get(url)
+    if cached is not None:
+        cached_provider, payload = cached
+        return payload if cached_provider == provider else adapt(url, cached_provider, payload)
+    payload = fetch()
+    if payload and content_of(provider, to_jsonable(payload)):
+        scrape_cache.set(url, provider, payload)
+    return payload
+
+
+def as_tavily_result(url: str, provider: str, payload: Any) -> Dict[str, Any]:
+    """Shape of one item of a Tavily extract response, built from any cached page."""
+    if provider == 'tavily':
+        return payload
+    return {'url': url, 'raw_content': content_of(provider, payload), 'images': []}
+
+
+def as_firecrawl_result(url: str, provider: str, payload: Any) -> Dict[str, Any]:
+    """Shape of a Firecrawl scrape document, built from any cached page."""
+    if provider == 'firecrawl':
+        return payload
+    return {'markdown': content_of(provider, payload), 'metadata': {'sourceURL': url}}
+
+
+def cached_tavily_extract(urls: List[str], extract: Callable[[List[str]], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Tavily extract through the shared cache: cached pages are answered locally and the rest
+    are fetched with a single extract call. The response keeps the order of the urls.
+    """
+    if scrape_cache is None:
+        return extract(urls)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for url in urls:
+        cached = scrape_cache.get(url)
+        if cached is None:
+            missing.append(url)
+        else:
+            results[canonicalize_url(url)] = as_tavily_result(url, *cached)
+
+    response: Dict[str, Any] = {'failed_results': [], 'response_time': 0}
+    if missing:
+        fetched = extract(missing)
+        requested = {canonicalize_url(url): url for url in missing}
+        for result in fetched.get('results', []):
+            key = canonicalize_url(result.get('url', ''))
+            results[key] = result
+            if result.get('raw_content'):
+                scrape_cache.set(requested.get(key, result['url']), 'tavily', result)
+        response.update({k: v for k, v in fetched.items() if k != 'results'})
+
+    response['results'] = [results[key] for key in dict.fromkeys(map(canonicalize_url, urls)) if key in results]
+    return response
+
+
+@instrumented_tool
+class CachedFirecrawlScrapeWebsiteTool(FirecrawlScrapeWebsiteTool):
+    """FirecrawlScrapeWebsiteTool that reuses pages from the shared scrape cache."""
+
+    def _run(self, url: str):
+        return cached_scrape('firecrawl', url, functools.partial(super()._run, url), as_firecrawl_result)
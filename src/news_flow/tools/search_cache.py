@@ -0,0 +1,208 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from crewai_tools import BraveSearchTool, SerperDevTool
+
+from news_flow.telemetry import instrumented_tool
+from news_flow.utils import data_path
+
+# How long results stay fresh for each search time_range: a 'day' search goes stale
+# within the hour, a 'year' search barely changes over a week.
+SEARCH_TTLS = {
+    'day': 3600,
+    'week': 6 * 3600,
+    'month': 24 * 3600,
+    'year': 7 * 24 * 3600,
+}
+DEFAULT_SEARCH_TTL = 6 * 3600  # searches without a time_range (Serper, Brave)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases the query and collapses whitespace so trivially different phrasings share an entry."""
+    return ' '.join(str(query).lower().split())
+
+
+def is_error_result(result: Any) -> bool:
+    """Empty results and the error strings some tools return instead of raising are never cached."""
+    if not result:
+        return True
+    return isinstance(result, str) and result.startswith('Error ')
+
+
+class SearchCache:
+    """
+    SQLite cache of web search results shared by all the search tools.
+
+    Entries are keyed on provider, normalized query, topic, time_range and the tool options
+    that change the results, and they expire according to the time_range of the search.
+    """
+
+    def __init__(self, db_path: str = 'search_cache.db', ttls: Optional[Dict[str, int]] = None, default_ttl: int = DEFAULT_SEARCH_TTL):
+        self.db_path = db_path
+        self.ttls = ttls or SEARCH_TTLS
+        self.default_ttl = default_ttl
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.init_db()
+
+    def init_db(self) -> None:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                cache_key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                query TEXT NOT NULL,
+                topic TEXT,
+                time_range TEXT,
+                result_json TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+            )
+            conn.execute(
+                """
+            CREATE INDEX IF NOT EXISTS idx_search_cache_expires_at
+            ON search_cache(expires_at)
+            """
+            )
+
+    def ttl_for(self, time_range: Optional[str]) -> int:
+        return self.ttls.get(time_range, self.default_ttl)
+
+    @staticmethod
+    def make_key(provider: str, query: str, topic: Optional[str] = None, time_range: Optional[str] = None, **options: Any) -> str:
+        payload = json.dumps(
+            {
+                'provider': provider,
+                'query': normalize_query(query),
+                'topic': topic,
+                'time_range': time_range,
+                'options': options,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, cache_key: str) -> Optional[Any]:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            row = conn.execute(
+                "SELECT result_json FROM search_cache WHERE cache_key = ? AND expires_at > ?",
+                (cache_key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, cache_key: str, provider: str, query: str, topic: Optional[str], time_range: Optional[str], result: Any) -> None:
+        now = time.time()
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                """
+            INSERT OR REPLACE INTO search_cache (cache_key, provider, query, topic, time_range, result_json, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (cache_key, provider, normalize_query(query), topic, time_range,
+                 json.dumps(result, default=str), now, now + self.ttl_for(time_range)),
+            )
+            conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+
+    def cached(
+        self,
+        provider: str,
+        query: str,
+        fetch: Callable[[], Any],
+        topic: Optional[str] = None,
+        time_range: Optional[str] = None,
+        **options: Any,
+    ) -> Any:
+        """Returns the cached result of the search, or runs fetch and caches what it returns."""
+        cache_key = self.make_key(provider, query, topic, time_range, **options)
+        result = self.get(cache_key)
+        if result is not None:
+            self._count(provider, 'hits')
+            logging.debug("Search cache hit (%s): %s", provider, query)
+            return result
+
+        self._count(provider, 'misses')
+        result = fetch()
+        if not is_error_result(result):
+            self.set(cache_key, provider, query, topic, time_range, result)
+        return result
+
+    def _count(self, provider: str, stat: str) -> None:
+        with self._stats_lock:
+            provider_stats = self.stats.setdefault(provider, {'hits': 0, 'misses': 0})
+            provider_stats[stat] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counts and hit rate per provider since the process started."""
+        with self._stats_lock:
+            return {
+                provider: {**counts, 'hit_rate': counts['hits'] / max(counts['hits'] + counts['misses'], 1)}
+                for provider, counts in self.stats.items()
+            }
+
+
+def search_cache_from_env() -> Optional[SearchCache]:
+    """
+    Builds the process-wide search cache from the environment:
+    - NEWS_FLOW_SEARCH_CACHE: set to 0/false/off to disable the cache (enabled by default)
+    - NEWS_FLOW_SEARCH_CACHE_PATH: SQLite file (default search_cache.db under NEWS_FLOW_DATA_DIR)
+    """
+    if os.getenv("NEWS_FLOW_SEARCH_CACHE", "1").lower() in ("0", "false", "off", "no"):
+        logging.info("Search cache disabled")
+        return None
+    return SearchCache(db_path=os.getenv("NEWS_FLOW_SEARCH_CACHE_PATH", data_path("search_cache.db")))
+
+
+search_cache = search_cache_from_env()
+
+
+def cached_search(provider: str, query: str, fetch: Callable[[], Any], **kwargs: Any) -> Any:
+    """Runs a search through the shared cache, or straight through when the cache is disabled."""
+    if search_cache is None:
+        return fetch()
+    return search_cache.cached(provider, query, fetch, **kwargs)
+
+
+@instrumented_tool
+class CachedSerperDevTool(SerperDevTool):
+    """SerperDevTool that answers repeated queries from the shared search cache."""
+
+    def _run(self, **kwargs: Any) -> Any:
+        search_query = kwargs.get("search_query") or kwargs.get("query")
+        return cached_search(
+            "serper",
+            search_query,
+            functools.partial(super()._run, **kwargs),
+            topic=kwargs.get("search_type", self.search_type),
+            n_results=self.n_results,
+            country=self.country,
+            location=self.location,
+            locale=self.locale,
+        )
+
+
+@instrumented_tool
+class CachedBraveSearchTool(BraveSearchTool):
+    """BraveSearchTool that answers repeated queries from the shared search cache."""
+
+    def _run(self, **kwargs: Any) -> Any:
+        search_query = kwargs.get("search_query") or kwargs.get("query")
+        if not search_query:
+            return super()._run(**kwargs)
+        return cached_search(
+            "brave",
+            search_query,
+            functools.partial(super()._run, **kwargs),
+            n_results=kwargs.get("n_results", self.n_results),
+            country=self.country,
+        )
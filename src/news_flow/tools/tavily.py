@@ -2,6 +2,12 @@ from typing import Type, Literal, Optional, Any, List
 from crewai.tools import BaseTool
 from pydantic import BaseModel, Field, PrivateAttr
 from tavily import TavilyClient
+from news_flow.transport import http_session
+from news_flow.telemetry import instrumented_tool
+from news_flow.tools.search_cache import cached_search
+from news_flow.tools.scrape_cache import cached_tavily_extract
+from news_flow.tools.extract_batcher import ExtractBatcher
+import functools
 import os
 
 class TavilySearchToolInput(BaseModel):
@@ -9,6 +15,7 @@ class TavilySearchToolInput(BaseModel):
     search_terms: str = Field(..., description="The search terms to use for the search.")
     time_range: Optional[Literal['day', 'week', 'month', 'year']] = Field(default='day', description="The time range to use for the search, restricted to 'day', 'week', 'month', or 'year'.")
 
+@instrumented_tool
 class TavilySearchTool(BaseTool):
     name: str = "Search the web with Tavily"
     description: str = ("Search the web for the given search terms.")
@@ -29,15 +36,24 @@ class TavilySearchTool(BaseTool):
         self.topic = topic
         self.include_images = include_images
         self.include_raw_content = include_raw_content
-        self._tavily_client = TavilyClient(os.getenv("TAVILY_API_KEY"))
+        self._tavily_client = TavilyClient(os.getenv("TAVILY_API_KEY"), session=http_session("tavily"))
 
     def _run(self, 
              search_terms: str = Field(..., description="The search terms to use for the search."), 
              time_range: Optional[Literal['day', 'week', 'month', 'year']] = Field(default='day', description="The time range to use for the search, restricted to 'day', 'week', 'month', or 'year'.") ) -> str:
-        response = self._tavily_client.search(
-            query = search_terms,
-            time_range = time_range,
+        response = cached_search(
+            "tavily",
+            search_terms,
+            functools.partial(
+                self._tavily_client.search,
+                query = search_terms,
+                time_range = time_range,
+                topic = self.topic,
+                include_images = self.include_images,
+                include_raw_content = self.include_raw_content
+            ),
             topic = self.topic,
+            time_range = time_range,
             include_images = self.include_images,
             include_raw_content = self.include_raw_content
         )
@@ -47,12 +63,14 @@ class TavilyScrapeToolInput(BaseModel):
     """Input schema for TavilyScrapeTool."""
     urls: List[str] = Field(..., description="List of URLs to scrape.")
 
+@instrumented_tool
 class TavilyScrapeTool(BaseTool):
     name: str = "Scrape websites with Tavily"
     description: str = ("Scrape websites for the given URLs.")
     include_images: Optional[bool] = Field(default=False, description="Whether to include images in the scrape.")
     args_schema: Type[BaseModel] = TavilyScrapeToolInput
     _tavily_client: Optional[TavilyClient] = PrivateAttr(default=None)
+    _extract_batcher: Optional[ExtractBatcher] = PrivateAttr(default=None)
 
     def __init__(
         self,
@@ -61,11 +79,12 @@ class TavilyScrapeTool(BaseTool):
     ):
         super().__init__(**kwargs)
         self.include_images = include_images
-        self._tavily_client = TavilyClient(os.getenv("TAVILY_API_KEY"))
+        self._tavily_client = TavilyClient(os.getenv("TAVILY_API_KEY"), session=http_session("tavily"))
+        # agents running in parallel share this tool, so their extract calls are batched together
+        self._extract_batcher = ExtractBatcher(
+            functools.partial(self._tavily_client.extract, include_images=self.include_images)
+        )
 
     def _run(self, urls: List[str] = Field(..., description="List of URLs to scrape.") ) -> str:
-        response = self._tavily_client.extract(
-            urls=urls,
-            include_images=self.include_images
-        )
+        response = cached_tavily_extract(urls, self._extract_batcher.extract)
         return response
\ No newline at end of file
@@ -0,0 +1,140 @@
+import importlib
+import importlib.util
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+import litellm
+import requests
+from requests.adapters import HTTPAdapter
+
+from news_flow.adaptive_concurrency import adaptive_slot
+from news_flow.rate_limiter import rate_limiter
+
+# Connections one running crew can keep busy: its agents' LLM calls plus their tool calls
+CONNECTIONS_PER_CREW = 4
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("NEWS_FLOW_MAX_CONCURRENCY", 4))
+
+# httpx only speaks HTTP/2 with the h2 package, which the httpx[http2] dependency pulls in;
+# installs without it fall back to HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Third-party modules that call requests.get/post directly; they are pointed at a pooled session
+# (the firecrawl modules are the layout of firecrawl-py 3 and later)
+REQUESTS_MODULES = {
+    "crewai_tools.tools.serper_dev_tool.serper_dev_tool": "serper",
+    "crewai_tools.tools.brave_search_tool.brave_search_tool": "brave",
+    "firecrawl.v2.utils.http_client": "firecrawl",
+    "firecrawl.v1.client": "firecrawl",
+}
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_pool_size = 0
+
+
+def pool_size_for(max_concurrency: int) -> int:
+    return max(max_concurrency, 1) * CONNECTIONS_PER_CREW
+
+
+def _mount_pool(session: requests.Session, pool_size: int) -> None:
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+class _ProviderSession(requests.Session):
+    """
+    Session whose requests wait on the provider's budget in the process-wide rate limiter
+    and run inside the provider's adaptive concurrency limit.
+    """
+
+    def __init__(self, provider: str):
+        super().__init__()
+        self.provider = provider
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any) -> requests.Response:
+        if rate_limiter is not None:
+            rate_limiter.acquire(self.provider)
+        with adaptive_slot(self.provider) as outcome:
+            response = super().request(method, url, *args, **kwargs)
+            if response.status_code == 429:
+                outcome.report_congestion()
+        return response
+
+
+def http_session(provider: str) -> requests.Session:
+    """
+    Keep-alive requests session of a provider, shared by every client of that provider in
+    the process. Sessions are per provider because some clients (Tavily) store their auth
+    headers on the session, and those must not leak to other hosts.
+    """
+    with _lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = _ProviderSession(provider)
+            _mount_pool(session, _pool_size or pool_size_for(DEFAULT_MAX_CONCURRENCY))
+            _sessions[provider] = session
+        return session
+
+
+class _SessionRequests:
+    """Stands in for the requests module of a third-party module so its calls reuse a pooled session."""
+
+    def __init__(self, session: requests.Session):
+        self._session = session
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self._session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self._session.post(url, **kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> requests.Response:
+        return self._session.head(url, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        # exceptions, status codes, etc. still come from the real module
+        return getattr(requests, name)
+
+
+def _llm_clients(pool_size: int) -> None:
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    litellm.client_session = httpx.Client(http2=HTTP2_AVAILABLE, limits=limits, timeout=httpx.Timeout(600.0, connect=10.0))
+    litellm.aclient_session = httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, timeout=httpx.Timeout(600.0, connect=10.0))
+
+
+def configure_transport(max_concurrency: Optional[int] = None) -> int:
+    """
+    Sizes the connection pools for max_concurrency crews running at once. Pools only grow,
+    so concurrent flows asking for different sizes never shrink each other's pools.
+    Returns the pool size in effect.
+    """
+    global _pool_size
+    pool_size = pool_size_for(max_concurrency or DEFAULT_MAX_CONCURRENCY)
+    with _lock:
+        if pool_size <= _pool_size:
+            return _pool_size
+        _pool_size = pool_size
+        for session in _sessions.values():
+            _mount_pool(session, pool_size)
+        _llm_clients(pool_size)
+    logging.info("HTTP transport pools sized to %d connections per host (HTTP/2 for LLM calls: %s)", pool_size, HTTP2_AVAILABLE)
+    return pool_size
+
+
+def install_transport() -> None:
+    """Routes LiteLLM and the third-party tool clients through the shared pooled transport."""
+    configure_transport()
+    for module_name, provider in REQUESTS_MODULES.items():
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        if hasattr(module, "requests"):
+            module.requests = _SessionRequests(http_session(provider))
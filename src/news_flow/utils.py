@@ -1,4 +1,6 @@
+import hashlib
 import json
+import math
 import os
 import re
 import difflib
@@ -7,6 +9,7 @@ from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 
 def calculate_tokens_usage(flow_tokens_usage: Dict[str, Any]) -> dict:
+    """Rough cost of a flow from its token counts and a fixed model blend, for when call telemetry is disabled."""
     total_costs = 0
     total_tokens = 0
     percentage_gpt_4o = 0.2  # adjust this value to reflect the actual distribution
@@ -16,16 +19,36 @@ def calculate_tokens_usage(flow_tokens_usage: Dict[str, Any]) -> dict:
     cost_gpt40_mini_output = 0.075
     average_input_cost = cost_gpt4o_input * percentage_gpt_4o + cost_gpt40_mini_input * (1 - percentage_gpt_4o)
     average_output_cost = cost_gpt4o_output * percentage_gpt_4o + cost_gpt40_mini_output * (1 - percentage_gpt_4o)
+    cached_input_discount = 0.5  # prompt tokens served from the provider's prompt cache cost half (or less)
     for key, value in flow_tokens_usage.items():
+        if 'prompt_tokens' not in value:
+            continue  # not a crew, e.g. the content compaction counts
+        cached_prompt_tokens = value.get('cached_prompt_tokens', 0)
         print(f"------ Calculating Flow '{key}' costs ------")
-        print(f"Total '{key}' crew prompt tokens: {value['prompt_tokens']}")
+        print(f"Total '{key}' crew prompt tokens: {value['prompt_tokens']} ({cached_prompt_tokens} cached)")
         print(f"Total '{key}' crew completion tokens: {value['completion_tokens']}")
-        costs = (average_input_cost * value['prompt_tokens'] / 1_000_000) + (average_output_cost * value['completion_tokens'] / 1_000_000)
+        billed_prompt_tokens = value['prompt_tokens'] - cached_prompt_tokens * cached_input_discount
+        costs = (average_input_cost * billed_prompt_tokens / 1_000_000) + (average_output_cost * value['completion_tokens'] / 1_000_000)
         print(f"Total '{key}' crew costs: ~${costs:.4f}")
         total_costs += costs
         total_tokens += value['prompt_tokens'] + value['completion_tokens']
     return {"total_costs": total_costs, "total_tokens": total_tokens}
 
+def data_path(filename: str) -> str:
+    """
+    Default path of one of the service's SQLite files: inside NEWS_FLOW_DATA_DIR (created
+    if needed) when it is set, in the current directory otherwise.
+    """
+    data_dir = os.getenv("NEWS_FLOW_DATA_DIR")
+    if not data_dir:
+        return filename
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, filename)
+
+def input_hash(inputs: Dict[str, Any]) -> str:
+    """Stable hash of a crew's input dict, independent of key order."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
 def save_flow_step_output(flow_step_output: Any, filename: str, subfolder: str = None):
     """Serialize and save an object to a JSON or Markdown file in the 'outputs' directory or a specified subfolder."""
     
@@ -76,6 +99,89 @@ def find_close_key(norm_title: str, keys: List[str], threshold: float = 0.95) ->
             return key
     return None
 
+class TitleIndex:
+    """
+    Index of normalized titles answering find_close_key without comparing against every key.
+
+    find() returns exactly what find_close_key(norm_title, keys, threshold) returns for the
+    keys added so far, in the order they were added. Exact titles are a dict lookup. Other
+    titles are only compared with keys of a compatible length that share enough character
+    trigrams: a SequenceMatcher ratio above the threshold bounds how many characters can
+    differ, and each differing character breaks at most three trigrams (the q-gram lemma),
+    so the filter never drops a key that would match.
+    """
+
+    Q = 3
+
+    def __init__(self, threshold: float = 0.95):
+        self.threshold = threshold
+        self.keys: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._by_length: Dict[int, List[int]] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._ids
+
+    def add(self, key: str) -> None:
+        if key in self._ids:
+            return
+        key_id = len(self.keys)
+        self.keys.append(key)
+        self._ids[key] = key_id
+        self._by_length.setdefault(len(key), []).append(key_id)
+        for gram, count in self._grams(key).items():
+            self._postings.setdefault(gram, {})[key_id] = count
+
+    def find(self, norm_title: str) -> Optional[str]:
+        if norm_title in self._ids:
+            return norm_title
+        size = len(norm_title)
+        # 2 * min(la, lb) / (la + lb) bounds the ratio, so only these key lengths can match
+        lengths = [
+            length for length in self._by_length
+            if 2 * min(size, length) > self.threshold * (size + length)
+        ]
+        if not lengths:
+            return None
+
+        shared: Dict[int, int] = {}
+        for gram, count in self._grams(norm_title).items():
+            for key_id, key_count in self._postings.get(gram, {}).items():
+                shared[key_id] = shared.get(key_id, 0) + min(count, key_count)
+
+        candidates = []
+        for length in lengths:
+            required = self._required_shared_grams(size, length)
+            if required <= 0:
+                # too short for the trigram filter, every key of this length is a candidate
+                candidates.extend(self._by_length[length])
+            else:
+                candidates.extend(
+                    key_id for key_id in self._by_length[length] if shared.get(key_id, 0) >= required
+                )
+
+        # the earliest added key wins, like the linear scan of find_close_key
+        for key_id in sorted(candidates):
+            matcher = difflib.SequenceMatcher(None, norm_title, self.keys[key_id])
+            if matcher.quick_ratio() > self.threshold and matcher.ratio() > self.threshold:
+                return self.keys[key_id]
+        return None
+
+    def _required_shared_grams(self, size: int, length: int) -> int:
+        """Fewest trigrams two strings of these lengths must share to have a ratio above the threshold."""
+        # ratio > t means fewer than (1 - t) * (la + lb) characters are left unmatched
+        max_edits = math.floor((1 - self.threshold) * (size + length))
+        return max(size, length) - self.Q + 1 - self.Q * max_edits
+
+    @classmethod
+    def _grams(cls, text: str) -> Dict[str, int]:
+        grams: Dict[str, int] = {}
+        for i in range(len(text) - cls.Q + 1):
+            gram = text[i:i + cls.Q]
+            grams[gram] = grams.get(gram, 0) + 1
+        return grams
+
 def consolidate_news_json(
     evidence_list: List[Any],
     news_research_plans: List[Any],
@@ -85,13 +191,16 @@ def consolidate_news_json(
 ) -> dict:
     # Use a dictionary keyed by normalized title.
     news_dict = {}
+    # Fuzzy lookup of the keys of news_dict (same matches as find_close_key)
+    title_index = TitleIndex()
     
     # Pre-populate using the news_list from NewsList
     for news in news_list.news_list:
         norm_title = normalize_title(news.news_title)
-        existing_key = find_close_key(norm_title, list(news_dict.keys()))
+        existing_key = title_index.find(norm_title)
         key = existing_key if existing_key is not None else norm_title
         if key not in news_dict:
+            title_index.add(key)
             news_dict[key] = {
                 "news_title": news.news_title,
                 "summary": news.summary,
@@ -106,9 +215,10 @@ def consolidate_news_json(
     def ensure_entry(original_title: str) -> str:
         """Ensure that an entry exists for the given title, returning the normalized key."""
         norm_title = normalize_title(original_title)
-        existing_key = find_close_key(norm_title, list(news_dict.keys()))
+        existing_key = title_index.find(norm_title)
         key = existing_key if existing_key is not None else norm_title
         if key not in news_dict:
+            title_index.add(key)
             news_dict[key] = {
                 "news_title": original_title,
                 "summary": None,
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Importing news_flow builds its caches, stores and queue; keep their SQLite files out of the tree
+os.environ.setdefault("NEWS_FLOW_DATA_DIR", tempfile.mkdtemp(prefix="news_flow_tests_"))
@@ -0,0 +1,76 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from news_flow.crewai_extensions import SQLiteFlowPersistenceJSON
+
+# Size of the benchmark database: NUM_FLOWS flows with SNAPSHOTS_PER_FLOW snapshots each
+NUM_FLOWS = 50_000
+SNAPSHOTS_PER_FLOW = 6
+NUM_LOOKUPS = 2_000
+
+def build_database(db_path):
+    """Fills flow_states the way the stock persistence did: one full row per step, no flow_heads."""
+    state = json.dumps({"current_step": "research_news", "articles": [], "flow_tokens": {}})
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE flow_states (id INTEGER PRIMARY KEY AUTOINCREMENT, flow_uuid TEXT NOT NULL, "
+            "method_name TEXT NOT NULL, timestamp DATETIME NOT NULL, state_json TEXT NOT NULL)"
+        )
+        rows = (
+            (f"flow-{flow}", f"step_{step}", f"2025-04-{1 + step:02d}T00:00:{flow % 60:02d}+00:00", state)
+            for step in range(SNAPSHOTS_PER_FLOW)
+            for flow in range(NUM_FLOWS)
+        )
+        conn.executemany(
+            "INSERT INTO flow_states (flow_uuid, method_name, timestamp, state_json) VALUES (?, ?, ?, ?)", rows
+        )
+
+def time_it(label, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {elapsed:8.3f}s  ({elapsed / count * 1e6:8.1f} us per flow)")
+
+def run_benchmark():
+    db_path = os.path.join(tempfile.mkdtemp(), "flow_states.db")
+    print(f"Building {NUM_FLOWS * SNAPSHOTS_PER_FLOW:,} snapshots of {NUM_FLOWS:,} flows in {db_path}...")
+    build_database(db_path)
+    flow_ids = [f"flow-{random.randrange(NUM_FLOWS)}" for _ in range(NUM_LOOKUPS)]
+
+    def unindexed_scan():
+        with sqlite3.connect(db_path) as conn:
+            for flow_id in flow_ids[:50]:
+                conn.execute(
+                    "SELECT state_json FROM flow_states NOT INDEXED WHERE flow_uuid = ? ORDER BY id DESC LIMIT 1", (flow_id,)
+                ).fetchone()
+    time_it("latest row, full table scan (50 flows)", unindexed_scan, 50)
+
+    start = time.perf_counter()
+    persistence = SQLiteFlowPersistenceJSON(db_path=db_path)
+    print(f"{'index creation and flow_heads backfill':<45} {time.perf_counter() - start:8.3f}s")
+
+    def latest_row_query():
+        with sqlite3.connect(db_path) as conn:
+            for flow_id in flow_ids:
+                conn.execute(
+                    "SELECT state_json FROM flow_states WHERE flow_uuid = ? ORDER BY id DESC LIMIT 1", (flow_id,)
+                ).fetchone()
+    time_it("latest row, flow_uuid index", latest_row_query, NUM_LOOKUPS)
+
+    def load_one_by_one():
+        for flow_id in flow_ids:
+            persistence.load_state(flow_id)
+    time_it("load_state through flow_heads", load_one_by_one, NUM_LOOKUPS)
+
+    time_it("load_states batched", lambda: persistence.load_states(flow_ids), NUM_LOOKUPS)
+    time_it("list_flows, 100 most recent", lambda: persistence.list_flows(limit=100), 100)
+
+    assert persistence.load_state(flow_ids[0])["current_step"] == "research_news"
+    assert len(persistence.load_states(flow_ids)) == len(set(flow_ids))
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+import time
+
+# Every mode has to call the LLMs for its numbers to mean anything
+os.environ.setdefault("NEWS_FLOW_LLM_CACHE", "0")
+os.environ.setdefault("NEWS_FLOW_STAGE_CACHE", "0")
+
+from news_flow.main import NewsFlow
+from news_flow.types import NewsList
+
+# A news list recorded by an earlier flow run (discover_news and scrape_news save one)
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "..", "src", "news_flow", "outputs", "news_list.json")
+MODES = ("crew", "single_pass", "parallel")
+
+def load_news(paths):
+    news_items = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            news_items.extend(NewsList.model_validate_json(f.read()).news_list)
+    return news_items
+
+def plan(mode, news_items):
+    flow = NewsFlow()
+    flow.state.id = ""  # no persistence or events, only the crews
+    flow.state.planning_mode = mode
+    flow.state.topic = news_items[0].topic
+    flow.state.news_list = NewsList(news_list=news_items)
+    start = time.perf_counter()
+    results = asyncio.run(flow._plan_research(news_items))
+    elapsed = time.perf_counter() - start
+    return elapsed, results
+
+def run_benchmark(paths):
+    news_items = load_news(paths)
+    print(f"Planning {len(news_items)} articles from {', '.join(paths)}")
+    print(f"{'mode':<12} {'seconds':>8} {'prompt':>9} {'completion':>11} {'requests':>9} {'vs crew (time/tokens)':>22} {'ideas/dps/cas':>14}")
+    baseline = None
+    for mode in MODES:
+        elapsed, results = plan(mode, news_items)
+        prompt_tokens = sum(result.token_usage.prompt_tokens for result in results)
+        completion_tokens = sum(result.token_usage.completion_tokens for result in results)
+        requests = sum(result.token_usage.successful_requests for result in results)
+        plans = [result.pydantic for result in results]
+        counts = (
+            sum(len(p.key_ideas.ideas) for p in plans),
+            sum(len(p.key_datapoints.datapoints) for p in plans),
+            sum(len(p.counter_arguments.counter_arguments) for p in plans),
+        )
+        if baseline is None:
+            baseline = (elapsed, prompt_tokens + completion_tokens)
+        ratios = f"{elapsed / baseline[0]:.2f}x / {(prompt_tokens + completion_tokens) / max(baseline[1], 1):.2f}x"
+        print(f"{mode:<12} {elapsed:8.1f} {prompt_tokens:9,} {completion_tokens:11,} {requests:9} {ratios:>22} {'/'.join(map(str, counts)):>14}")
+
+if __name__ == "__main__":
+    run_benchmark(sys.argv[1:] or [DEFAULT_FIXTURE])
@@ -0,0 +1,148 @@
+import sqlite3
+
+import pytest
+
+from news_flow.crewai_extensions import (
+    COMPRESS_MIN_BYTES,
+    COMPRESSED_MARKER,
+    SQLiteFlowPersistenceJSON,
+    decode_json,
+    encode_json,
+)
+
+
+@pytest.fixture
+def persistence(tmp_path):
+    store = SQLiteFlowPersistenceJSON(db_path=str(tmp_path / "flow_states.db"), compact_every=3)
+    yield store
+    store.close()
+
+
+def rows(store, table, flow_uuid):
+    with sqlite3.connect(store.db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE flow_uuid = ?", (flow_uuid,)).fetchone()[0]
+
+
+def states(count):
+    return [{"id": "f", "current_step": f"step_{i}", "articles": [f"article {j}" for j in range(i)]} for i in range(count)]
+
+
+def test_small_values_stay_plain_json():
+    assert encode_json({"a": 1}) == '{"a": 1}'
+    assert decode_json('{"a": 1}') == {"a": 1}
+
+
+def test_large_values_are_compressed_behind_the_marker():
+    value = {"content": "x" * COMPRESS_MIN_BYTES}
+    stored = encode_json(value)
+    assert isinstance(stored, bytes) and stored.startswith(COMPRESSED_MARKER)
+    assert len(stored) < COMPRESS_MIN_BYTES
+    assert decode_json(stored) == value
+
+
+def test_compression_can_be_turned_off():
+    value = {"content": "x" * COMPRESS_MIN_BYTES}
+    assert isinstance(encode_json(value, compress=False), str)
+    assert decode_json(encode_json(value, compress=False)) == value
+
+
+def test_uncompressed_bytes_of_older_rows_decode():
+    assert decode_json(b'{"a": 1}') == {"a": 1}
+
+
+def test_states_are_rebuilt_from_base_and_deltas(persistence):
+    for state in states(3):
+        persistence.save_state("f", state["current_step"], state)
+    assert persistence.load_state("f") == states(3)[-1]
+    assert rows(persistence, "flow_states", "f") == 1
+    assert rows(persistence, "flow_state_deltas", "f") == 2
+
+
+def test_a_new_base_is_written_after_compact_every_deltas(persistence):
+    for state in states(6):
+        persistence.save_state("f", state["current_step"], state)
+    assert persistence.load_state("f") == states(6)[-1]
+    # base, 3 deltas, then a new base with 1 delta on it
+    assert rows(persistence, "flow_states", "f") == 2
+    assert rows(persistence, "flow_state_deltas", "f") == 4
+
+
+def test_compaction_folds_the_deltas_into_a_new_base(persistence):
+    for state in states(3):
+        persistence.save_state("f", state["current_step"], state)
+    persistence.compact()
+    assert rows(persistence, "flow_state_deltas", "f") == 0
+    assert persistence.load_state("f") == states(3)[-1]
+    # writes after a compaction diff against the compacted base
+    later = dict(states(3)[-1], current_step="write_articles")
+    persistence.save_state("f", "write_articles", later)
+    assert persistence.load_state("f") == later
+    assert rows(persistence, "flow_state_deltas", "f") == 1
+
+
+def test_final_methods_keep_only_the_final_state(tmp_path):
+    store = SQLiteFlowPersistenceJSON(db_path=str(tmp_path / "flow_states.db"), final_methods=("write_articles",))
+    try:
+        for state in states(3):
+            store.save_state("f", state["current_step"], state)
+        final = dict(states(3)[-1], current_step="write_articles")
+        store.save_state("f", "write_articles", final)
+        assert store.load_state("f") == final
+        assert rows(store, "flow_states", "f") == 1
+        assert rows(store, "flow_state_deltas", "f") == 0
+    finally:
+        store.close()
+
+
+def test_a_base_written_by_another_process_is_not_diffed_against(persistence):
+    other = SQLiteFlowPersistenceJSON(db_path=persistence.db_path)
+    try:
+        first, second, third = states(3)
+        persistence.save_state("f", "step_0", first)
+        other.save_state("f", "step_1", second)
+        # the cached head of the first store is stale: this must become a new base, not a delta on step_0
+        persistence.save_state("f", "step_2", third)
+        assert persistence.load_state("f") == third
+        assert other.load_state("f") == third
+    finally:
+        other.close()
+
+
+def test_item_checkpoints_are_written_behind(persistence):
+    for i in range(20):
+        persistence.save_state("f", "research_news_item", {"id": "f", "done": i}, wait=False)
+    assert persistence.load_state("f") == {"id": "f", "done": 19}
+
+
+def test_batches_are_written_under_the_write_lock(persistence, monkeypatch):
+    write_batch = persistence._write_batch
+    blocked = []
+
+    def racing_write_batch(conn, batch):
+        # another process trying to compact or expire while the heads are checked
+        other = sqlite3.connect(persistence.db_path, timeout=0)
+        try:
+            other.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            blocked.append(True)
+        finally:
+            other.close()
+        return write_batch(conn, batch)
+
+    monkeypatch.setattr(persistence, "_write_batch", racing_write_batch)
+    persistence.save_state("f", "step_0", states(1)[0])
+    assert blocked == [True]
+
+
+def test_deltas_are_not_written_on_a_base_compacted_by_another_process(persistence):
+    other = SQLiteFlowPersistenceJSON(db_path=persistence.db_path)
+    try:
+        first, second, third = states(3)
+        persistence.save_state("f", "step_0", first)
+        persistence.save_state("f", "step_1", second)
+        other.compact()
+        persistence.save_state("f", "step_2", third)
+        assert persistence.load_state("f") == third
+        assert other.load_state("f") == third
+    finally:
+        other.close()
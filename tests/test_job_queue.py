@@ -0,0 +1,204 @@
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+
+from news_flow import jobs
+from news_flow.jobs import ATTACHED, COMPLETED, FAILED, QUEUED, RUNNING, JobExists, QueueFull, SQLiteJobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(db_path=str(tmp_path / "jobs.db"), max_queued=2, max_attempts=2, lease_seconds=60)
+
+
+def expire_leases(queue):
+    # every running job's lease ran out a second ago
+    with sqlite3.connect(queue.db_path) as conn:
+        conn.execute("UPDATE jobs SET lease_expires_at = ? WHERE status = ?", (time.time() - 1, RUNNING))
+
+
+def test_submissions_past_max_queued_are_rejected(queue):
+    queue.submit("a", {"topic": "a"})
+    queue.submit("b", {"topic": "b"})
+    with pytest.raises(QueueFull) as rejected:
+        queue.submit("c", {"topic": "c"})
+    assert rejected.value.queued == 2
+    assert rejected.value.retry_after >= 1
+    assert queue.get("c") is None
+
+
+def test_running_jobs_free_their_place_in_the_queue(queue):
+    queue.submit("a", {"topic": "a"})
+    queue.submit("b", {"topic": "b"})
+    assert queue.claim("w1")["id"] == "a"
+    assert queue.submit("c", {"topic": "c"})["status"] == QUEUED
+    assert queue.get("c")["position"] == 1
+
+
+def test_resubmitting_an_active_job_returns_it(queue):
+    queue.submit("a", {"topic": "a"})
+    assert queue.submit("a", {"topic": "other"})["inputs"] == {"topic": "a"}
+
+
+def test_a_finished_job_is_only_replaced_on_request(queue):
+    queue.submit("a", {"topic": "a"})
+    queue.claim("w1")
+    queue.complete("a", "w1")
+    with pytest.raises(JobExists):
+        queue.submit("a", {"topic": "other"})
+    assert queue.get("a")["status"] == COMPLETED
+    assert queue.submit("a", {"id": "a"}, replace=True)["status"] == QUEUED
+
+
+def test_claim_requeues_expired_leases_and_counts_attempts(queue):
+    queue.submit("a", {"topic": "a"})
+    assert queue.claim("w1")["attempts"] == 1
+    expire_leases(queue)
+    job = queue.claim("w2")
+    assert (job["id"], job["worker"], job["attempts"]) == ("a", "w2", 2)
+
+
+def test_jobs_out_of_attempts_fail(queue):
+    queue.submit("a", {"topic": "a"})
+    queue.claim("w1")
+    expire_leases(queue)
+    queue.claim("w2")
+    expire_leases(queue)
+    assert queue.claim("w3") is None
+    assert queue.get("a")["status"] == FAILED
+    assert "interrupted 2 times" in queue.get("a")["error"]
+
+
+def test_a_worker_that_lost_its_lease_cannot_finish_the_job(queue):
+    queue.submit("a", {"topic": "a"})
+    queue.claim("w1")
+    expire_leases(queue)
+    queue.claim("w2")
+    assert not queue.heartbeat("a", "w1")
+    assert not queue.complete("a", "w1")
+    assert not queue.fail("a", "w1", "boom")
+    assert queue.heartbeat("a", "w2")
+    assert queue.complete("a", "w2")
+    assert queue.get("a")["status"] == COMPLETED
+
+
+def test_recover_requeues_the_jobs_of_a_dead_worker(queue):
+    queue.submit("a", {"topic": "a"})
+    queue.claim("w1")
+    assert queue.recover("w1") == ["a"]
+    job = queue.claim("w2")
+    assert (job["id"], job["attempts"]) == ("a", 2)
+
+
+def test_release_requeues_without_counting_the_attempt(queue):
+    queue.submit("a", {"topic": "a"})
+    queue.claim("w1")
+    assert queue.release("w1") == ["a"]
+    assert queue.get("a")["status"] == QUEUED
+    assert queue.claim("w2")["attempts"] == 1
+
+
+def test_an_identical_request_is_attached_to_the_running_job(queue):
+    queue.submit("leader", {"topic": "x"}, key="k")
+    queue.claim("w1")
+    follower = queue.submit("follower", {"topic": "X "}, key="k")
+    assert (follower["id"], follower["status"], follower["leader"]) == ("follower", RUNNING, "leader")
+    assert follower["inputs"] == {"topic": "X "}
+    assert queue.stats()[ATTACHED] == 1
+    queue.complete("leader", "w1")
+    assert queue.get("follower")["status"] == COMPLETED
+
+
+def test_attached_jobs_take_no_place_in_the_queue(queue):
+    queue.submit("leader", {"topic": "x"}, key="k")
+    for i in range(5):
+        assert queue.submit(f"follower-{i}", {"topic": "x"}, key="k")["leader"] == "leader"
+    assert queue.stats()[QUEUED] == 1
+
+
+def test_completed_results_answer_identical_requests_until_result_ttl(tmp_path):
+    queue = SQLiteJobQueue(db_path=str(tmp_path / "jobs.db"), result_ttl=60)
+    queue.submit("leader", {"topic": "x"}, key="k")
+    queue.claim("w1")
+    queue.complete("leader", "w1")
+    assert queue.submit("again", {"topic": "x"}, key="k")["leader"] == "leader"
+
+    expired = SQLiteJobQueue(db_path=str(tmp_path / "jobs.db"), result_ttl=0)
+    job = expired.submit("later", {"topic": "x"}, key="k")
+    assert (job["status"], job["leader"]) == (QUEUED, None)
+
+
+def test_followers_expire_when_their_leader_is_rerun_with_another_request(queue):
+    queue.submit("leader", {"topic": "x"}, key="kx")
+    queue.claim("w1")
+    queue.complete("leader", "w1")
+    queue.submit("follower", {"topic": "x"}, key="kx")
+    queue.submit("leader", {"topic": "y"}, key="ky", replace=True)
+    follower = queue.get("follower")
+    assert follower["status"] == FAILED
+    assert "expired" in follower["error"]
+
+
+def test_followers_keep_following_a_leader_resumed_by_id(queue):
+    queue.submit("leader", {"topic": "x"}, key="kx")
+    queue.claim("w1")
+    queue.fail("leader", "w1", "boom")
+    queue.submit("leader", {"id": "leader"}, replace=True)
+    assert queue.submit("follower", {"topic": "x"}, key="kx")["leader"] == "leader"
+    assert queue.get("follower")["status"] == QUEUED
+
+
+@pytest.mark.parametrize("finish", ["complete", "fail"])
+def test_a_duplicate_submit_without_replace_raises_job_exists(queue, finish):
+    queue.submit("a", {"topic": "a"})
+    queue.claim("w1")
+    if finish == "complete":
+        queue.complete("a", "w1")
+    else:
+        queue.fail("a", "w1", "boom")
+    with pytest.raises(JobExists) as duplicate:
+        queue.submit("a", {"topic": "a"})
+    assert duplicate.value.job_id == "a"
+
+
+class FlakyQueue:
+    """Queue whose lease renewals fail with the given errors before they succeed."""
+
+    lease_seconds = 0.3
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.renewals = 0
+
+    def heartbeat(self, job_id, worker):
+        self.renewals += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return True
+
+
+def test_heartbeats_retry_after_database_errors(monkeypatch):
+    exits = []
+    monkeypatch.setattr(jobs.os, "_exit", exits.append)
+    queue = FlakyQueue([sqlite3.OperationalError("database is locked")])
+    done = threading.Event()
+    heartbeat = threading.Thread(target=jobs._heartbeat, args=(queue, "a", "w1", done))
+    heartbeat.start()
+    heartbeat.join(0.5)
+    done.set()
+    heartbeat.join()
+    assert queue.renewals >= 2
+    assert exits == []
+
+
+def test_workers_exit_once_their_lease_runs_out_unrenewed(monkeypatch):
+    monkeypatch.setattr(jobs.os, "_exit", sys.exit)
+    queue = FlakyQueue([sqlite3.OperationalError("database is locked")] * 100)
+    start = time.monotonic()
+    with pytest.raises(SystemExit) as exited:
+        jobs._heartbeat(queue, "a", "w1", threading.Event())
+    assert exited.value.code == jobs.LOST_LEASE_EXIT_CODE
+    assert time.monotonic() - start >= queue.lease_seconds
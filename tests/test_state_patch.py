@@ -0,0 +1,83 @@
+import copy
+
+import pytest
+
+from news_flow.state_patch import apply_patch, make_patch
+
+
+def round_trip(old, new):
+    patch = make_patch(old, new)
+    assert apply_patch(copy.deepcopy(old), patch) == new
+    return patch
+
+
+def test_equal_documents_need_no_patch():
+    state = {"id": "f", "articles": [{"title": "a"}], "flow_tokens": {}}
+    assert make_patch(state, copy.deepcopy(state)) == []
+
+
+def test_appended_list_items_are_the_only_ops():
+    old = {"articles": [{"title": str(i)} for i in range(20)]}
+    new = {"articles": old["articles"] + [{"title": "new"}]}
+    assert round_trip(old, new) == [{"op": "add", "path": "/articles/-", "value": {"title": "new"}}]
+
+
+def test_changed_nested_value_is_replaced_at_its_path():
+    old = {"flow_tokens": {"critique_news": {"prompt_tokens": 10, "completion_tokens": 5}}}
+    new = {"flow_tokens": {"critique_news": {"prompt_tokens": 30, "completion_tokens": 5}}}
+    assert round_trip(old, new) == [{"op": "replace", "path": "/flow_tokens/critique_news/prompt_tokens", "value": 30}]
+
+
+def test_added_and_removed_keys():
+    old = {"current_step": "plan_research", "item_checkpoints": {"plan_research": {"k": 1}}}
+    new = {"current_step": "research_news", "news_list": {"news_list": []}}
+    ops = round_trip(old, new)
+    assert {"op": "remove", "path": "/item_checkpoints"} in ops
+    assert {"op": "add", "path": "/news_list", "value": {"news_list": []}} in ops
+
+
+def test_same_length_lists_are_diffed_item_by_item():
+    old = {"plans": [{"title": "a", "ideas": ["x"]}, {"title": "b", "ideas": []}]}
+    new = {"plans": [{"title": "a", "ideas": ["x"]}, {"title": "b", "ideas": ["y"]}]}
+    assert round_trip(old, new) == [{"op": "add", "path": "/plans/1/ideas/-", "value": "y"}]
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        ({"items": [1, 2, 3]}, {"items": [1, 2]}),  # shrunk
+        ({"items": [1, 2]}, {"items": [0, 1, 2]}),  # prepended
+        ({"value": {"a": 1}}, {"value": [1]}),  # changed type
+        ([1, 2], {"a": 1}),  # whole document
+    ],
+)
+def test_other_changes_round_trip(old, new):
+    round_trip(old, new)
+
+
+def test_keys_with_slashes_and_tildes_are_escaped():
+    old = {"outputs": {"a/b": 1, "c~d": 2}}
+    new = {"outputs": {"a/b": 3, "c~d": 2, "e~/f": 4}}
+    ops = round_trip(old, new)
+    assert {"op": "replace", "path": "/outputs/a~1b", "value": 3} in ops
+    assert {"op": "add", "path": "/outputs/e~0~1f", "value": 4} in ops
+
+
+def test_applied_values_are_copies_of_the_patch():
+    patch = make_patch({"items": []}, {"items": [{"title": "a"}]})
+    doc = apply_patch({"items": []}, patch)
+    doc["items"][0]["title"] = "changed"
+    assert patch[0]["value"] == {"title": "a"}
+
+
+def test_patches_apply_in_sequence():
+    states = [
+        {"id": "f", "articles": []},
+        {"id": "f", "articles": [{"title": "a"}], "current_step": "write_articles"},
+        {"id": "f", "articles": [{"title": "a"}, {"title": "b"}], "current_step": "write_articles"},
+        {"id": "f", "articles": [{"title": "a*"}, {"title": "b"}]},
+    ]
+    doc = copy.deepcopy(states[0])
+    for old, new in zip(states, states[1:]):
+        doc = apply_patch(doc, make_patch(old, new))
+        assert doc == new
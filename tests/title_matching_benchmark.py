@@ -0,0 +1,85 @@
+import random
+import string
+import time
+from types import SimpleNamespace
+
+from news_flow.utils import TitleIndex, consolidate_news_json, find_close_key, normalize_title
+
+# A batch run: NUM_NEWS articles, each with several evidence, plan, counterargument and critique records
+NUM_NEWS = 3_000
+RECORDS_PER_NEWS = 8
+VOCABULARY_SIZE = 5_000
+
+def make_vocabulary(rng):
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))) for _ in range(VOCABULARY_SIZE)]
+
+def make_title(rng, words):
+    return " ".join(rng.choice(words) for _ in range(rng.randint(6, 12))).capitalize()
+
+def vary(title, rng):
+    """How agents echo a title back: other casing and punctuation, and now and then a typo."""
+    roll = rng.random()
+    if roll < 0.4:
+        return title.upper() + "!"
+    if roll < 0.7:
+        return f"'{title}'"
+    if roll < 0.85 and len(title) > 40:
+        i = rng.randrange(len(title))
+        return title[:i] + rng.choice(string.ascii_lowercase) + title[i + 1:]
+    return title
+
+def build_records(rng):
+    words = make_vocabulary(rng)
+    titles = [make_title(rng, words) for _ in range(NUM_NEWS)]
+    lookups = [normalize_title(vary(rng.choice(titles), rng)) for _ in range(NUM_NEWS * RECORDS_PER_NEWS)]
+    return titles, lookups
+
+def time_it(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<50} {time.perf_counter() - start:8.3f}s")
+    return result
+
+def run_benchmark():
+    rng = random.Random(42)
+    titles, lookups = build_records(rng)
+    keys = [normalize_title(title) for title in titles]
+
+    def linear_scan():
+        return [find_close_key(title, keys) for title in lookups]
+
+    def indexed():
+        index = TitleIndex()
+        for key in keys:
+            index.add(key)
+        return [index.find(title) for title in lookups]
+
+    sample = lookups[:100]
+    start = time.perf_counter()
+    expected = [find_close_key(title, keys) for title in sample]
+    per_lookup = (time.perf_counter() - start) / len(sample)
+    print(f"{'find_close_key, 100 of the lookups':<50} {per_lookup * len(sample):8.3f}s "
+          f"(~{per_lookup * len(lookups):.0f}s for all {len(lookups):,})")
+    found = time_it(f"TitleIndex, all {len(lookups):,} lookups", indexed)
+    assert found[:len(sample)] == expected, "TitleIndex must match find_close_key"
+    print(f"matches: {sum(key is not None for key in found):,} of {len(found):,}")
+
+    news_list = SimpleNamespace(news_list=[
+        SimpleNamespace(news_title=title, summary="", source_url="", content="") for title in titles
+    ])
+
+    def record(title):
+        return SimpleNamespace(news_title=vary(title, rng), dict=lambda: {}, key_datapoints=SimpleNamespace(dict=lambda: {}))
+
+    evidence = [record(rng.choice(titles)) for _ in range(NUM_NEWS * 3)]
+    plans = [record(title) for title in titles]
+    counterargs = [record(rng.choice(titles)) for _ in range(NUM_NEWS * 2)]
+    critiques = [record(title) for title in titles]
+    consolidated = time_it(
+        f"consolidate_news_json, {NUM_NEWS:,} news items",
+        lambda: consolidate_news_json(evidence, plans, counterargs, news_list, critiques),
+    )
+    print(f"consolidated entries: {len(consolidated['news_list']):,}")
+
+if __name__ == "__main__":
+    run_benchmark()